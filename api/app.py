@@ -2,18 +2,32 @@
 API FastAPI pour servir le modèle de prédiction de prix de voitures
 Lancer avec : uvicorn api.app:app --reload --port 8000
 """
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Optional
-import joblib
-import pandas as pd
+from fastapi import FastAPI, File, Header, HTTPException, Request, UploadFile
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, WithJsonSchema
+from typing import Annotated, Any, Dict, List, Optional
+import atexit
+import json
+import secrets
 import sys
 import os
+import threading
+import time
+import warnings
 from datetime import datetime
 
 # Ajouter le dossier parent au path pour importer src
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from src.preprocess import DataPreprocessor
+from src.registry import ModelBundle, ModelRegistry, REGISTRY_DIR
+from api.batching import MicroBatcher
+from api.cache import PredictionCache
+from api.routing import ModelRouter, memory_footprint
+from api.shadow import ShadowScorer
+from api.streaming import detect_format, iter_chunks, iter_records
+from monitoring.drift import DriftMonitor, DriftProfile, build_reference, evidently_report
+from monitoring.metrics import CONTENT_TYPE, SIZE_BUCKETS, MetricsMiddleware, MetricsRegistry
+from monitoring.prediction_log import PredictionLogger
+from monitoring.profiling import SamplingProfiler
 
 # 🚀 Initialisation de l'API
 app = FastAPI(
@@ -22,15 +36,220 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# ⚙️ Registre de modèles versionné (CURRENT = version en production)
+registry = ModelRegistry(os.getenv("MODEL_REGISTRY_DIR", REGISTRY_DIR))
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "10"))
+
+# ⚙️ Hors registre : MODEL_PATH / PREPROCESSOR_PATH, sinon l'artefact
+# mappé en mémoire (.bin) s'il existe, sinon le pickle
+def _resolve_path(env_var, mapped_path, pickle_path):
+    return os.getenv(env_var) or (mapped_path if os.path.exists(mapped_path) else pickle_path)
+
+def _artifact_paths():
+    return (
+        _resolve_path("MODEL_PATH", "models/production_model.bin", "models/production_model.pkl"),
+        _resolve_path("PREPROCESSOR_PATH", "models/preprocessor.bin", "models/preprocessor.pkl")
+    )
+
+# ⚙️ Configuration du micro-batching des requêtes /predict concurrentes
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+
+# ⚙️ Cache des prédictions (CACHE_MAX_SIZE=0 pour le désactiver)
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "0")) or None
+
+# ⚙️ Journal des prédictions (PREDICTION_LOG_ENABLED=false pour le désactiver)
+PREDICTION_LOG_ENABLED = os.getenv("PREDICTION_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+PREDICTION_LOG_PATH = os.getenv("PREDICTION_LOG_PATH", "logs/predictions.jsonl")
+PREDICTION_LOG_CAPACITY = int(os.getenv("PREDICTION_LOG_CAPACITY", "100000"))
+PREDICTION_LOG_MAX_BYTES = int(os.getenv("PREDICTION_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+PREDICTION_LOG_BACKUPS = int(os.getenv("PREDICTION_LOG_BACKUPS", "5"))
+PREDICTION_LOG_COMPRESS = os.getenv("PREDICTION_LOG_COMPRESS", "true").lower() in ("1", "true", "yes")
+
+# ⚙️ Dérive : référence figée (python monitoring/drift.py), sinon calculée
+# depuis data/processed/train.* avec le modèle en production
+DRIFT_REFERENCE_PATH = os.getenv("DRIFT_REFERENCE_PATH", "models/drift_reference.json")
+
+# ⚙️ Modèle fantôme (version du registre) : score le trafic réel sans servir de réponse
+SHADOW_MODEL_VERSION = os.getenv("SHADOW_MODEL_VERSION")
+SHADOW_CAPACITY = int(os.getenv("SHADOW_CAPACITY", "50000"))
+SHADOW_BATCH_SIZE = int(os.getenv("SHADOW_BATCH_SIZE", "256"))
+SHADOW_THRESHOLD_PCT = float(os.getenv("SHADOW_THRESHOLD_PCT", "10"))
+SHADOW_PAIRS_PATH = os.getenv("SHADOW_PAIRS_PATH", "logs/shadow_pairs.jsonl") or None
+
+# ⚙️ Routage multi-modèles : règles JSON (segment -> version du registre), cf. api/routing.py
+ROUTING_CONFIG = os.getenv("ROUTING_CONFIG")
+
+# 📈 Métriques Prometheus (METRICS_ENABLED=false pour les couper)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+HTTP_REQUESTS = metrics.counter("http_requests_total", "Requêtes HTTP par route et statut",
+                                ("method", "path", "status"))
+HTTP_ERRORS = metrics.counter("http_request_errors_total", "Réponses en erreur (statut >= 400)",
+                              ("method", "path", "status"))
+HTTP_LATENCY = metrics.histogram("http_request_duration_seconds", "Latence des requêtes HTTP",
+                                 ("method", "path"))
+STAGE_SECONDS = metrics.histogram("prediction_stage_duration_seconds",
+                                  "Durée de chaque étape d'une prédiction "
+                                  "(validation, transform, predict, serialization)", ("stage",))
+BATCH_SIZE = metrics.histogram("batch_predict_size", "Nombre de voitures par requête /predict/batch",
+                               buckets=SIZE_BUCKETS)
+MODEL_LOAD_SECONDS = metrics.histogram("model_load_duration_seconds",
+                                       "Durée de chargement + préchauffage d'un modèle")
+MODEL_LOAD_FAILURES = metrics.counter("model_load_failures_total", "Chargements de modèle en échec")
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, requests=HTTP_REQUESTS, errors=HTTP_ERRORS, latency=HTTP_LATENCY)
+
+# 🔬 Profilage à la demande (endpoints /admin/*, désactivés si ADMIN_TOKEN n'est pas défini)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+profiler = SamplingProfiler()
+
+# Le modèle reçoit une matrice NumPy (encoder compilé) et non un DataFrame
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+EXAMPLE_CAR = {
+    "year": 2020,
+    "km_driven": 35000,
+    "fuel": "Diesel",
+    "transmission": "Automatic",
+    "owner": "First",
+    "engine_cc": 1500,
+    "seats": 5
+}
+
+def _load_bundle(version=None):
+    """
+    Charge un ModelBundle (modèle + preprocessor d'une même version) et le
+    préchauffe avant qu'il ne soit visible par les requêtes.
+    """
+    start = time.perf_counter()
+    try:
+        if version or (not os.getenv("MODEL_PATH") and registry.current_version()):
+            new_bundle = registry.load_bundle(version)
+        else:
+            new_bundle = ModelBundle.load(*_artifact_paths())
+        # Préchauffage : premier predict (pages mappées, caches) hors du chemin des requêtes
+        new_bundle.predict_rows([EXAMPLE_CAR])
+    except Exception:
+        MODEL_LOAD_FAILURES.inc()
+        raise
+    MODEL_LOAD_SECONDS.observe(time.perf_counter() - start)
+    return new_bundle
+
+cache = PredictionCache(CACHE_MAX_SIZE, ttl=CACHE_TTL_SECONDS) if CACHE_MAX_SIZE > 0 else None
+
+# 📝 Journal des prédictions : écrit en arrière-plan, ne bloque jamais une requête
+prediction_log = PredictionLogger(
+    PREDICTION_LOG_PATH,
+    capacity=PREDICTION_LOG_CAPACITY,
+    max_bytes=PREDICTION_LOG_MAX_BYTES,
+    backup_count=PREDICTION_LOG_BACKUPS,
+    compress=PREDICTION_LOG_COMPRESS
+) if PREDICTION_LOG_ENABLED else None
+if prediction_log is not None:
+    atexit.register(prediction_log.close)
+
 # 📦 Chargement du modèle et du preprocessor
+# `bundle` n'est jamais modifié : un rechargement remplace la référence d'un
+# seul coup, une requête en cours garde donc un couple modèle/preprocessor cohérent.
+_reload_lock = threading.Lock()
 try:
-    model = joblib.load('models/production_model.pkl')
-    preprocessor = DataPreprocessor.load('models/preprocessor.pkl')
-    print("✅ Modèle et preprocessor chargés avec succès")
+    bundle = _load_bundle()
+    print(f"✅ Modèle et preprocessor chargés avec succès (version {bundle.version})")
 except Exception as e:
     print(f"❌ Erreur de chargement : {e}")
-    model = None
-    preprocessor = None
+    bundle = None
+
+def _swap_bundle(version=None):
+    """Précharge puis échange le bundle en production (une seule affectation)"""
+    global bundle
+    with _reload_lock:
+        new_bundle = _load_bundle(version)
+        bundle = new_bundle
+        # Les prédictions en cache appartiennent à l'ancienne version
+        if cache is not None:
+            cache.clear()
+    return new_bundle
+
+def _watch_registry():
+    """Suit le pointeur CURRENT du registre et bascule sans redémarrage"""
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        current = registry.current_version()
+        loaded = bundle
+        if current and (loaded is None or loaded.version != current):
+            try:
+                _swap_bundle(current)
+                print(f"🔄 Version {current} chargée depuis le registre")
+            except Exception as e:
+                print(f"❌ Échec du chargement de la version {current} : {e}")
+
+if MODEL_WATCH_INTERVAL > 0 and not os.getenv("MODEL_PATH"):
+    threading.Thread(target=_watch_registry, name="model-watcher", daemon=True).start()
+
+# 🔀 Routage : les modèles spécialisés sont chargés une fois ; les lignes sans
+# règle restent servies par `bundle` (et suivent donc ses rechargements)
+_router_lock = threading.Lock()
+router = None
+
+def _load_route_bundle(version):
+    route_bundle = registry.load_bundle(version)
+    route_bundle.predict_rows([EXAMPLE_CAR])
+    return route_bundle
+
+def _swap_router(path=None):
+    """(Re)charge les règles de routage depuis `path` (None : routage désactivé)"""
+    global router
+    with _router_lock:
+        new_router = ModelRouter.load(path, _load_route_bundle) if path else None
+        router = new_router if new_router is not None and new_router.rules else None
+        # Une même entrée peut changer de modèle : le cache n'est plus valable
+        if cache is not None:
+            cache.clear()
+    return router
+
+if ROUTING_CONFIG:
+    try:
+        _swap_router(ROUTING_CONFIG)
+        print(f"🔀 Routage chargé ({ROUTING_CONFIG})")
+    except Exception as e:
+        print(f"❌ Routage non chargé : {e}")
+
+# 👻 Modèle fantôme : prédit en arrière-plan, par lots, les lignes déjà servies
+_shadow_lock = threading.Lock()
+shadow = None
+
+def _swap_shadow(version=None):
+    """Charge (version du registre) ou retire (None) le modèle fantôme"""
+    global shadow
+    with _shadow_lock:
+        new_shadow = None
+        if version:
+            shadow_bundle = registry.load_bundle(version)
+            shadow_bundle.predict_rows([EXAMPLE_CAR])
+            new_shadow = ShadowScorer(shadow_bundle, capacity=SHADOW_CAPACITY,
+                                      batch_size=SHADOW_BATCH_SIZE,
+                                      threshold_pct=SHADOW_THRESHOLD_PCT,
+                                      pairs_path=SHADOW_PAIRS_PATH)
+        previous, shadow = shadow, new_shadow
+    if previous is not None:
+        previous.close()
+    return new_shadow
+
+def _shadow_submit(rows, predictions, version):
+    current_shadow = shadow
+    if current_shadow is not None:
+        current_shadow.submit(rows, predictions, version)
+
+if SHADOW_MODEL_VERSION:
+    try:
+        _swap_shadow(SHADOW_MODEL_VERSION)
+        print(f"👻 Modèle fantôme chargé (version {SHADOW_MODEL_VERSION})")
+    except Exception as e:
+        print(f"❌ Modèle fantôme non chargé : {e}")
+atexit.register(_swap_shadow, None)
 
 # 📊 Schéma de données pour la validation
 class CarInput(BaseModel):
@@ -61,9 +280,120 @@ class PredictionResponse(BaseModel):
     input_data: dict
     timestamp: str
 
+class BatchPredictionError(BaseModel):
+    index: int
+    detail: str
+
 class BatchPredictionResponse(BaseModel):
     predictions: List[PredictionResponse]
     total_cars: int
+    valid_cars: int = 0
+    failed_cars: int = 0
+    errors: List[BatchPredictionError] = []
+
+# 🧮 Outils de prédiction partagés par /predict et /predict/batch
+def _confidence(prediction):
+    """Niveau de confiance (simplifié) associé à un prix prédit"""
+    if 10000 <= prediction <= 50000:
+        return "high"
+    elif 5000 <= prediction <= 70000:
+        return "medium"
+    return "low"
+
+def _timed_predict(current, rows):
+    """Comme current.predict_rows, en chronométrant transform et predict"""
+    with STAGE_SECONDS.time(("transform",)):
+        X = current.encoder.transform(rows)
+    with STAGE_SECONDS.time(("predict",)):
+        return current.model.predict(X)
+
+def _staged_predict(current, rows):
+    """
+    Prédit avec `current`, ou par route si le routage est actif (un predict par modèle)
+
+    Returns:
+        (prédictions, version du modèle qui a prédit chaque ligne)
+    """
+    active_router = router
+    if active_router is None:
+        return _timed_predict(current, rows), [current.version] * len(rows)
+    return active_router.predict_rows(rows, current, _timed_predict)
+
+def _predict_rows(rows, current):
+    """
+    Prétraite et prédit une liste de dicts avec le bundle `current` capturé par la requête
+
+    Returns:
+        une paire (prédiction, version) par ligne
+    """
+    # Aussi appelé par le thread du micro-batching : suivi sans compter de requête
+    with profiler.track(count=False):
+        return list(zip(*_staged_predict(current, rows)))
+
+def _validate(raw):
+    """Valide une ligne brute (CarInput) et retourne son dict"""
+    with STAGE_SECONDS.time(("validation",)):
+        if not isinstance(raw, dict):
+            raise TypeError("une voiture doit être un objet JSON")
+        return CarInput(**raw).dict()
+
+# Chaque ligne porte le bundle de sa requête : pendant un /model/reload, un lot
+# mêlant ancienne et nouvelle version fait un predict par version
+batcher = MicroBatcher(
+    _predict_rows,
+    max_wait_ms=MICROBATCH_MAX_WAIT_MS,
+    max_batch_size=MICROBATCH_MAX_SIZE
+) if MICROBATCH_ENABLED else None
+
+def _cached_predict(rows, current):
+    """
+    Prédit une liste de dicts avec `current` en ne passant au modèle que les
+    absents du cache (clés et valeurs viennent donc de la même version)
+
+    Returns:
+        une paire (prédiction, version du modèle qui l'a produite) par ligne
+    """
+    if cache is None:
+        return _predict_rows(rows, current)
+    keys = [cache.make_key(current.version, row) for row in rows]
+    predictions = [cache.get(key) for key in keys]
+    missing = [i for i, p in enumerate(predictions) if p is None]
+    if missing:
+        if len(missing) == 1 and batcher is not None:
+            computed = [batcher.predict(rows[missing[0]], current)]
+        else:
+            computed = _predict_rows([rows[i] for i in missing], current)
+        for i, prediction in zip(missing, computed):
+            predictions[i] = prediction
+            cache.put(keys[i], prediction)
+    return predictions
+
+def _record_predictions(rows, prices, versions, current, latency_ms, source):
+    """
+    Journalise chaque prix avec la version qui l'a produit ; seules les lignes
+    servies par le modèle en production sont comparées au modèle fantôme
+    """
+    if prediction_log is not None:
+        for row, price, version in zip(rows, prices, versions):
+            prediction_log.log(row, price, version, latency_ms, source)
+    champion = [i for i, version in enumerate(versions) if version == current.version]
+    if len(champion) == len(rows):
+        _shadow_submit(rows, prices, current.version)
+    elif champion:
+        _shadow_submit([rows[i] for i in champion], [prices[i] for i in champion], current.version)
+
+def _build_response(prediction, input_data):
+    return PredictionResponse(
+        predicted_price=round(float(prediction), 2),
+        confidence=_confidence(prediction),
+        input_data=input_data,
+        timestamp=datetime.now().isoformat()
+    )
+
+def _json_response(response):
+    """Sérialise la réponse ici (chronométré) : FastAPI la renvoie telle quelle"""
+    with STAGE_SECONDS.time(("serialization",)):
+        return Response(response.model_dump_json(), media_type="application/json")
 
 # 🏠 Route principale
 @app.get("/")
@@ -72,12 +402,21 @@ def home():
     return {
         "message": "🚗 Bienvenue sur l'API Car Price Prediction",
         "status": "running",
-        "model_loaded": model is not None,
+        "model_loaded": bundle is not None,
         "endpoints": {
             "health": "/health",
             "predict": "/predict (POST)",
             "batch_predict": "/predict/batch (POST)",
+            "stream_predict": "/predict/stream (POST, fichier NDJSON/CSV)",
             "model_info": "/model/info",
+            "model_versions": "/model/versions",
+            "model_routes": "/model/routes",
+            "batching_stats": "/batching/stats",
+            "cache_stats": "/cache/stats",
+            "prediction_log_stats": "/predictions/log/stats",
+            "drift": "/monitoring/drift",
+            "shadow_stats": "/shadow/stats",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
@@ -86,17 +425,19 @@ def home():
 @app.get("/health")
 def health_check():
     """Vérifie que l'API et le modèle sont opérationnels"""
-    if model is None or preprocessor is None:
+    if bundle is None:
         raise HTTPException(status_code=503, detail="Modèle non chargé")
     return {
         "status": "healthy",
         "model_loaded": True,
+        "model_version": bundle.version,
         "timestamp": datetime.now().isoformat()
     }
 
 # 🔮 Prédiction simple
 @app.post("/predict", response_model=PredictionResponse)
-def predict_price(car: CarInput):
+@profiler.profiled
+def predict_price(car: CarInput, request: Request):
     """
     Prédit le prix d'une voiture
     
@@ -106,91 +447,426 @@ def predict_price(car: CarInput):
     Returns:
         PredictionResponse avec le prix prédit
     """
-    if model is None or preprocessor is None:
+    # Validation faite par FastAPI avant l'appel : mesurée depuis l'arrivée de
+    # la requête (lecture du corps + pydantic + attente d'un thread libre)
+    request_start = getattr(request.state, "request_start", None)
+    if request_start is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - request_start, ("validation",))
+    current = bundle
+    if current is None:
         raise HTTPException(status_code=503, detail="Modèle non disponible")
     
     try:
-        # Convertir en DataFrame
-        input_df = pd.DataFrame([car.dict()])
-        
-        # Prétraiter
-        X = preprocessor.transform(input_df)
-        
-        # Prédire
-        prediction = model.predict(X)[0]
-        
-        # Déterminer le niveau de confiance (simplifié)
-        if 10000 <= prediction <= 50000:
-            confidence = "high"
-        elif 5000 <= prediction <= 70000:
-            confidence = "medium"
+        # Cache, puis encoder compilé + modèle (en lot si le micro-batching est actif)
+        start = time.perf_counter()
+        input_data = car.dict()
+        if cache is not None:
+            prediction, version = _cached_predict([input_data], current)[0]
+        elif batcher is not None:
+            prediction, version = batcher.predict(input_data, current)
         else:
-            confidence = "low"
-        
-        return PredictionResponse(
-            predicted_price=round(prediction, 2),
-            confidence=confidence,
-            input_data=car.dict(),
-            timestamp=datetime.now().isoformat()
-        )
+            prediction, version = _predict_rows([input_data], current)[0]
+        _record_predictions([input_data], [prediction], [version], current,
+                            (time.perf_counter() - start) * 1000, "predict")
+        return _json_response(_build_response(prediction, input_data))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur de prédiction : {str(e)}")
 
 # 📦 Prédiction batch
+# Corps lu en dicts (validation ligne par ligne), documenté comme une liste de CarInput
+CarInputRows = Annotated[List[Dict[str, Any]], WithJsonSchema(
+    {"type": "array", "items": {"$ref": "#/components/schemas/CarInput"}})]
+
 @app.post("/predict/batch", response_model=BatchPredictionResponse)
-def batch_predict(cars: List[CarInput]):
+@profiler.profiled
+def batch_predict(cars: CarInputRows):
     """
     Prédit le prix de plusieurs voitures en une seule requête
     
+    Les lignes sont validées une par une : une ligne invalide produit une
+    entrée dans `errors` sans faire échouer le reste du lot. Les lignes
+    valides sont prétraitées et prédites en un seul appel vectorisé.
+    
     Args:
-        cars: Liste de voitures (List[CarInput])
+        cars: Liste de voitures (au format CarInput)
     
     Returns:
         BatchPredictionResponse avec toutes les prédictions
     """
-    if model is None or preprocessor is None:
+    current = bundle
+    if current is None:
         raise HTTPException(status_code=503, detail="Modèle non disponible")
     
+    # Validation ligne par ligne
+    start = time.perf_counter()
+    BATCH_SIZE.observe(len(cars))
+    rows, errors = [], []
+    for i, raw in enumerate(cars):
+        try:
+            rows.append(_validate(raw))
+        except (ValidationError, TypeError) as e:
+            errors.append(BatchPredictionError(index=i, detail=str(e)))
+    
     try:
         predictions = []
-        for car in cars:
-            result = predict_price(car)
-            predictions.append(result)
+        if rows:
+            # Une seule matrice, un seul transform, un seul predict (absents du cache)
+            prices, versions = zip(*_cached_predict(rows, current))
+            _record_predictions(rows, prices, versions, current,
+                                (time.perf_counter() - start) * 1000, "batch")
+            predictions = [_build_response(p, row) for p, row in zip(prices, rows)]
         
-        return BatchPredictionResponse(
+        return _json_response(BatchPredictionResponse(
             predictions=predictions,
-            total_cars=len(predictions)
-        )
+            total_cars=len(cars),
+            valid_cars=len(predictions),
+            failed_cars=len(errors),
+            errors=errors
+        ))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur batch : {str(e)}")
 
+# 🌊 Scoring en masse en flux (NDJSON / CSV)
+@app.post("/predict/stream")
+def stream_predict(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    include_input: bool = True,
+    chunk_size: int = 1000
+):
+    """
+    Score un fichier NDJSON ou CSV uploadé et renvoie les prédictions en flux
+    
+    Le fichier est lu et prédit par paquets de `chunk_size` lignes (encoder et
+    modèle vectorisés) ; chaque ligne du résultat est un objet NDJSON émis dès
+    que son paquet est prêt. La mémoire reste constante quelle que soit la
+    taille du fichier.
+    
+    Args:
+        file: fichier .ndjson/.jsonl (un objet CarInput par ligne) ou .csv
+        format: 'ndjson' ou 'csv' (déduit du nom de fichier sinon)
+        include_input: renvoyer ou non les données d'entrée avec chaque prédiction
+        chunk_size: nombre de lignes par paquet
+    """
+    current = bundle
+    if current is None:
+        raise HTTPException(status_code=503, detail="Modèle non disponible")
+    try:
+        fmt = detect_format(file.filename, file.content_type, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    chunk_size = max(1, min(chunk_size, 100000))
+    
+    def generate():
+        index = 0
+        for chunk in iter_chunks(iter_records(file.file, fmt), chunk_size):
+            rows, positions, lines = [], [], [None] * len(chunk)
+            for offset, raw in enumerate(chunk):
+                try:
+                    if isinstance(raw, Exception):
+                        raise raw
+                    rows.append(_validate(raw))
+                    positions.append(offset)
+                except (ValidationError, TypeError, ValueError) as e:
+                    lines[offset] = {"index": index + offset, "error": str(e)}
+            if rows:
+                # Un seul transform + predict par paquet, toujours avec le même bundle
+                start = time.perf_counter()
+                with profiler.track(count=False):
+                    prices, versions = _staged_predict(current, rows)
+                _record_predictions(rows, prices, versions, current,
+                                    (time.perf_counter() - start) * 1000, "stream")
+                for offset, row, prediction in zip(positions, rows, prices):
+                    line = {
+                        "index": index + offset,
+                        "predicted_price": round(float(prediction), 2),
+                        "confidence": _confidence(prediction)
+                    }
+                    if include_input:
+                        line["input_data"] = row
+                    lines[offset] = line
+            index += len(chunk)
+            with STAGE_SECONDS.time(("serialization",)):
+                payload = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+            yield payload
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 # ℹ️ Informations sur le modèle
 @app.get("/model/info")
 def model_info():
     """Retourne les informations sur le modèle en production"""
-    if model is None:
+    current = bundle
+    if current is None:
         raise HTTPException(status_code=503, detail="Modèle non chargé")
     
+    model = current.model
     return {
         "model_type": type(model).__name__,
-        "features": preprocessor.feature_names if preprocessor else [],
+        "version": current.version,
+        "features": current.preprocessor.feature_names,
         "model_params": model.get_params() if hasattr(model, 'get_params') else {},
-        "last_updated": "2025-01-15"  # À adapter avec une vraie date
+        "metrics": current.meta.get("metrics", {}),
+        "loaded_at": current.loaded_at,
+        "last_updated": current.meta.get("created_at", current.loaded_at)
+    }
+
+# 🗂️ Versions disponibles dans le registre
+@app.get("/model/versions")
+def model_versions():
+    """Liste les versions du registre et la version en production"""
+    return {
+        "current": registry.current_version(),
+        "loaded": bundle.version if bundle else None,
+        "versions": registry.versions()
     }
 
+# 📊 Statistiques du micro-batching
+@app.get("/batching/stats")
+def batching_stats():
+    """Profondeur de file et distribution des tailles de lot du micro-batching"""
+    if batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **batcher.stats()}
+
+# 📊 Statistiques du cache de prédictions
+@app.get("/cache/stats")
+def cache_stats():
+    """Compteurs hits / misses / évictions du cache de prédictions"""
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+# 📊 Statistiques du journal des prédictions
+@app.get("/predictions/log/stats")
+def prediction_log_stats():
+    """Enregistrements écrits, en attente et abandonnés (tampon plein)"""
+    if prediction_log is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_log.stats()}
+
+# 📈 Métriques Prometheus
+def _component_stats():
+    """Compteurs déjà tenus par le micro-batching, le cache et le journal"""
+    if batcher is not None:
+        stats = batcher.stats()
+        yield "microbatch_batches_total", "counter", "Lots envoyés au modèle", stats["batches"]
+        yield "microbatch_items_total", "counter", "Lignes prédites via le micro-batching", stats["items"]
+        yield "microbatch_queue_depth", "gauge", "Lignes en attente d'un lot", stats["queue_depth"]
+    if cache is not None:
+        stats = cache.stats()
+        yield "prediction_cache_hits_total", "counter", "Prédictions servies par le cache", stats["hits"]
+        yield "prediction_cache_misses_total", "counter", "Prédictions absentes du cache", stats["misses"]
+        yield "prediction_cache_evictions_total", "counter", "Entrées évincées du cache", stats["evictions"]
+        yield "prediction_cache_size", "gauge", "Entrées dans le cache", stats["size"]
+    if prediction_log is not None:
+        stats = prediction_log.stats()
+        yield "prediction_log_written_total", "counter", "Prédictions journalisées", stats["written"]
+        yield "prediction_log_dropped_total", "counter", "Prédictions abandonnées (tampon plein)", stats["dropped"]
+        yield "prediction_log_queued", "gauge", "Prédictions en attente d'écriture", stats["queued"]
+    current_shadow = shadow
+    if current_shadow is not None:
+        stats = current_shadow.stats()
+        yield "shadow_scored_total", "counter", "Lignes scorées par le modèle fantôme", stats["scored"]
+        yield "shadow_dropped_total", "counter", "Lignes abandonnées par le modèle fantôme (file pleine)", stats["dropped"]
+        if stats["scored"]:
+            yield "shadow_mean_abs_diff", "gauge", "Écart absolu moyen fantôme / production", stats["mean_abs_diff"]
+
+metrics.add_collector(_component_stats)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Toutes les métriques au format texte Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+# 🔬 Profilage à la demande (administration)
+def _require_admin(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Administration désactivée (ADMIN_TOKEN non défini)")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+@app.post("/admin/profile/start")
+async def profile_start(
+    requests: Optional[int] = 100,
+    seconds: Optional[float] = None,
+    interval_ms: float = 5.0,
+    allocations: bool = False,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Échantillonne les piles des prochaines `requests` requêtes (ou pendant
+    `seconds` secondes), avec traçage des allocations si `allocations`.
+    
+    Endpoint asynchrone : il tourne dans la boucle d'événements, qui est
+    alors échantillonnée aussi (lecture du corps et validation pydantic).
+    """
+    _require_admin(x_admin_token)
+    try:
+        return profiler.start(requests=requests, seconds=seconds, interval_ms=max(interval_ms, 0.5),
+                              allocations=allocations, threads=[threading.get_ident()])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/profile/stop")
+def profile_stop(x_admin_token: Optional[str] = Header(None)):
+    """Arrête la session en cours"""
+    _require_admin(x_admin_token)
+    profiler.stop()
+    return profiler.status()
+
+@app.get("/admin/profile")
+def profile_result(format: str = "json", x_admin_token: Optional[str] = Header(None)):
+    """
+    État et résultat de la dernière session. `format=collapsed` : piles au
+    format texte de flamegraph.pl / speedscope (« a;b;c N » par ligne).
+    """
+    _require_admin(x_admin_token)
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return {**profiler.status(), "result": profiler.result()}
+
+# 📉 Dérive des données servies
+_drift_lock = threading.Lock()
+_drift = {"version": None, "monitor": None}
+
+def _drift_monitor():
+    """Moniteur de dérive de la version en production (créé à la première demande)"""
+    if prediction_log is None:
+        raise HTTPException(status_code=503, detail="Journal des prédictions désactivé")
+    current = bundle
+    if current is None:
+        raise HTTPException(status_code=503, detail="Modèle non chargé")
+    with _drift_lock:
+        if _drift["monitor"] is None or _drift["version"] != current.version:
+            if os.path.exists(DRIFT_REFERENCE_PATH):
+                reference = DriftProfile.load(DRIFT_REFERENCE_PATH)
+            else:
+                try:
+                    reference = build_reference(current.model, current.preprocessor)
+                except FileNotFoundError as e:
+                    raise HTTPException(status_code=503, detail=f"Référence indisponible : {e}")
+            # Nouvelle version : fenêtre vide, sans relire le trafic de l'ancienne
+            previous = _drift["monitor"]
+            monitor = DriftMonitor(reference, prediction_log.path,
+                                   offset=previous.offset if previous is not None else 0)
+            _drift.update(version=current.version, monitor=monitor)
+        return _drift["monitor"]
+
+@app.get("/monitoring/drift")
+def drift_status():
+    """PSI / KS de chaque variable et des prédictions, trafic servi vs entraînement"""
+    monitor = _drift_monitor()
+    prediction_log.flush()
+    with _drift_lock:
+        new_rows = monitor.ingest()
+        return {"model_version": _drift["version"], "new_rows": new_rows, **monitor.report()}
+
+@app.post("/monitoring/drift/reset")
+def drift_reset():
+    """Vide la fenêtre courante (par exemple après un réentraînement)"""
+    monitor = _drift_monitor()
+    with _drift_lock:
+        monitor.reset()
+    return {"status": "success", "timestamp": datetime.now().isoformat()}
+
+@app.get("/monitoring/drift/report", response_class=HTMLResponse)
+def drift_report(limit: int = 5000):
+    """Rapport evidently complet (coûteux) sur les `limit` dernières prédictions"""
+    _drift_monitor()
+    prediction_log.flush()
+    try:
+        return HTMLResponse(evidently_report(bundle.preprocessor, prediction_log.path, limit))
+    except ImportError:
+        raise HTTPException(status_code=501, detail="evidently n'est pas installé")
+
+# 👻 Modèle fantôme
+@app.get("/shadow/stats")
+def shadow_stats(recent: int = 0, flush: bool = False):
+    """
+    Écarts entre le modèle fantôme et la production sur le trafic servi
+
+    Args:
+        recent: nombre de paires (entrée, production, fantôme) récentes à renvoyer
+        flush: scorer d'abord les lignes en attente
+    """
+    current_shadow = shadow
+    if current_shadow is None:
+        return {"enabled": False}
+    if flush:
+        current_shadow.flush()
+    return {"enabled": True, **current_shadow.stats(recent=max(0, min(recent, 100)))}
+
+@app.post("/shadow/load")
+def shadow_load(version: str):
+    """Charge une version du registre comme modèle fantôme (remplace le précédent)"""
+    try:
+        _swap_shadow(version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur de chargement du modèle fantôme : {str(e)}")
+    return {"status": "success", "version": version, "timestamp": datetime.now().isoformat()}
+
+@app.post("/shadow/unload")
+def shadow_unload():
+    """Retire le modèle fantôme (les lignes en attente sont scorées avant)"""
+    _swap_shadow(None)
+    return {"status": "success", "timestamp": datetime.now().isoformat()}
+
+# 🔀 Routage multi-modèles
+@app.get("/model/routes")
+def model_routes():
+    """Règles de routage, lignes servies par route et mémoire de chaque modèle chargé"""
+    current = bundle
+    default = {"version": current.version, **memory_footprint(current)} if current is not None else None
+    active_router = router
+    if active_router is None:
+        return {"enabled": False, "default": default}
+    return {"enabled": True, **active_router.stats(), "default": default,
+            "models": active_router.memory_usage()}
+
+@app.post("/model/routes/reload")
+def reload_routes():
+    """Relit ROUTING_CONFIG et recharge les modèles spécialisés"""
+    if not ROUTING_CONFIG:
+        raise HTTPException(status_code=400, detail="ROUTING_CONFIG non défini")
+    try:
+        new_router = _swap_router(ROUTING_CONFIG)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur de chargement du routage : {str(e)}")
+    return {"status": "success", "routes": len(new_router.rules) if new_router is not None else 0,
+            "timestamp": datetime.now().isoformat()}
+
 # 🧹 Recharger le modèle (utile pour le déploiement continu)
 @app.post("/model/reload")
-def reload_model():
-    """Recharge le modèle depuis le disque"""
-    global model, preprocessor
+def reload_model(version: Optional[str] = None, background: bool = False):
+    """
+    Recharge le modèle depuis le disque sans interrompre le service
+    
+    Le nouveau bundle est chargé et préchauffé à côté de l'ancien, puis
+    échangé en une seule affectation.
+    
+    Args:
+        version: version du registre à charger (CURRENT par défaut)
+        background: rend la main immédiatement, le chargement continue en tâche de fond
+    """
+    if background:
+        threading.Thread(target=_swap_bundle, args=(version,), daemon=True).start()
+        return {
+            "status": "loading",
+            "message": "Rechargement lancé en tâche de fond",
+            "timestamp": datetime.now().isoformat()
+        }
     try:
-        model = joblib.load('models/production_model.pkl')
-        preprocessor = DataPreprocessor.load('models/preprocessor.pkl')
+        new_bundle = _swap_bundle(version)
         return {
             "status": "success",
             "message": "Modèle rechargé avec succès",
+            "version": new_bundle.version,
+            "model_path": new_bundle.model_path,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -203,15 +879,7 @@ def get_example():
     return {
         "endpoint": "/predict",
         "method": "POST",
-        "example_body": {
-            "year": 2020,
-            "km_driven": 35000,
-            "fuel": "Diesel",
-            "transmission": "Automatic",
-            "owner": "First",
-            "engine_cc": 1500,
-            "seats": 5
-        },
+        "example_body": EXAMPLE_CAR,
         "curl_command": """
 curl -X POST "http://localhost:8000/predict" \\
   -H "Content-Type: application/json" \\
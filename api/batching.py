@@ -0,0 +1,146 @@
+"""
+Regroupement adaptatif (micro-batching) des requêtes /predict concurrentes
+Chaque requête dépose sa ligne dans une file ; un thread unique forme des lots
+et appelle la fonction de prédiction vectorisée une seule fois par lot.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesce les prédictions unitaires concurrentes en lots.
+
+    Le lot est envoyé dès qu'il atteint `max_batch_size` lignes ou que la
+    fenêtre `max_wait_ms` est écoulée. La fenêtre n'est appliquée que si de la
+    concurrence est détectée (file non vide ou lot précédent de plus d'une
+    ligne) : un client isolé ne paie donc aucune attente supplémentaire.
+
+    Une ligne peut porter un contexte (par exemple le modèle capturé par la
+    requête) : les lignes d'un lot sont alors prédites par contexte,
+    `predict_fn(lignes, contexte)`, dans l'ordre de leur arrivée.
+
+    Args:
+        predict_fn: fonction list[dict] (, contexte) -> séquence de prédictions
+        max_wait_ms: attente maximale pour compléter un lot
+        max_batch_size: taille maximale d'un lot
+    """
+    def __init__(self, predict_fn, max_wait_ms=2.0, max_batch_size=64):
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._last_batch_size = 0
+        self._batches = 0
+        self._items = 0
+        self._max_batch = 0
+        self._max_queue_depth = 0
+        self._batch_size_counts = {}
+        self._thread = threading.Thread(target=self._run, name="microbatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row, context=None):
+        """Ajoute une ligne à la file et retourne un Future de sa prédiction"""
+        future = Future()
+        self._queue.put((row, context, future))
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return future
+
+    def predict(self, row, context=None):
+        """Prédiction bloquante d'une ligne via le prochain lot"""
+        return self.submit(row, context).result()
+
+    def close(self):
+        """Arrête le thread après avoir traité les lignes déjà en file"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        """Métriques de la file et de la taille des lots"""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "batch_size_histogram": dict(sorted(self._batch_size_counts.items())),
+                "config": {
+                    "max_wait_ms": self.max_wait * 1000.0,
+                    "max_batch_size": self.max_batch_size
+                }
+            }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                # Pas de concurrence observée : on n'attend pas
+                if len(batch) == 1 and self._last_batch_size <= 1:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                # Remettre le signal d'arrêt pour la boucle principale
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            # Un appel par contexte (un seul hors rechargement de modèle)
+            groups = {}
+            for row, context, future in batch:
+                groups.setdefault(id(context), (context, []))[1].append((row, future))
+            for context, items in groups.values():
+                self._predict_group(context, items)
+            self._record(len(batch))
+
+    def _predict_group(self, context, items):
+        rows = [row for row, _ in items]
+        try:
+            if context is None:
+                predictions = self.predict_fn(rows)
+            else:
+                predictions = self.predict_fn(rows, context)
+            if len(predictions) != len(items):
+                # Sinon les appelants sans prédiction attendraient indéfiniment
+                raise ValueError(f"{len(predictions)} prédictions pour un lot de {len(items)} lignes")
+            for (_, future), prediction in zip(items, predictions):
+                future.set_result(prediction)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _record(self, size):
+        # Histogramme par puissances de deux : 1, 2, 4, 8, ...
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        with self._lock:
+            self._last_batch_size = size
+            self._batches += 1
+            self._items += size
+            self._max_batch = max(self._max_batch, size)
+            self._batch_size_counts[bucket] = self._batch_size_counts.get(bucket, 0) + 1
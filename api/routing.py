@@ -0,0 +1,223 @@
+"""
+Routage multi-modèles : chaque voiture est prédite par le modèle de son segment
+
+Configuration (JSON, variable ROUTING_CONFIG) : des règles évaluées dans
+l'ordre, la première qui correspond l'emporte ; une ligne sans règle va au
+modèle en production.
+
+    {"rules": [
+        {"name": "electric", "when": {"fuel": ["Electric", "Hybrid"]}, "version": "20261001-..."},
+        {"name": "old", "when": {"year": {"lt": 2010}}, "version": "20260915-..."}
+    ]}
+
+Condition par champ : une valeur (égalité), une liste (appartenance) ou des
+comparaisons {"lt", "le", "gt", "ge", "ne"}. Chaque version n'est chargée
+qu'une fois, même si plusieurs règles y mènent. Un lot est regroupé par
+modèle : un seul transform + predict par version, puis les prédictions sont
+replacées dans l'ordre d'origine.
+"""
+import json
+import mmap
+import sys
+import threading
+import types
+import numpy as np
+
+DEFAULT_ROUTE = 'default'
+
+_OPERATORS = {
+    'lt': lambda value, bound: value < bound,
+    'le': lambda value, bound: value <= bound,
+    'gt': lambda value, bound: value > bound,
+    'ge': lambda value, bound: value >= bound,
+    'ne': lambda value, bound: value != bound,
+}
+
+
+def _predicate(condition):
+    """Condition d'un champ -> fonction valeur -> bool"""
+    if isinstance(condition, (list, tuple)):
+        allowed = set(condition)
+        return lambda value: value in allowed
+    if isinstance(condition, dict):
+        unknown = set(condition) - set(_OPERATORS)
+        if unknown:
+            raise ValueError(f"Opérateurs inconnus : {sorted(unknown)}")
+        checks = [(_OPERATORS[op], bound) for op, bound in condition.items()]
+        return lambda value: value is not None and all(check(value, bound) for check, bound in checks)
+    return lambda value: value == condition
+
+
+class RoutingRule:
+    def __init__(self, name, when, version):
+        if not when:
+            raise ValueError(f"Règle '{name}' sans condition")
+        self.name = name
+        self.when = when
+        self.version = version
+        self._checks = [(field, _predicate(condition)) for field, condition in when.items()]
+
+    def matches(self, row):
+        return all(check(row.get(field)) for field, check in self._checks)
+
+
+def memory_footprint(obj):
+    """
+    Mémoire occupée par un objet et tout ce qu'il référence (modèle,
+    preprocessor, encoder) : tableaux NumPy comptés par leurs octets, les vues
+    sur un artefact mappé à part (page cache, partagé entre workers).
+
+    Returns:
+        {'heap_bytes': ..., 'mapped_bytes': ...}
+    """
+    # `visited` garde en vie les objets temporaires (états __getstate__) : ids jamais réutilisés
+    seen, buffers, visited = set(), set(), []
+    heap = mapped = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, (type, types.ModuleType)):
+            continue
+        seen.add(id(current))
+        visited.append(current)
+        if isinstance(current, np.ndarray):
+            # Les vues partagent le tampon de leur base : compté une seule fois
+            heap += sys.getsizeof(current) - (current.nbytes if current.flags.owndata else 0)
+            base = current
+            while isinstance(base, np.ndarray) and base.base is not None:
+                base = base.base
+            if isinstance(base, memoryview):
+                base = base.obj
+            if isinstance(base, mmap.mmap):
+                mapped += current.nbytes
+            elif isinstance(base, np.ndarray):
+                if id(base) not in buffers:
+                    buffers.add(id(base))
+                    heap += base.nbytes
+            else:
+                # Tampon exposé par un autre objet (arbre sklearn, bytes) : la zone de la vue
+                key = (id(base), current.__array_interface__['data'][0], current.nbytes)
+                if key not in buffers:
+                    buffers.add(key)
+                    heap += current.nbytes
+            if current.dtype.hasobject:
+                stack.extend(current.ravel().tolist())
+            continue
+        heap += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, int, float, bool, type(None))):
+            continue
+        elif hasattr(current, '__dict__'):
+            stack.append(vars(current))
+        elif hasattr(current, '__getstate__'):
+            # Objets Cython sans __dict__ (arbres sklearn) : leurs tableaux sont dans l'état
+            try:
+                stack.append(current.__getstate__())
+            except TypeError:
+                pass
+    return {'heap_bytes': heap, 'mapped_bytes': mapped}
+
+
+class ModelRouter:
+    """
+    Args:
+        rules: liste de RoutingRule (dans l'ordre d'évaluation)
+        bundles: {version: ModelBundle} des versions utilisées par les règles
+    """
+    def __init__(self, rules, bundles):
+        missing = {rule.version for rule in rules} - set(bundles)
+        if missing:
+            raise ValueError(f"Versions non chargées : {sorted(missing)}")
+        names = [rule.name for rule in rules]
+        if len(set(names)) != len(names) or DEFAULT_ROUTE in names:
+            raise ValueError(f"Noms de règles en double ou réservés ('{DEFAULT_ROUTE}') : {names}")
+        self.rules = rules
+        self.bundles = bundles
+        self._lock = threading.Lock()
+        self._counts = {name: 0 for name in names + [DEFAULT_ROUTE]}
+
+    @classmethod
+    def from_config(cls, config, load_bundle):
+        """
+        Args:
+            config: dict {'rules': [...]} (cf. docstring du module)
+            load_bundle: fonction version -> ModelBundle, appelée une fois par version
+        """
+        rules = [RoutingRule(r.get('name') or r['version'], r['when'], r['version'])
+                 for r in config.get('rules', [])]
+        bundles = {}
+        for rule in rules:
+            if rule.version not in bundles:
+                bundles[rule.version] = load_bundle(rule.version)
+        return cls(rules, bundles)
+
+    @classmethod
+    def load(cls, path, load_bundle):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_config(json.load(f), load_bundle)
+
+    def route(self, row):
+        """Index de la première règle qui correspond (-1 : modèle par défaut)"""
+        for i, rule in enumerate(self.rules):
+            if rule.matches(row):
+                return i
+        return -1
+
+    def predict_rows(self, rows, default, predict=None):
+        """
+        Prédit une liste de dicts, un appel vectorisé par modèle : les règles
+        qui mènent à la même version (y compris celle du modèle par défaut)
+        partagent un seul predict.
+
+        Args:
+            default: ModelBundle des lignes sans règle (production)
+            predict: fonction (bundle, lignes) -> prédictions (bundle.predict_rows par défaut)
+        Returns:
+            (tableau des prédictions, liste des versions qui les ont produites),
+            dans l'ordre de `rows`
+        """
+        predict = predict or (lambda bundle, group: bundle.predict_rows(group))
+        routes = np.fromiter((self.route(row) for row in rows), dtype=np.int64, count=len(rows))
+        # Version de chaque route ; la dernière (index -1) est celle du modèle par défaut
+        versions = [rule.version for rule in self.rules] + [default.version]
+        bundles = {default.version: default, **self.bundles}
+        distinct = list(dict.fromkeys(versions))
+        models = np.array([distinct.index(v) for v in versions], dtype=np.int64)[routes]
+        self._count(np.bincount(routes + 1, minlength=len(self.rules) + 1))
+        row_versions = [distinct[m] for m in models]
+        if len(rows) and (models == models[0]).all():
+            # Cas courant (ligne seule, lot homogène) : ni regroupement ni réordonnancement
+            return np.asarray(predict(bundles[distinct[models[0]]], rows), dtype=np.float64), row_versions
+        out = np.empty(len(rows), dtype=np.float64)
+        order = np.argsort(models, kind='stable')
+        boundaries = np.flatnonzero(np.diff(models[order])) + 1
+        for group in np.split(order, boundaries):
+            if len(group):
+                bundle = bundles[distinct[models[group[0]]]]
+                out[group] = predict(bundle, [rows[i] for i in group])
+        return out, row_versions
+
+    def _count(self, sizes):
+        """`sizes` : lignes par route, celles du modèle par défaut en premier"""
+        with self._lock:
+            self._counts[DEFAULT_ROUTE] += int(sizes[0])
+            for rule, n in zip(self.rules, sizes[1:]):
+                self._counts[rule.name] += int(n)
+
+    def memory_usage(self):
+        """Mémoire de chaque version chargée (modèle + preprocessor + encoder)"""
+        return {version: {**memory_footprint(bundle),
+                          'routes': [r.name for r in self.rules if r.version == version]}
+                for version, bundle in self.bundles.items()}
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            'rules': [{'name': r.name, 'when': r.when, 'version': r.version} for r in self.rules],
+            'rows_per_route': counts
+        }
@@ -0,0 +1,185 @@
+"""
+Scoring fantôme (shadow) : un modèle candidat score le trafic réel sans servir de réponse
+
+Le chemin des requêtes ne fait qu'ajouter (lignes, prédictions servies) dans
+une file bornée ; un thread d'arrière-plan regroupe les lignes en lots,
+les prédit avec le modèle fantôme en un seul appel vectorisé et tient à jour
+les statistiques d'écart avec le modèle en production. File pleine : les
+lignes sont comptées puis abandonnées, la réponse principale n'attend jamais.
+
+Les paires (entrée, prédiction servie, prédiction fantôme) peuvent être
+écrites en NDJSON pour une analyse hors ligne.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+
+
+class ShadowScorer:
+    """
+    Args:
+        bundle: ModelBundle du modèle fantôme
+        capacity: nombre maximal de lignes en attente
+        batch_size: lignes prédites par appel au modèle fantôme
+        flush_interval: délai maximal (s) avant de scorer un lot incomplet
+        threshold_pct: écart relatif au-delà duquel une paire est comptée comme divergente
+        pairs_path: fichier NDJSON des paires (None = pas d'écriture)
+        recent: nombre de paires récentes gardées en mémoire
+    """
+    def __init__(self, bundle, capacity=50000, batch_size=256, flush_interval=0.5,
+                 threshold_pct=10.0, pairs_path=None, recent=100):
+        self.bundle = bundle
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.threshold_pct = threshold_pct
+        self.pairs_path = pairs_path
+        self._queue = deque()
+        self._queued_rows = 0
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._score_lock = threading.Lock()
+        self._closed = False
+        self._recent = deque(maxlen=recent)
+        self._file = None
+        if pairs_path:
+            os.makedirs(os.path.dirname(pairs_path) or '.', exist_ok=True)
+            self._file = open(pairs_path, 'a', encoding='utf-8')
+        self.dropped = 0
+        self.failures = 0
+        self._n = 0
+        self._sum = 0.0
+        self._sum_abs = 0.0
+        self._sum_sq = 0.0
+        self._sum_abs_pct = 0.0
+        self._over = 0
+        self._max_abs = 0.0
+        self._seconds = 0.0
+        self._primary_versions = {}
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    @property
+    def version(self):
+        return self.bundle.version
+
+    def submit(self, rows, primary_predictions, primary_version):
+        """Chemin des requêtes : un append, jamais de prédiction ni d'attente d'un lot"""
+        n = len(rows)
+        with self._lock:
+            if self._closed or self._queued_rows + n > self.capacity:
+                self.dropped += n
+                return False
+            self._queued_rows += n
+            queued = self._queued_rows
+        self._queue.append((rows, primary_predictions, primary_version, time.time()))
+        if queued >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _take_batch(self):
+        items, n = [], 0
+        while self._queue and n < self.batch_size:
+            item = self._queue.popleft()
+            items.append(item)
+            n += len(item[0])
+        with self._lock:
+            self._queued_rows -= n
+        return items
+
+    def _score(self):
+        """Prédit les lignes en attente, par lots (thread d'arrière-plan)"""
+        with self._score_lock:
+            while self._queue:
+                items = self._take_batch()
+                if not items:
+                    return
+                rows = [row for item in items for row in item[0]]
+                primary = np.concatenate([np.asarray(item[1], dtype=np.float64) for item in items])
+                start = time.perf_counter()
+                try:
+                    shadow = np.asarray(self.bundle.predict_rows(rows), dtype=np.float64)
+                except Exception as e:
+                    with self._lock:
+                        self.failures += len(rows)
+                    print(f"⚠️ Modèle fantôme : échec de prédiction ({e})")
+                    continue
+                self._update(items, rows, primary, shadow, time.perf_counter() - start)
+
+    def _update(self, items, rows, primary, shadow, seconds):
+        diff = shadow - primary
+        abs_diff = np.abs(diff)
+        abs_pct = abs_diff / np.maximum(np.abs(primary), 1e-9) * 100
+        with self._lock:
+            self._n += len(rows)
+            self._sum += float(diff.sum())
+            self._sum_abs += float(abs_diff.sum())
+            self._sum_sq += float((diff ** 2).sum())
+            self._sum_abs_pct += float(abs_pct.sum())
+            self._over += int((abs_pct > self.threshold_pct).sum())
+            self._max_abs = max(self._max_abs, float(abs_diff.max()))
+            self._seconds += seconds
+            for _, predictions, version, _ in items:
+                self._primary_versions[version] = self._primary_versions.get(version, 0) + len(predictions)
+        pairs, i = [], 0
+        for item_rows, _, version, ts in items:
+            timestamp = datetime.fromtimestamp(ts).isoformat()
+            for row in item_rows:
+                pairs.append({"timestamp": timestamp, "input": row,
+                              "primary_version": version, "primary": round(float(primary[i]), 2),
+                              "shadow_version": self.version, "shadow": round(float(shadow[i]), 2)})
+                i += 1
+        self._recent.extend(pairs[-self._recent.maxlen:])
+        if self._file is not None:
+            try:
+                self._file.write("".join(json.dumps(p, ensure_ascii=False) + "\n" for p in pairs))
+                self._file.flush()
+            except OSError as e:
+                print(f"⚠️ Modèle fantôme : écriture des paires impossible ({e})")
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._score()
+
+    def flush(self):
+        """Score immédiatement tout ce qui est en attente (tests, arrêt)"""
+        self._score()
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self._score()
+        if self._file is not None:
+            self._file.close()
+
+    def stats(self, recent=0):
+        with self._lock:
+            n = self._n
+            stats = {
+                "shadow_version": self.version,
+                "primary_versions": dict(self._primary_versions),
+                "scored": n,
+                "queued": self._queued_rows,
+                "dropped": self.dropped,
+                "failures": self.failures,
+                "mean_diff": round(self._sum / n, 4) if n else None,
+                "mean_abs_diff": round(self._sum_abs / n, 4) if n else None,
+                "rmse_diff": round(math.sqrt(self._sum_sq / n), 4) if n else None,
+                "max_abs_diff": round(self._max_abs, 4) if n else None,
+                "mean_abs_pct_diff": round(self._sum_abs_pct / n, 4) if n else None,
+                "divergent_share": round(self._over / n, 4) if n else None,
+                "threshold_pct": self.threshold_pct,
+                "shadow_ms_per_row": round(self._seconds / n * 1000, 4) if n else None,
+                "pairs_path": self.pairs_path
+            }
+        if recent:
+            stats["recent"] = list(self._recent)[-recent:]
+        return stats
@@ -0,0 +1,83 @@
+"""
+Lecture incrémentale des fichiers de scoring en masse (NDJSON ou CSV)
+Les lignes sont lues une par une depuis le fichier uploadé : la mémoire
+utilisée ne dépend que de la taille des paquets, pas de celle du fichier.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+
+def detect_format(filename=None, content_type=None, fmt=None):
+    """Retourne 'csv' ou 'ndjson' (paramètre explicite, puis extension, puis type MIME)"""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in ("csv", "ndjson", "jsonl"):
+            raise ValueError(f"Format inconnu : {fmt}")
+        return "csv" if fmt == "csv" else "ndjson"
+    if (filename or "").lower().endswith(".csv") or "csv" in (content_type or ""):
+        return "csv"
+    return "ndjson"
+
+
+def _is_utf8(values):
+    """Faux si une valeur garde des octets non décodés (surrogateescape)"""
+    try:
+        for value in values:
+            if isinstance(value, str):
+                value.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def iter_records(binary_file, fmt):
+    """
+    Itère sur les lignes d'un fichier binaire sous forme de dicts.
+
+    Une ligne NDJSON ou CSV illisible (syntaxe ou UTF-8 invalide) produit un objet
+    ValueError à la place du dict, pour que l'appelant puisse la signaler sans
+    interrompre le flux.
+    """
+    # Octets invalides gardés tels quels : décodage sans exception, vérifié ligne par ligne
+    text = io.TextIOWrapper(binary_file, encoding="utf-8", errors="surrogateescape", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # Le lecteur reprend à la ligne suivante
+                yield ValueError(f"CSV invalide (ligne {reader.line_num}) : {e}")
+                continue
+            values = [*row]
+            for value in row.values():
+                values.extend(value if isinstance(value, list) else [value])
+            if not _is_utf8(values):
+                yield ValueError(f"CSV invalide (ligne {reader.line_num}) : encodage UTF-8 attendu")
+                continue
+            yield row
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        if not _is_utf8([line]):
+            yield ValueError("JSON invalide : encodage UTF-8 attendu")
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ValueError(f"JSON invalide : {e}")
+
+
+def iter_chunks(iterable, size):
+    """Découpe un itérable en listes de `size` éléments au plus"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,309 @@
+"""
+Micro-benchmarks des composants : prétraitement, préparation, entraînement, inférence
+Exécuter avec :
+    python benchmarks/components.py --sizes 1000 10000 100000 1000000
+    python benchmarks/components.py --components train_ridge predict --max-rows 10000000 --plot
+
+Chaque composant est mesuré sur des jeux synthétiques de taille croissante
+(générateur de src/download_data.py, graine fixe) : temps (meilleur de
+`repeat` essais), lignes/s et pic mémoire Python (tracemalloc, NumPy et
+pandas y déclarent leurs tableaux, lors d'un passage séparé pour ne pas
+fausser les temps). Pour chaque palier, l'exposant d'échelle
+log(t2/t1) / log(n2/n1) indique où le coût cesse d'être linéaire (≈ 1).
+
+Un composant dont un essai dépasse `max_seconds` n'est plus mesuré aux
+tailles supérieures. Tout est exécuté dans un dossier temporaire :
+prepare_data et train_model n'écrivent rien dans le dépôt.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT)
+from src.dataset_io import read_dataset
+from src.download_data import generate_dataset
+from src.preprocess import DataPreprocessor, prepare_data
+from src.tracking import Tracker
+from src.train import build_model, evaluate_model, train_model
+from src.utils import predict
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+MODEL_TYPES = ('random_forest', 'gradient_boosting', 'ridge')
+# Modèle fixe (entraîné sur 10 000 lignes) : evaluate / predict ne dépendent que du nombre de lignes scorées
+REFERENCE_ROWS = 10_000
+# Au-delà, l'exposant d'échelle signale une croissance plus que linéaire
+LINEAR_TOLERANCE = 1.2
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+
+class BenchContext:
+    """Données d'un palier, créées à la demande puis partagées entre composants"""
+    def __init__(self, n_rows, workdir, seed=0):
+        self.n_rows = n_rows
+        self.workdir = workdir
+        self.seed = seed
+        self._cache = {}
+
+    def _get(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def raw_path(self):
+        def build():
+            path = os.path.join(self.workdir, f"car_data_{self.n_rows}.parquet")
+            generate_dataset(self.n_rows, output_path=path, seed=self.seed)
+            return path
+        return self._get('raw_path', build)
+
+    @property
+    def df(self):
+        return self._get('df', lambda: read_dataset(self.raw_path))
+
+    def _fit(self):
+        preprocessor = DataPreprocessor()
+        X, y = preprocessor.fit_transform(self.df)
+        return preprocessor, X, y
+
+    @property
+    def preprocessor(self):
+        return self._get('fitted', self._fit)[0]
+
+    @property
+    def Xy(self):
+        return self._get('fitted', self._fit)[1:]
+
+    @property
+    def data(self):
+        def build():
+            from sklearn.model_selection import train_test_split
+            X, y = self.Xy
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            return X_train, X_test, y_train, y_test, self.preprocessor
+        return self._get('data', build)
+
+
+_reference_model = {}
+
+
+def reference_model(workdir, seed=0):
+    """Forêt de 50 arbres entraînée une fois sur REFERENCE_ROWS lignes"""
+    if 'model' not in _reference_model:
+        ctx = BenchContext(REFERENCE_ROWS, workdir, seed)
+        X, y = ctx.Xy
+        model = build_model('random_forest', n_estimators=50)
+        model.fit(X, y)
+        _reference_model.update(model=model, preprocessor=ctx.preprocessor)
+    return _reference_model['model'], _reference_model['preprocessor']
+
+
+# Chaque composant : ctx -> fonction sans argument à chronométrer
+def _fit_transform(ctx):
+    df = ctx.df
+    return lambda: DataPreprocessor().fit_transform(df)
+
+
+def _transform(ctx):
+    preprocessor, features = ctx.preprocessor, ctx.df.drop(columns='price')
+    return lambda: preprocessor.transform(features)
+
+
+def _prepare_data(ctx):
+    path = ctx.raw_path
+    return lambda: prepare_data(path, use_cache=False)
+
+
+def _prepare_data_cached(ctx):
+    path, cache_dir = ctx.raw_path, os.path.join(ctx.workdir, 'cache')
+    prepare_data(path, cache_dir=cache_dir)  # remplit le cache : seule la relecture est mesurée
+    return lambda: prepare_data(path, cache_dir=cache_dir)
+
+
+def _train(model_type):
+    def setup(ctx):
+        data, tracker = ctx.data, Tracker(mode='off')
+        return lambda: train_model(model_type, data=data, save=False, tracker=tracker)
+    return setup
+
+
+def _evaluate(ctx):
+    model, _ = reference_model(ctx.workdir, ctx.seed)
+    X, y = ctx.Xy
+    return lambda: evaluate_model(model, X, y)
+
+
+def _predict(ctx):
+    # src/utils.predict sur un DataFrame : transform + predict de toutes les lignes
+    model, preprocessor = reference_model(ctx.workdir, ctx.seed)
+    features = ctx.df.drop(columns='price')
+    return lambda: predict(model, preprocessor, features)
+
+
+COMPONENTS = {
+    'fit_transform': _fit_transform,
+    'transform': _transform,
+    'prepare_data': _prepare_data,
+    'prepare_data_cached': _prepare_data_cached,
+    **{f'train_{model_type}': _train(model_type) for model_type in MODEL_TYPES},
+    'evaluate_model': _evaluate,
+    'predict': _predict,
+}
+
+
+def measure(fn, repeat=3, memory=True):
+    """Meilleur temps sur `repeat` essais, puis pic mémoire sur un essai tracé"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(times), sorted(times)[len(times) // 2], peak
+
+
+def scaling_exponents(results):
+    """Exposant log(t2/t1) / log(n2/n1) entre paliers successifs d'un composant"""
+    by_component = {}
+    for result in results:
+        by_component.setdefault(result['component'], []).append(result)
+    curves = {}
+    for component, points in by_component.items():
+        points = sorted(points, key=lambda r: r['rows'])
+        exponents = []
+        for a, b in zip(points, points[1:]):
+            if a['seconds'] > 0 and b['seconds'] > 0:
+                exponents.append({'from_rows': a['rows'], 'to_rows': b['rows'],
+                                  'exponent': round(math.log(b['seconds'] / a['seconds'])
+                                                    / math.log(b['rows'] / a['rows']), 3)})
+        nonlinear = [e['from_rows'] for e in exponents if e['exponent'] > LINEAR_TOLERANCE]
+        curves[component] = {
+            'rows': [p['rows'] for p in points],
+            'seconds': [p['seconds'] for p in points],
+            'rows_per_s': [p['rows_per_s'] for p in points],
+            'exponents': exponents,
+            'nonlinear_from_rows': nonlinear[0] if nonlinear else None,
+        }
+    return curves
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, components=None, repeat=3, memory=True,
+                   max_seconds=60.0, seed=0, workdir=None):
+    """
+    Mesure chaque composant à chaque taille (dans l'ordre croissant).
+
+    Returns:
+        dict {'meta', 'results' (une entrée par composant et taille), 'curves'}
+    """
+    components = components or list(COMPONENTS)
+    unknown = set(components) - set(COMPONENTS)
+    if unknown:
+        raise ValueError(f"Composants inconnus : {sorted(unknown)}")
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='bench_')
+    previous_cwd = os.getcwd()
+    results, stopped = [], {}
+    try:
+        # prepare_data / train_model écrivent dans data/ et models/ relatifs
+        os.chdir(workdir)
+        os.makedirs('models', exist_ok=True)
+        for n_rows in sorted(sizes):
+            ctx = BenchContext(n_rows, workdir, seed)
+            for component in components:
+                if component in stopped:
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fn = COMPONENTS[component](ctx)
+                    best, median, peak = measure(fn, repeat, memory)
+                result = {
+                    'component': component,
+                    'rows': n_rows,
+                    'seconds': round(best, 6),
+                    'median_seconds': round(median, 6),
+                    'rows_per_s': round(n_rows / best, 1) if best else None,
+                    'peak_mb': round(peak / 1024 ** 2, 2) if peak is not None else None,
+                }
+                results.append(result)
+                print(f"⏱️ {component:<26} {n_rows:>10,} lignes  {best:>9.4f} s  "
+                      f"{result['rows_per_s']:>14,.0f} lignes/s  pic {result['peak_mb']} Mo")
+                if best > max_seconds:
+                    stopped[component] = n_rows
+            del ctx
+            gc.collect()
+    finally:
+        os.chdir(previous_cwd)
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        _reference_model.clear()
+    meta = {'timestamp': datetime.now().isoformat(), 'sizes': sorted(sizes), 'repeat': repeat,
+            'seed': seed, 'max_seconds': max_seconds, 'stopped_after': stopped,
+            'cpu_count': os.cpu_count()}
+    return {'meta': meta, 'results': results, 'curves': scaling_exponents(results)}
+
+
+def plot_curves(report, path):
+    """Courbes log-log temps / lignes (matplotlib)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(9, 6))
+    for component, curve in report['curves'].items():
+        ax.loglog(curve['rows'], curve['seconds'], marker='o', label=component)
+    ax.set_xlabel('lignes')
+    ax.set_ylabel('secondes')
+    ax.grid(True, which='both', alpha=0.3)
+    ax.legend(fontsize=8)
+    fig.savefig(path, dpi=120, bbox_inches='tight')
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmarks des composants")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--max-rows', type=int, default=None, help="ignorer les tailles supérieures")
+    parser.add_argument('--components', nargs='+', default=None, choices=sorted(COMPONENTS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="ne pas mesurer le pic mémoire")
+    parser.add_argument('--max-seconds', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--plot', action='store_true', help="enregistrer les courbes (PNG)")
+    args = parser.parse_args()
+
+    sizes = [n for n in args.sizes if args.max_rows is None or n <= args.max_rows]
+    report = run_benchmarks(sizes, args.components, args.repeat, not args.no_memory,
+                            args.max_seconds, args.seed)
+    output = os.path.abspath(args.output or os.path.join(
+        RESULTS_DIR, f"components_{datetime.now():%Y%m%d_%H%M%S}.json"))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Résultats → {output}")
+    for component, curve in report['curves'].items():
+        if curve['nonlinear_from_rows']:
+            print(f"📈 {component} : croissance plus que linéaire à partir de "
+                  f"{curve['nonlinear_from_rows']:,} lignes")
+    if args.plot:
+        plot_path = os.path.splitext(output)[0] + '.png'
+        plot_curves(report, plot_path)
+        print(f"🖼️ Courbes → {plot_path}")
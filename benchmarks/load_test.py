@@ -0,0 +1,295 @@
+"""
+Banc de charge de l'API : débit et latence par endpoint
+Exécuter avec :
+    python benchmarks/load_test.py --mode uvicorn --workers 1 2 4 --duration 10
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json  # échoue si régression
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+
+L'application est lancée dans le processus (TestClient, rapide à démarrer mais
+client et serveur se partagent le GIL) ou dans un sous-processus uvicorn pour
+chaque nombre de workers demandé. Chaque scénario rejoue pendant `duration`
+secondes, avec `concurrency` clients en parallèle, des requêtes construites à
+l'avance (le coût de sérialisation côté client n'est pas mesuré) :
+    predict_repeated   /predict, toujours la même voiture (servie par le cache)
+    predict_unique     /predict, une voiture différente à chaque requête
+    batch_<n>          /predict/batch de n voitures différentes
+
+Les entrées sont tirées du générateur de src/download_data.py avec une graine
+fixe : deux exécutions rejouent exactement les mêmes requêtes.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT)
+from src.download_data import generate_chunk
+
+DEFAULT_BATCH_SIZES = (1, 10, 100, 1000, 10000)
+# Lignes distinctes rejouées par scénario : au-delà de la taille du cache (LRU),
+# une ligne n'y est plus quand elle revient
+UNIQUE_ROWS = 50000
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+
+def make_rows(n_rows, seed=0):
+    """Voitures valides pour CarInput (sans le prix)"""
+    df = generate_chunk((n_rows, np.random.SeedSequence(seed))).drop(columns='price')
+    return df.to_dict('records')
+
+
+def build_scenarios(batch_sizes=DEFAULT_BATCH_SIZES, unique_rows=UNIQUE_ROWS, seed=0):
+    """
+    Returns:
+        liste de (nom, endpoint, lignes par requête, corps JSON pré-encodés rejoués en boucle)
+    """
+    rows = make_rows(unique_rows, seed)
+    scenarios = [
+        ('predict_repeated', '/predict', 1, [json.dumps(rows[0]).encode()]),
+        ('predict_unique', '/predict', 1, [json.dumps(row).encode() for row in rows]),
+    ]
+    for size in batch_sizes:
+        size = min(size, unique_rows)
+        bodies = [json.dumps(rows[start:start + size]).encode()
+                  for start in range(0, unique_rows - size + 1, size)]
+        scenarios.append((f'batch_{size}', '/predict/batch', size, bodies))
+    return scenarios
+
+
+def run_scenario(post, name, endpoint, rows_per_request, bodies, duration=5.0,
+                 concurrency=4, warmup=0.5, max_requests=None):
+    """Rejoue un scénario et retourne ses statistiques (latences en ms)"""
+    counter = itertools.count()
+    latencies, errors = [], []
+
+    def client(deadline, record):
+        # Une liste par client : pas de verrou pendant la mesure
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            i = next(counter)
+            if max_requests and record and i >= max_requests:
+                break
+            start = time.perf_counter()
+            try:
+                ok = post(endpoint, bodies[i % len(bodies)]) == 200
+            except Exception:
+                ok = False
+            local.append((time.perf_counter() - start) * 1000)
+            failed += not ok
+        if record:
+            latencies.extend(local)
+            errors.append(failed)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        if warmup:
+            list(executor.map(client, [time.perf_counter() + warmup] * concurrency, [False] * concurrency))
+        counter = itertools.count()
+        start = time.perf_counter()
+        list(executor.map(client, [start + duration] * concurrency, [True] * concurrency))
+        elapsed = time.perf_counter() - start
+
+    n = len(latencies)
+    lat = np.array(latencies) if n else np.zeros(1)
+    return {
+        'scenario': name,
+        'endpoint': endpoint,
+        'rows_per_request': rows_per_request,
+        'concurrency': concurrency,
+        'requests': n,
+        'errors': int(sum(errors)),
+        'seconds': round(elapsed, 3),
+        'rps': round(n / elapsed, 2),
+        'rows_per_s': round(n * rows_per_request / elapsed, 1),
+        'mean_ms': round(float(lat.mean()), 3),
+        'p50_ms': round(float(np.percentile(lat, 50)), 3),
+        'p95_ms': round(float(np.percentile(lat, 95)), 3),
+        'p99_ms': round(float(np.percentile(lat, 99)), 3),
+        'max_ms': round(float(lat.max()), 3),
+    }
+
+
+class InProcessTarget:
+    """Application importée dans le processus courant (TestClient)"""
+    workers = 0
+
+    def __enter__(self):
+        from fastapi.testclient import TestClient
+        from api.app import app
+        self._client = TestClient(app).__enter__()
+        return self
+
+    def post(self, endpoint, body):
+        return self._client.post(endpoint, content=body,
+                                 headers={'Content-Type': 'application/json'}).status_code
+
+    def __exit__(self, *exc):
+        self._client.__exit__(*exc)
+
+
+class UvicornTarget:
+    """Serveur uvicorn lancé en sous-processus, sur un port libre"""
+    def __init__(self, workers=1, startup_timeout=120):
+        self.workers = workers
+        self.startup_timeout = startup_timeout
+        self._local = threading.local()
+
+    def __enter__(self):
+        import requests
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'api.app:app', '--host', '127.0.0.1',
+             '--port', str(port), '--workers', str(self.workers), '--log-level', 'warning'],
+            cwd=ROOT)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"uvicorn s'est arrêté (code {self._process.returncode})")
+            try:
+                if requests.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise TimeoutError(f"uvicorn n'a pas répondu en {self.startup_timeout} s")
+
+    def post(self, endpoint, body):
+        # Une session (connexion keep-alive) par thread client
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session.post(self.base_url + endpoint, data=body,
+                            headers={'Content-Type': 'application/json'}).status_code
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load_test(mode='inprocess', workers=(1,), duration=5.0, concurrency=4,
+                  batch_sizes=DEFAULT_BATCH_SIZES, scenarios=None, unique_rows=UNIQUE_ROWS,
+                  warmup=0.5, max_requests=None, seed=0):
+    """
+    Joue tous les scénarios pour chaque nombre de workers (mode uvicorn) ou
+    une seule fois (mode inprocess).
+
+    Returns:
+        dict {'meta': ..., 'results': [une entrée par scénario et nombre de workers]}
+    """
+    all_scenarios = build_scenarios(batch_sizes, unique_rows, seed)
+    if scenarios:
+        all_scenarios = [s for s in all_scenarios if s[0] in scenarios]
+    targets = [InProcessTarget()] if mode == 'inprocess' else [UvicornTarget(w) for w in workers]
+    results = []
+    for target in targets:
+        with target:
+            for name, endpoint, rows_per_request, bodies in all_scenarios:
+                stats = run_scenario(target.post, name, endpoint, rows_per_request, bodies,
+                                     duration=duration, concurrency=concurrency,
+                                     warmup=warmup, max_requests=max_requests)
+                stats['workers'] = target.workers
+                results.append(stats)
+                print(f"⏱️ {name:<18} workers={target.workers} {stats['rps']:>9.1f} req/s  "
+                      f"p50={stats['p50_ms']:.2f} ms  p95={stats['p95_ms']:.2f} ms  "
+                      f"p99={stats['p99_ms']:.2f} ms  erreurs={stats['errors']}")
+    meta = {
+        'timestamp': datetime.now().isoformat(),
+        'commit': _git_commit(),
+        'mode': mode,
+        'duration': duration,
+        'concurrency': concurrency,
+        'seed': seed,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare_to_baseline(report, baseline, threshold=0.2):
+    """
+    Régressions par rapport à une référence : débit en baisse ou p95 en
+    hausse de plus de `threshold` (20 % par défaut) pour un même scénario et
+    un même nombre de workers.
+
+    Returns:
+        liste de messages (vide si aucune régression)
+    """
+    reference = {(r['scenario'], r['workers']): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        base = reference.get((result['scenario'], result['workers']))
+        if base is None:
+            continue
+        label = f"{result['scenario']} (workers={result['workers']})"
+        if result['rps'] < base['rps'] * (1 - threshold):
+            regressions.append(f"{label} : débit {result['rps']} req/s < {base['rps']} req/s")
+        if result['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(f"{label} : p95 {result['p95_ms']} ms > {base['p95_ms']} ms")
+        if result['errors'] > base['errors']:
+            regressions.append(f"{label} : {result['errors']} erreurs (référence : {base['errors']})")
+    return regressions
+
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Banc de charge de l'API")
+    parser.add_argument('--mode', choices=['inprocess', 'uvicorn'], default='inprocess')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    parser.add_argument('--duration', type=float, default=5.0, help="secondes par scénario")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument('--scenarios', nargs='+', default=None, help="noms des scénarios à jouer")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="fichier JSON des résultats")
+    parser.add_argument('--baseline', default=None, help="référence JSON à ne pas dégrader")
+    parser.add_argument('--threshold', type=float, default=0.2)
+    parser.add_argument('--save-baseline', default=None, help="enregistrer ces résultats comme référence")
+    args = parser.parse_args()
+
+    report = run_load_test(args.mode, args.workers, args.duration, args.concurrency,
+                           args.batch_sizes, args.scenarios, seed=args.seed)
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    save_report(report, output)
+    print(f"💾 Résultats → {output}")
+    if args.save_baseline:
+        save_report(report, args.save_baseline)
+        print(f"📌 Référence enregistrée → {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_to_baseline(report, json.load(f), args.threshold)
+        for message in regressions:
+            print(f"❌ Régression : {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ Aucune régression au-delà de {args.threshold:.0%}")
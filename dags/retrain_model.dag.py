@@ -4,8 +4,31 @@ from datetime import datetime, timedelta
 import pandas as pd
 import pickle
 import os
+import shutil
+import sys
 from pathlib import Path
 
+# Le code du projet (src/) est monté dans /opt/airflow
+sys.path.append('/opt/airflow')
+
+REGISTRY_DIR = "/opt/airflow/models/registry"
+API_URL = os.getenv("VEHICULE_API_URL", "http://vehicule_price_api:8000")
+# Données intermédiaires entre tâches : Parquet typé (schémas de src/dataset_io.py)
+NEW_DATA_PATH = "/opt/airflow/data/new_data.parquet"
+PROCESSED_PATH = "/opt/airflow/data/processed.parquet"
+# Hold-out figé (jamais nettoyé) : champion et challengers sont toujours comparés sur les mêmes lignes
+HOLDOUT_PATH = "/opt/airflow/data/holdout.parquet"
+CANDIDATES_DIR = "/opt/airflow/models/candidates"
+REPORT_DIR = "/opt/airflow/models/evaluation"
+
+# Challengers entraînés à chaque run (nom -> type et hyperparamètres de src/train.build_model)
+CANDIDATES = {
+    "rf_depth10": ("random_forest", {"n_estimators": 100, "max_depth": 10}),
+    "rf_full": ("random_forest", {"n_estimators": 200}),
+    "gb_default": ("gradient_boosting", {"n_estimators": 200, "learning_rate": 0.1}),
+    "ridge": ("ridge", {"alpha": 1.0}),
+}
+
 def fetch_new_data():
     """Récupère nouvelles données"""
     # TODO: Adapter selon ta source de données
@@ -13,121 +36,135 @@ def fetch_new_data():
     
     print("📥 Récupération des nouvelles données...")
     # Simule nouvelles données (à adapter)
-    df = pd.read_csv("/opt/airflow/data/raw/vehicules.csv")  # Adapte le chemin
+    from src.dataset_io import read_dataset, write_dataset
     
-    # Sauvegarde
-    df.to_csv("/opt/airflow/data/new_data.csv", index=False)
+    # Import CSV (source externe) lu sans schéma : une valeur manquante ne tient pas
+    # dans une colonne int64, les lignes incomplètes sont retirées avant le typage
+    df = read_dataset("/opt/airflow/data/raw/vehicules.csv", schema=None)  # Adapte le chemin
+    df = df.dropna()
+    # Stockage typé en Parquet pour les tâches suivantes
+    write_dataset(df, NEW_DATA_PATH)
     print(f"✅ {len(df)} données récupérées")
 
 def preprocess_data():
     """Nettoie les données"""
     print("🧹 Preprocessing des données...")
     
-    df = pd.read_csv("/opt/airflow/data/new_data.csv")
+    from src.dataset_io import PROCESSED_SCHEMA, read_dataset, write_dataset
+    from src.evaluate import exclude_holdout, load_holdout
+    from src.preprocess import DataPreprocessor
+    
+    df = read_dataset(NEW_DATA_PATH)
     
     # Ton preprocessing (adapte selon ton code)
     df = df.dropna()
     df = df[df['price'] > 0]
     
-    df.to_csv("/opt/airflow/data/processed.csv", index=False)
+    # Les lignes du hold-out (tiré au premier run) ne servent jamais à l'entraînement
+    holdout = load_holdout(HOLDOUT_PATH, source=df)
+    df = exclude_holdout(df, holdout)
+    
+    # Le preprocessor est publié avec le modèle : ils forment une même version
+    preprocessor = DataPreprocessor()
+    X, y = preprocessor.fit_transform(df)
+    processed = X.copy()
+    processed['price'] = y
+    write_dataset(processed, PROCESSED_PATH, schema=PROCESSED_SCHEMA)
+    preprocessor.save("/opt/airflow/models/preprocessor_new.pkl")
     print(f"✅ {len(df)} données nettoyées")
 
 def train_model():
-    """Entraîne le nouveau modèle"""
-    print("🔨 Entraînement du modèle...")
+    """Entraîne les challengers (évalués ensuite sur le hold-out)"""
+    print("🔨 Entraînement des challengers...")
     
-    from sklearn.ensemble import RandomForestRegressor
-    from sklearn.model_selection import train_test_split
-    from sklearn.metrics import mean_absolute_error, r2_score
+    from src.dataset_io import PROCESSED_SCHEMA, read_dataset
+    from src.train import build_model
     
-    # Charge données
-    df = pd.read_csv("/opt/airflow/data/processed.csv")
+    # Charge données (hold-out déjà exclu)
+    df = read_dataset(PROCESSED_PATH, schema=PROCESSED_SCHEMA)
     
     # TODO: Adapter selon tes features
     X = df.drop(['price'], axis=1)  # Adapte les colonnes
     y = df['price']
     
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Entraîne
-    model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)
-    model.fit(X_train, y_train)
-    
-    # Évalue
-    predictions = model.predict(X_test)
-    mae = mean_absolute_error(y_test, predictions)
-    r2 = r2_score(y_test, predictions)
-    
-    print(f"📊 Nouveau modèle - MAE: {mae:.2f}, R²: {r2:.3f}")
-    
-    # Sauvegarde temporaire
-    with open("/opt/airflow/models/model_new.pkl", "wb") as f:
-        pickle.dump(model, f)
-    
-    # Sauvegarde métriques pour comparaison
-    with open("/opt/airflow/models/metrics_new.txt", "w") as f:
-        f.write(f"{mae},{r2}")
+    os.makedirs(CANDIDATES_DIR, exist_ok=True)
+    for name, (model_type, params) in CANDIDATES.items():
+        model = build_model(model_type, **params)
+        model.fit(X, y)
+        with open(os.path.join(CANDIDATES_DIR, f"{name}.pkl"), "wb") as f:
+            pickle.dump(model, f)
+        print(f"✅ Challenger {name} entraîné")
+
+def _notify_api():
+    """Demande à l'API de précharger la nouvelle version (pas de redémarrage)"""
+    import requests
+    try:
+        requests.post(f"{API_URL}/model/reload", params={"background": True}, timeout=5)
+    except requests.RequestException as e:
+        # L'API suit aussi le pointeur CURRENT du registre toute seule
+        print(f"⚠️ API non joignable ({e}), la bascule se fera au prochain scan du registre")
+
+def _shadow_api(version):
+    """Demande à l'API de scorer le trafic réel avec `version` en mode fantôme"""
+    import requests
+    try:
+        requests.post(f"{API_URL}/shadow/load", params={"version": version}, timeout=30)
+    except requests.RequestException as e:
+        print(f"⚠️ API non joignable ({e}), version {version} non chargée en mode fantôme")
 
 def evaluate_and_deploy():
-    """Compare et déploie si meilleur"""
-    print("📊 Évaluation et comparaison...")
-    
-    # Charge ancien modèle
-    old_model_path = "/opt/airflow/models/model.pkl"
-    new_model_path = "/opt/airflow/models/model_new.pkl"
-    
-    if not os.path.exists(old_model_path):
-        # Premier entraînement
-        print("🎉 Premier modèle → Déploiement automatique")
-        os.rename(new_model_path, old_model_path)
-        os.system("docker restart vehicule_price_api")
+    """Évalue challengers et champion sur le hold-out, promeut selon le rapport"""
+    print("📊 Évaluation champion / challengers...")
+    
+    from src.evaluate import evaluate_candidates, load_report, print_report
+    from src.preprocess import DataPreprocessor
+    from src.registry import ModelRegistry
+    
+    registry = ModelRegistry(REGISTRY_DIR)
+    preprocessor_new = DataPreprocessor.load("/opt/airflow/models/preprocessor_new.pkl")
+    challengers = {}
+    for name in CANDIDATES:
+        with open(os.path.join(CANDIDATES_DIR, f"{name}.pkl"), "rb") as f:
+            challengers[name] = (pickle.load(f), preprocessor_new)
+    champion = registry.load_bundle() if registry.current_version() else None
+    
+    # Un seul passage sur le hold-out pour tous les modèles ; rapport persisté
+    report_path = os.path.join(REPORT_DIR, f"report-{datetime.now():%Y%m%d-%H%M%S}.json")
+    print_report(evaluate_candidates(challengers, champion, holdout_path=HOLDOUT_PATH,
+                                     report_path=report_path))
+    
+    # La décision est relue depuis le rapport (celui qui fait foi)
+    report = load_report(report_path)
+    decision = report['decision']
+    name = decision['promote'] or decision.get('best_challenger')
+    if name is None:
         return
-    
-    # Compare les métriques
-    with open("/opt/airflow/models/metrics_new.txt", "r") as f:
-        mae_new, r2_new = map(float, f.read().strip().split(','))
-    
-    # Charge données test
-    df = pd.read_csv("/opt/airflow/data/processed.csv")
-    X = df.drop(['price'], axis=1)
-    y = df['price']
-    
-    # Évalue ancien modèle
-    with open(old_model_path, "rb") as f:
-        model_old = pickle.load(f)
-    
-    from sklearn.metrics import mean_absolute_error
-    mae_old = mean_absolute_error(y, model_old.predict(X))
-    
-    print(f"📊 Ancien modèle - MAE: {mae_old:.2f}")
-    print(f"📊 Nouveau modèle - MAE: {mae_new:.2f}")
-    
-    # Décision
-    if mae_new < mae_old:
-        improvement = ((mae_old - mae_new) / mae_old) * 100
-        print(f"✅ Nouveau modèle MEILLEUR ({improvement:.1f}% amélioration)")
-        
-        # Remplace le modèle
-        os.rename(new_model_path, old_model_path)
-        
-        # Redémarre l'API
-        os.system("docker restart vehicule_price_api")
-        print("🚀 API redémarrée avec le nouveau modèle")
+    # Le meilleur challenger est toujours archivé, promu seulement si le rapport le décide
+    promote = decision['promote'] is not None
+    model_type, params = CANDIDATES[name]
+    version = registry.publish(challengers[name][0], preprocessor_new, metrics=report['overall'][name],
+                               promote=promote, params={'model_type': model_type, **params},
+                               candidate=name, evaluation_report=report_path)
+    if promote:
+        _notify_api()
+        print(f"🚀 Version {version} ({name}) promue, l'API bascule sans redémarrage")
     else:
-        print(f"⚠️ Ancien modèle reste meilleur, pas de déploiement")
-        os.remove(new_model_path)
+        # Validé sur le trafic réel avant une éventuelle promotion manuelle
+        _shadow_api(version)
+        print(f"⚠️ Le champion reste en production (version {version} archivée, en mode fantôme)")
 
 def cleanup():
     """Nettoie les fichiers temporaires"""
     print("🧹 Nettoyage...")
     files_to_clean = [
-        "/opt/airflow/data/new_data.csv",
-        "/opt/airflow/data/processed.csv",
-        "/opt/airflow/models/metrics_new.txt"
+        NEW_DATA_PATH,
+        PROCESSED_PATH,
+        "/opt/airflow/models/preprocessor_new.pkl"
     ]
     for f in files_to_clean:
         if os.path.exists(f):
             os.remove(f)
+    shutil.rmtree(CANDIDATES_DIR, ignore_errors=True)
     print("✅ Nettoyage terminé")
 
 # DAG
@@ -0,0 +1,295 @@
+"""
+Détection de dérive des données servies par l'API, en flux
+Construire la référence : python monitoring/drift.py
+
+La référence est calculée une fois depuis le jeu d'entraînement prétraité
+(data/processed/train.*), ramené dans l'espace des entrées de l'API
+(CarInput) : histogramme à bornes fixes (déciles) pour chaque variable
+numérique, comptage des catégories, et histogramme des prédictions du
+modèle sur ces mêmes lignes.
+
+Le trafic est lu depuis le journal des prédictions (logs/predictions.jsonl)
+au fil de l'eau, par paquets, et ne fait qu'incrémenter ces compteurs : la
+mémoire est en O(variables x classes) quel que soit le volume. Les
+distances (PSI, distance de type Kolmogorov-Smirnov entre fonctions de
+répartition) sont calculées sur les histogrammes. Le rapport evidently,
+coûteux, n'est produit qu'à la demande sur une fenêtre bornée.
+"""
+import json
+import os
+import sys
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.dataset_io import PROCESSED_SCHEMA, read_dataset, resolve_dataset
+
+NUMERIC_FEATURES = ['year', 'km_driven', 'engine_cc', 'seats']
+CATEGORICAL_FEATURES = ['fuel', 'transmission', 'owner']
+PREDICTION = 'prediction'
+
+REFERENCE_PATH = 'models/drift_reference.json'
+PROCESSED_TRAIN_PATH = 'data/processed/train.csv'
+
+# Seuils usuels du PSI
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+EPSILON = 1e-6
+
+
+class NumericHistogram:
+    """Histogramme à bornes fixes (+ classes ouvertes aux extrémités)"""
+    def __init__(self, edges, counts=None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64) if counts is None \
+            else np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def from_reference(cls, values, bins=10):
+        values = np.asarray(values, dtype=np.float64)
+        quantiles = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+        histogram = cls(np.unique(quantiles))
+        histogram.update(values)
+        return histogram
+
+    def update(self, values):
+        idx = np.searchsorted(self.edges, np.asarray(values, dtype=np.float64), side='right')
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    def empty_like(self):
+        return NumericHistogram(self.edges)
+
+    def to_dict(self):
+        return {'type': 'numeric', 'edges': self.edges.tolist(), 'counts': self.counts.tolist()}
+
+
+class CategoryCounts:
+    """Comptage des catégories de référence ; les autres vont dans une dernière classe"""
+    def __init__(self, categories, counts=None):
+        self.categories = list(categories)
+        self._index = {c: i for i, c in enumerate(self.categories)}
+        self.counts = np.zeros(len(self.categories) + 1, dtype=np.int64) if counts is None \
+            else np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def from_reference(cls, values):
+        counts = cls(sorted(set(map(str, values))))
+        counts.update(values)
+        return counts
+
+    def update(self, values):
+        other = len(self.categories)
+        idx = np.fromiter((self._index.get(str(v), other) for v in values), dtype=np.intp)
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    def empty_like(self):
+        return CategoryCounts(self.categories)
+
+    def to_dict(self):
+        return {'type': 'categorical', 'categories': self.categories, 'counts': self.counts.tolist()}
+
+
+def _from_dict(data):
+    if data['type'] == 'numeric':
+        return NumericHistogram(data['edges'], data['counts'])
+    return CategoryCounts(data['categories'], data['counts'])
+
+
+def psi(reference_counts, current_counts):
+    """Population Stability Index entre deux histogrammes de mêmes classes"""
+    ref = np.maximum(reference_counts / max(reference_counts.sum(), 1), EPSILON)
+    cur = np.maximum(current_counts / max(current_counts.sum(), 1), EPSILON)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def ks_distance(reference_counts, current_counts):
+    """Écart maximal entre les fonctions de répartition (par classe)"""
+    ref = np.cumsum(reference_counts) / max(reference_counts.sum(), 1)
+    cur = np.cumsum(current_counts) / max(current_counts.sum(), 1)
+    return float(np.max(np.abs(cur - ref)))
+
+
+class DriftProfile:
+    """Un histogramme par variable de CarInput + un pour les prédictions"""
+    def __init__(self, features, n_rows=0):
+        self.features = features
+        self.n_rows = n_rows
+
+    def empty_like(self):
+        return DriftProfile({name: h.empty_like() for name, h in self.features.items()})
+
+    def update(self, inputs, predictions):
+        """inputs : DataFrame (colonnes de CarInput) ; predictions : tableau"""
+        for name, histogram in self.features.items():
+            histogram.update(predictions if name == PREDICTION else inputs[name].to_numpy())
+        self.n_rows += len(inputs)
+
+    def to_dict(self):
+        return {'n_rows': self.n_rows, 'features': {n: h.to_dict() for n, h in self.features.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({n: _from_dict(h) for n, h in data['features'].items()}, data['n_rows'])
+
+    def save(self, path=REFERENCE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=REFERENCE_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_reference_inputs(preprocessor, processed_path=PROCESSED_TRAIN_PATH):
+    """
+    Relit le jeu d'entraînement prétraité et le ramène dans l'espace de CarInput.
+
+    Returns:
+        (entrées brutes, matrice prétraitée telle que vue par le modèle)
+    """
+    df = read_dataset(resolve_dataset(processed_path), schema=PROCESSED_SCHEMA)
+    X = df[preprocessor.feature_names]
+    raw = X.copy()
+    scaled = list(preprocessor.scaler.feature_names_in_)
+    raw[scaled] = preprocessor.scaler.inverse_transform(X[scaled].to_numpy())
+    for col, le in preprocessor.label_encoders.items():
+        raw[col] = np.asarray(le.classes_, dtype=object)[X[col].to_numpy(dtype=np.intp)]
+    for col in NUMERIC_FEATURES:
+        raw[col] = raw[col].round()
+    return raw, X.to_numpy(dtype=np.float64)
+
+
+def build_reference(model, preprocessor, processed_path=PROCESSED_TRAIN_PATH, bins=10):
+    """Profil de référence : entrées d'entraînement et prédictions du modèle sur celles-ci"""
+    raw, X = load_reference_inputs(preprocessor, processed_path)
+    predictions = model.predict(X)
+    features = {col: NumericHistogram.from_reference(raw[col], bins) for col in NUMERIC_FEATURES}
+    features.update({col: CategoryCounts.from_reference(raw[col]) for col in CATEGORICAL_FEATURES})
+    features[PREDICTION] = NumericHistogram.from_reference(predictions, bins)
+    return DriftProfile(features, n_rows=len(raw))
+
+
+def _status(value):
+    if value >= PSI_DRIFT:
+        return "drift"
+    if value >= PSI_WARNING:
+        return "warning"
+    return "stable"
+
+
+class DriftMonitor:
+    """
+    Compare le trafic lu dans le journal des prédictions à la référence.
+
+    Le journal est lu à partir du dernier octet traité ; une rotation (fichier
+    plus court que la position mémorisée) fait repartir du début du nouveau fichier.
+    """
+    def __init__(self, reference, log_path='logs/predictions.jsonl', chunk_size=10000, offset=0):
+        self.reference = reference
+        self.current = reference.empty_like()
+        self.log_path = log_path
+        self.chunk_size = chunk_size
+        self.offset = offset
+
+    def update(self, records):
+        """Ajoute des enregistrements {input, prediction} à la fenêtre courante"""
+        if not records:
+            return
+        inputs = pd.DataFrame([r['input'] for r in records])
+        predictions = np.array([r['prediction'] for r in records], dtype=np.float64)
+        self.current.update(inputs, predictions)
+
+    def ingest(self):
+        """Lit les nouvelles lignes du journal, par paquets ; retourne le nombre lu"""
+        if not os.path.exists(self.log_path):
+            return 0
+        if os.path.getsize(self.log_path) < self.offset:
+            self.offset = 0
+        n_read = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.offset)
+            records = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # ligne en cours d'écriture : relue au prochain passage
+                self.offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if len(records) >= self.chunk_size:
+                    self.update(records)
+                    n_read += len(records)
+                    records = []
+            self.update(records)
+            n_read += len(records)
+        return n_read
+
+    def reset(self):
+        """Repart d'une fenêtre vide (les lignes déjà lues ne sont pas relues)"""
+        self.current = self.reference.empty_like()
+
+    def report(self):
+        features = {}
+        for name, ref in self.reference.features.items():
+            cur = self.current.features[name]
+            value = psi(ref.counts, cur.counts)
+            entry = {'psi': round(value, 4), 'status': _status(value)}
+            if isinstance(ref, NumericHistogram):
+                entry['ks'] = round(ks_distance(ref.counts, cur.counts), 4)
+            else:
+                entry['unseen_share'] = round(float(cur.counts[-1] / max(cur.counts.sum(), 1)), 4)
+            features[name] = entry
+        drifted = [n for n, e in features.items() if e['status'] == 'drift']
+        return {
+            'reference_rows': self.reference.n_rows,
+            'current_rows': self.current.n_rows,
+            'drift_detected': bool(drifted) and self.current.n_rows > 0,
+            'drifted_features': drifted,
+            'features': features
+        }
+
+
+def read_log_window(log_path, limit=5000):
+    """Les `limit` derniers enregistrements du journal (mémoire bornée)"""
+    window = deque(maxlen=limit)
+    with open(log_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                window.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return list(window)
+
+
+def evidently_report(preprocessor, log_path, limit=5000, processed_path=PROCESSED_TRAIN_PATH):
+    """Rapport HTML evidently (à la demande) : référence vs `limit` dernières requêtes"""
+    try:
+        from evidently import Report
+        from evidently.presets import DataDriftPreset
+    except ImportError:
+        # API historique (evidently < 0.7) ; ImportError si evidently est absent
+        from evidently.report import Report
+        from evidently.metric_preset import DataDriftPreset
+    columns = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+    reference, _ = load_reference_inputs(preprocessor, processed_path)
+    current = pd.DataFrame([r['input'] for r in read_log_window(log_path, limit)])
+    report = Report(metrics=[DataDriftPreset()])
+    result = report.run(reference_data=reference[columns], current_data=current[columns])
+    # evidently >= 0.7 retourne un snapshot, les versions antérieures remplissent le rapport
+    return (result or report).get_html()
+
+
+if __name__ == '__main__':
+    from src.utils import load_model, load_preprocessor
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'models/production_model.pkl'
+    preprocessor_path = sys.argv[2] if len(sys.argv) > 2 else 'models/preprocessor.pkl'
+    profile = build_reference(load_model(model_path), load_preprocessor(preprocessor_path))
+    profile.save()
+    print(f"✅ Référence de dérive ({profile.n_rows} lignes) → {REFERENCE_PATH}")
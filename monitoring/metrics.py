@@ -0,0 +1,254 @@
+"""
+Métriques de l'API au format texte Prometheus (GET /metrics)
+
+Compteurs et histogrammes sans verrou sur le chemin des requêtes : chaque
+thread incrémente ses propres valeurs (un dict par thread), et seule la
+lecture (/metrics) additionne les valeurs de tous les threads. Les valeurs
+d'un thread terminé sont fusionnées dans un total commun, la liste des
+threads suivis ne grossit donc pas avec le temps.
+
+Chaque processus (uvicorn --workers N) a ses propres métriques : Prometheus
+les agrège à la collecte (une cible par worker, ou somme côté requête).
+
+Utilisation :
+    REQUESTS = registry.counter("http_requests_total", "Requêtes", ("method", "path"))
+    REQUESTS.inc(("GET", "/health"))
+    with STAGE_SECONDS.time(("predict",)):
+        ...
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+# Bornes (secondes) adaptées à des latences de la centaine de µs à la seconde
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, labels=(), amount=1):
+        if not self.registry.enabled:
+            return
+        values = self.registry._values()
+        key = (self.name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def _merge(self, total, value):
+        return (total or 0) + value
+
+    def _samples(self, labels, value):
+        yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Compte par classe (non cumulé, + classe +Inf) puis somme des observations"""
+    type = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        if not self.registry.enabled:
+            return
+        values = self.registry._values()
+        key = (self.name, labels)
+        cell = values.get(key)
+        if cell is None:
+            cell = values[key] = [0] * (len(self.buckets) + 2)
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self, labels=()):
+        """Chronomètre un bloc : with histogram.time(("predict",)): ..."""
+        return _Timer(self, labels)
+
+    def _merge(self, total, cell):
+        if total is None:
+            return list(cell)
+        return [a + b for a, b in zip(total, cell)]
+
+    def _samples(self, labels, cell):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), cell):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            yield f"{self.name}_bucket", _labels(self.labelnames, labels, le), cumulative
+        yield f"{self.name}_sum", _labels(self.labelnames, labels), cell[-1]
+        yield f"{self.name}_count", _labels(self.labelnames, labels), cumulative
+
+
+class MetricsRegistry:
+    """
+    Args:
+        enabled: False = inc / observe ne font rien (coût d'un test booléen)
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._collectors = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []
+        self._retired = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrique déjà déclarée : {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collect):
+        """
+        `collect()` est appelé à chaque lecture de /metrics et retourne des
+        tuples (nom, type, description, valeur) : statistiques déjà tenues
+        ailleurs (micro-batching, cache, journal des prédictions).
+        """
+        self._collectors.append(collect)
+
+    def _values(self):
+        """Valeurs du thread courant (créées au premier appel du thread)"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._live.append(values)
+            weakref.finalize(threading.current_thread(), self._retire, values)
+            return values
+
+    def _retire(self, values):
+        with self._lock:
+            self._live = [v for v in self._live if v is not values]
+            self._merge_into(self._retired, values)
+
+    def _merge_into(self, total, values):
+        # list(...) : copie atomique sous le GIL, le thread propriétaire peut continuer d'écrire
+        for key, value in list(values.items()):
+            total[key] = self._metrics[key[0]]._merge(total.get(key), value)
+
+    def snapshot(self):
+        """{(nom, valeurs des labels): valeur} sommé sur tous les threads"""
+        with self._lock:
+            total = {key: self._metrics[key[0]]._merge(None, value) for key, value in self._retired.items()}
+            for values in self._live:
+                self._merge_into(total, values)
+        return total
+
+    def reset(self):
+        """Remet tout à zéro (tests)"""
+        with self._lock:
+            self._retired = {}
+            for values in self._live:
+                values.clear()
+
+    def render(self):
+        """Texte au format d'exposition Prometheus 0.0.4"""
+        by_metric = {}
+        for (name, labels), value in sorted(self.snapshot().items(), key=lambda item: item[0]):
+            by_metric.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in by_metric.get(name, []):
+                for sample, label_text, sample_value in metric._samples(labels, value):
+                    lines.append(f"{sample}{label_text} {_format_value(sample_value)}")
+        for collect in self._collectors:
+            for name, metric_type, documentation, value in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : nombre de requêtes, erreurs (statut >= 400) et latence par route.
+
+    La route est celle déclarée (/model/versions, jamais l'URL brute) pour
+    borner le nombre de séries ; l'instant d'arrivée est laissé dans
+    scope["state"] pour mesurer ensuite la validation dans les endpoints.
+    """
+    def __init__(self, app, requests, errors, latency):
+        self.app = app
+        self.requests = requests
+        self.errors = errors
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        scope.setdefault("state", {})["request_start"] = start
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.requests.inc((method, path, str(status[0])))
+            if status[0] >= 400:
+                self.errors.inc((method, path, str(status[0])))
+            self.latency.observe(time.perf_counter() - start, (method, path))
@@ -0,0 +1,147 @@
+"""
+Journal des prédictions de l'API (entrée, prédiction, version du modèle, latence)
+
+Le chemin des requêtes ne fait qu'ajouter un tuple dans un tampon circulaire
+borné : la sérialisation JSON et l'écriture sont faites par un thread
+d'arrière-plan, par lots. Si le tampon est plein (disque lent, pic de
+trafic), les nouveaux enregistrements sont comptés puis abandonnés : la
+requête n'attend jamais le journal.
+
+Le fichier courant (NDJSON) est renommé au-delà de `max_bytes`
+(predictions.jsonl.1[.gz], .2, ...), avec compression gzip optionnelle.
+"""
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class PredictionLogger:
+    """
+    Args:
+        path: fichier NDJSON courant
+        capacity: nombre maximal d'enregistrements en attente d'écriture
+        batch_size: enregistrements écrits par lot
+        flush_interval: délai maximal (s) avant l'écriture d'un lot incomplet
+        max_bytes: taille déclenchant la rotation (0 = jamais)
+        backup_count: nombre de fichiers archivés conservés
+        compress: compresser les fichiers archivés (gzip)
+    """
+    def __init__(self, path='logs/predictions.jsonl', capacity=100000, batch_size=1000,
+                 flush_interval=0.5, max_bytes=50 * 1024 * 1024, backup_count=5, compress=True):
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self._buffer = deque()
+        self._wakeup = threading.Event()
+        self._drop_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def log(self, input_data, prediction, version, latency_ms, source='predict'):
+        """Chemin des requêtes : un append, jamais d'attente ni de sérialisation"""
+        if len(self._buffer) >= self.capacity or self._closed:
+            with self._drop_lock:
+                self.dropped += 1
+            return False
+        self._buffer.append((time.time(), source, version, input_data, prediction, latency_ms))
+        if len(self._buffer) == self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def log_many(self, rows, predictions, version, latency_ms, source='batch'):
+        for row, prediction in zip(rows, predictions):
+            self.log(row, prediction, version, latency_ms, source)
+
+    def _drain(self):
+        """Écrit les enregistrements en attente, par lots (thread d'arrière-plan)"""
+        while self._buffer:
+            lines = []
+            popleft = self._buffer.popleft
+            try:
+                for _ in range(self.batch_size):
+                    ts, source, version, input_data, prediction, latency_ms = popleft()
+                    lines.append(json.dumps({
+                        "timestamp": datetime.fromtimestamp(ts).isoformat(),
+                        "source": source,
+                        "model_version": version,
+                        "input": input_data,
+                        "prediction": round(float(prediction), 2),
+                        "latency_ms": round(latency_ms, 3)
+                    }, ensure_ascii=False))
+            except IndexError:
+                pass
+            if not lines:
+                return
+            try:
+                with self._write_lock:
+                    self._file.write("\n".join(lines) + "\n")
+                    self._file.flush()
+                    self.written += len(lines)
+                    if self.max_bytes and self._file.tell() >= self.max_bytes:
+                        self._rotate()
+            except OSError as e:
+                self.write_errors += 1
+                print(f"⚠️ Journal des prédictions : écriture impossible ({e})")
+
+    def _rotate(self):
+        self._file.close()
+        ext = '.gz' if self.compress else ''
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}{ext}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}{ext}")
+        if self.compress:
+            with open(self.path, 'rb') as src, gzip.open(f"{self.path}.1.gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, f"{self.path}.1")
+        self.rotations += 1
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+
+    def flush(self):
+        """Écrit immédiatement tout ce qui est en attente (tests, arrêt)"""
+        self._drain()
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self._drain()
+        self._file.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "queued": len(self._buffer),
+            "capacity": self.capacity,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+            "max_bytes": self.max_bytes,
+            "compress": self.compress
+        }
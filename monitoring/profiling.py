@@ -0,0 +1,195 @@
+"""
+Profilage à la demande du chemin des requêtes (endpoints /admin/profile)
+
+Une session échantillonne, toutes les `interval_ms`, la pile des threads qui
+sont en train de servir une requête (blocs `with profiler.track():`), pendant
+les N prochaines requêtes ou T secondes. Les piles sont agrégées au format
+« collapsed » (frame;frame;frame N), lisible par flamegraph.pl, speedscope ou
+inferno. La même session peut activer tracemalloc pour lister les lignes qui
+allouent le plus pendant la fenêtre (tracemalloc couvre tout le processus).
+
+Hors session, `track()` / `@profiled` ne font qu'un test booléen.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime
+
+_NULL_CONTEXT = nullcontext()
+
+
+def _frame_name(code):
+    # Ni « ; » ni espace final : séparateurs du format collapsed
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def collapse(frame, max_depth=128):
+    """Pile d'un frame, de la racine à la feuille, au format collapsed"""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Tracked:
+    """Contexte d'un thread suivi ; réentrant (un thread peut être suivi deux fois)"""
+    __slots__ = ('profiler', 'count')
+
+    def __init__(self, profiler, count):
+        self.profiler = profiler
+        self.count = count
+
+    def __enter__(self):
+        threads = self.profiler._threads
+        ident = threading.get_ident()
+        threads[ident] = threads.get(ident, 0) + 1
+
+    def __exit__(self, exc_type, exc, tb):
+        profiler = self.profiler
+        ident = threading.get_ident()
+        depth = profiler._threads.get(ident, 1) - 1
+        if depth:
+            profiler._threads[ident] = depth
+        else:
+            profiler._threads.pop(ident, None)
+        if self.count:
+            profiler._request_done()
+
+
+class SamplingProfiler:
+    """Une session à la fois ; `result()` garde la dernière session terminée"""
+    def __init__(self):
+        self.active = False
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._result = None
+
+    def track(self, count=True):
+        """
+        Contexte autour du travail d'une requête. `count=False` pour un thread
+        qui travaille pour plusieurs requêtes (micro-batching) : suivi, non compté.
+        """
+        if not self.active:
+            return _NULL_CONTEXT
+        return _Tracked(self, count)
+
+    def profiled(self, fn):
+        """Décorateur d'endpoint : chaque appel est suivi et compte pour une requête"""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not self.active:
+                return fn(*args, **kwargs)
+            with _Tracked(self, True):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def start(self, requests=None, seconds=None, interval_ms=5.0, allocations=False,
+              alloc_frames=10, threads=()):
+        """
+        Lance une session : s'arrête après `requests` requêtes ou `seconds` secondes.
+
+        `threads` : identifiants de threads échantillonnés pendant toute la
+        session (boucle d'événements, où FastAPI lit et valide les requêtes).
+        """
+        if not requests and not seconds:
+            raise ValueError("Préciser un nombre de requêtes et/ou une durée")
+        with self._lock:
+            if self.active:
+                raise RuntimeError("Une session de profilage est déjà en cours")
+            self._always = set(threads)
+            self._stacks = Counter()
+            self._samples = 0
+            self._requests = 0
+            self._max_requests = requests
+            self._deadline = time.monotonic() + seconds if seconds else None
+            self._interval = interval_ms / 1000.0
+            self._started_at = datetime.now().isoformat()
+            self._started = time.perf_counter()
+            self._allocations = allocations
+            self._owns_tracemalloc = allocations and not tracemalloc.is_tracing()
+            if self._owns_tracemalloc:
+                tracemalloc.start(alloc_frames)
+            self._result = None
+            self._stop.clear()
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def stop(self, timeout=5):
+        """Arrête la session en cours et retourne son résultat"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.result()
+
+    def _request_done(self):
+        with self._lock:
+            self._requests += 1
+            if self._max_requests and self._requests >= self._max_requests:
+                self._stop.set()
+
+    def _run(self):
+        """Thread d'échantillonnage : lit la pile des threads suivis"""
+        own = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                break
+            frames = sys._current_frames()
+            for ident in self._always.union(self._threads):
+                frame = frames.get(ident)
+                if frame is not None and ident != own:
+                    self._stacks[collapse(frame)] += 1
+                    self._samples += 1
+            del frames
+        self._finish()
+
+    def _finish(self):
+        allocations = []
+        if self._allocations and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)])
+            for stat in snapshot.statistics('lineno')[:25]:
+                frame = stat.traceback[0]
+                allocations.append({"location": f"{frame.filename}:{frame.lineno}",
+                                    "size_kb": round(stat.size / 1024, 1), "count": stat.count})
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+        with self._lock:
+            self._result = {
+                "started_at": self._started_at,
+                "duration_s": round(time.perf_counter() - self._started, 3),
+                "interval_ms": self._interval * 1000.0,
+                "requests": self._requests,
+                "samples": self._samples,
+                "stacks": dict(self._stacks.most_common()),
+                "allocations": allocations
+            }
+            self._threads.clear()
+            self.active = False
+
+    def status(self):
+        with self._lock:
+            if not self.active:
+                return {"active": False, "has_result": self._result is not None}
+            return {"active": True, "started_at": self._started_at, "requests": self._requests,
+                    "max_requests": self._max_requests, "samples": self._samples,
+                    "allocations": self._allocations}
+
+    def result(self):
+        return self._result
+
+    def collapsed(self):
+        """Piles de la dernière session, une par ligne : « a;b;c N »"""
+        if self._result is None:
+            return ""
+        return "".join(f"{stack} {count}\n" for stack, count in self._result["stacks"].items())
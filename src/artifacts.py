@@ -0,0 +1,84 @@
+"""
+Format d'artefact binaire mappé en mémoire (modèle compilé, preprocessor)
+
+Disposition du fichier :
+    MAGIC (8 octets) | taille de l'en-tête (uint64 LE) | en-tête JSON | blobs
+Chaque tableau est stocké brut (ordre C), aligné sur 64 octets. Au chargement
+les tableaux sont des vues en lecture seule sur un mmap : aucun unpickling,
+et tous les workers uvicorn partagent la même copie dans le page cache.
+"""
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+MAGIC = b'VPART\x00\x01\x00'
+ALIGNMENT = 64
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_artifact(path, arrays, meta=None):
+    """
+    Écrit des tableaux NumPy et des métadonnées JSON dans un artefact.
+
+    L'écriture passe par un fichier temporaire puis os.replace : un lecteur
+    ne voit jamais un fichier à moitié écrit.
+    """
+    entries = {}
+    offset = 0
+    blobs = []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ValueError(f"Tableau '{name}' de type objet : non mappable")
+        entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        blobs.append((offset, array))
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({'meta': meta or {}, 'arrays': entries}).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for blob_offset, array in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_artifact(path, mmap_mode=True):
+    """
+    Lit un artefact et retourne (arrays, meta).
+
+    Avec mmap_mode=True les tableaux sont des vues en lecture seule sur le
+    fichier mappé ; sinon ils sont copiés en mémoire.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} n'est pas un artefact valide")
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+        data_start = _align(len(MAGIC) + 8 + header_len)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if mmap_mode else None
+        arrays = {}
+        for name, entry in header['arrays'].items():
+            dtype = np.dtype(entry['dtype'])
+            shape = tuple(entry['shape'])
+            count = int(np.prod(shape, dtype=np.int64))
+            if count == 0:
+                array = np.empty(0, dtype=dtype)
+            elif buffer is not None:
+                array = np.frombuffer(buffer, dtype=dtype, count=count,
+                                      offset=data_start + entry['offset'])
+            else:
+                f.seek(data_start + entry['offset'])
+                array = np.fromfile(f, dtype=dtype, count=count)
+            arrays[name] = array.reshape(shape)
+    return arrays, header['meta']
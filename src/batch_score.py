@@ -0,0 +1,159 @@
+"""
+Scoring en masse d'un fichier CSV / Parquet, hors mémoire et multi-processus
+Exécuter avec : python src/batch_score.py data/stock.csv data/stock_scored.csv --workers 8
+Reprendre après un arrêt : ajouter --resume
+
+Le fichier est lu par paquets ; chaque paquet est prétraité (encoder compilé)
+et prédit dans un processus du pool, où le modèle n'est chargé qu'une fois.
+Les résultats sont écrits dans l'ordre, et un checkpoint est mis à jour après
+chaque paquet pour pouvoir reprendre là où le traitement s'est arrêté.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.registry import ModelRegistry
+from src.utils import load_model, load_preprocessor, ordered_imap
+
+# État propre à chaque processus du pool (chargé une fois par l'initializer)
+_worker = {}
+
+
+def default_artifact_paths():
+    """Version CURRENT du registre, sinon artefacts .bin, sinon pickles"""
+    registry = ModelRegistry()
+    version = registry.current_version()
+    if version:
+        return registry.paths(version)
+    model_path = 'models/production_model.bin'
+    preprocessor_path = 'models/preprocessor.bin'
+    if not os.path.exists(model_path):
+        model_path = 'models/production_model.pkl'
+    if not os.path.exists(preprocessor_path):
+        preprocessor_path = 'models/preprocessor.pkl'
+    return model_path, preprocessor_path
+
+
+def _init_worker(model_path, preprocessor_path):
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    _worker['model'] = load_model(model_path)
+    _worker['encoder'] = load_preprocessor(preprocessor_path).compile()
+
+
+def _score_chunk(task):
+    """Prédit un paquet et le retourne sérialisé en CSV (en-tête pour le premier paquet)"""
+    index, df = task
+    X = _worker['encoder'].transform_frame(df)
+    df = df.copy()
+    df['predicted_price'] = np.round(_worker['model'].predict(X), 2)
+    return df.to_csv(index=False, header=(index == 0)).encode('utf-8'), len(df)
+
+
+def iter_input_chunks(path, chunk_size, skip_chunks=0, skip_rows=0):
+    """Itère sur (indice, DataFrame) d'un CSV ou Parquet, en sautant les paquets déjà traités"""
+    if str(path).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for index, batch in enumerate(pq.ParquetFile(path).iter_batches(batch_size=chunk_size)):
+            if index >= skip_chunks:
+                yield index, batch.to_pandas()
+        return
+    reader = pd.read_csv(path, chunksize=chunk_size,
+                         skiprows=range(1, skip_rows + 1) if skip_rows else None)
+    for index, df in enumerate(reader, start=skip_chunks):
+        yield index, df
+
+
+def _write_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def score_file(input_path, output_path, model_path=None, preprocessor_path=None,
+               chunk_size=100000, n_workers=None, resume=False):
+    """
+    Score `input_path` et écrit un CSV avec une colonne predicted_price.
+
+    Returns:
+        dict avec le nombre de lignes et le débit (lignes/s)
+    """
+    if model_path is None or preprocessor_path is None:
+        default_model, default_preprocessor = default_artifact_paths()
+        model_path = model_path or default_model
+        preprocessor_path = preprocessor_path or default_preprocessor
+    n_workers = n_workers or os.cpu_count() or 1
+    checkpoint_path = f"{output_path}.checkpoint.json"
+
+    state = {'input': os.path.abspath(input_path), 'chunk_size': chunk_size,
+             'chunks_done': 0, 'rows_done': 0, 'output_bytes': 0}
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved['input'] != state['input'] or saved['chunk_size'] != chunk_size:
+            raise ValueError("Le checkpoint ne correspond pas à ce fichier / cette taille de paquet")
+        state = saved
+        print(f"↩️ Reprise après {state['rows_done']} lignes ({state['chunks_done']} paquets)")
+
+    chunks = iter_input_chunks(input_path, chunk_size, state['chunks_done'], state['rows_done'])
+    rows_at_start = state['rows_done']
+    start = time.perf_counter()
+
+    mode = 'r+b' if state['output_bytes'] else 'wb'
+    with open(output_path, mode) as out:
+        # Tout ce qui suit le dernier checkpoint est réécrit
+        out.truncate(state['output_bytes'])
+        out.seek(state['output_bytes'])
+        if n_workers == 1:
+            _init_worker(model_path, preprocessor_path)
+            executor = None
+            results = map(_score_chunk, chunks)
+        else:
+            executor = ProcessPoolExecutor(n_workers, initializer=_init_worker,
+                                           initargs=(model_path, preprocessor_path))
+            results = ordered_imap(executor, _score_chunk, chunks, max_pending=2 * n_workers)
+        try:
+            for data, n_rows in results:
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+                state['chunks_done'] += 1
+                state['rows_done'] += n_rows
+                state['output_bytes'] = out.tell()
+                _write_checkpoint(checkpoint_path, state)
+                elapsed = time.perf_counter() - start
+                rate = (state['rows_done'] - rows_at_start) / elapsed if elapsed else 0.0
+                print(f"📦 {state['rows_done']} lignes - {rate:,.0f} lignes/s", flush=True)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - start
+    scored = state['rows_done'] - rows_at_start
+    stats = {'rows': state['rows_done'], 'seconds': round(elapsed, 3),
+             'rows_per_second': round(scored / elapsed, 1) if elapsed else 0.0}
+    print(f"✅ {stats['rows']} lignes scorées → {output_path} ({stats['rows_per_second']:,} lignes/s)")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scoring en masse d'un fichier CSV / Parquet")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--preprocessor', default=None)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--resume', action='store_true')
+    args = parser.parse_args()
+    score_file(args.input, args.output, args.model, args.preprocessor,
+               chunk_size=args.chunk_size, n_workers=args.workers, resume=args.resume)
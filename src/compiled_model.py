@@ -0,0 +1,177 @@
+"""
+Compilation des modèles entraînés en tableaux NumPy plats
+Exporter avec : python src/compiled_model.py [models/production_model.pkl] [models/production_model.bin]
+
+Les arbres d'un RandomForestRegressor / GradientBoostingRegressor sont mis bout
+à bout dans des tableaux contigus (feature, threshold, left, right, value) et
+évalués niveau par niveau, pour tout un lot et tous les arbres à la fois.
+Ridge est compilé en (coef, intercept).
+
+Deux formats sur disque : `.bin` (artefact mappé en mémoire, pour le service)
+et `.npz` (compressé, pour l'archivage ou le transfert).
+"""
+import json
+import sys
+import os
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import Ridge
+from sklearn.tree import DecisionTreeRegressor
+
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.artifacts import write_artifact, read_artifact
+
+# Nombre de lignes évaluées à la fois (borne la mémoire de la matrice n x n_trees)
+PREDICT_CHUNK_SIZE = 4096
+
+
+def _flatten_trees(trees):
+    """Concatène des sklearn.tree.Tree en tableaux globaux"""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        if tree.n_outputs != 1:
+            raise ValueError("Seuls les modèles à une sortie peuvent être compilés")
+        n = tree.node_count
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        leaf = left == -1
+        own = np.arange(n, dtype=np.int32)
+        # Une feuille pointe sur elle-même : le parcours y reste quelle que soit la profondeur
+        feature = np.where(leaf, 0, tree.feature).astype(np.int32)
+        threshold = np.where(leaf, np.inf, tree.threshold).astype(np.float64)
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(np.where(leaf, own, left) + offset)
+        rights.append(np.where(leaf, own, right) + offset)
+        values.append(tree.value[:, 0, 0].astype(np.float64))
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }, max_depth
+
+
+class CompiledModel:
+    """
+    Modèle compilé servi sans sklearn.
+
+    kind vaut 'forest' (moyenne des arbres), 'boosting' (init + learning_rate *
+    somme des arbres) ou 'linear' (X @ coef + intercept).
+    """
+    def __init__(self, kind, arrays, params):
+        self.kind = kind
+        self.arrays = arrays
+        self.params = params
+        self.n_features_in_ = params['n_features_in']
+        self.max_depth = params.get('max_depth', 0)
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Compile un estimateur sklearn entraîné"""
+        params = {
+            'source': type(estimator).__name__,
+            'n_features_in': int(estimator.n_features_in_),
+            'estimator_params': {k: v for k, v in estimator.get_params().items()
+                                 if isinstance(v, (int, float, str, bool, type(None)))},
+        }
+        if isinstance(estimator, Ridge):
+            arrays = {
+                'coef': np.asarray(estimator.coef_, dtype=np.float64).ravel(),
+                'intercept': np.atleast_1d(np.asarray(estimator.intercept_, dtype=np.float64)),
+            }
+            return cls('linear', arrays, params)
+        if isinstance(estimator, RandomForestRegressor):
+            arrays, max_depth = _flatten_trees([e.tree_ for e in estimator.estimators_])
+            params['max_depth'] = max_depth
+            return cls('forest', arrays, params)
+        if isinstance(estimator, DecisionTreeRegressor):
+            arrays, max_depth = _flatten_trees([estimator.tree_])
+            params['max_depth'] = max_depth
+            return cls('forest', arrays, params)
+        if isinstance(estimator, GradientBoostingRegressor):
+            if estimator.init_ == 'zero':
+                init = 0.0
+            elif hasattr(estimator.init_, 'constant_'):
+                init = float(np.ravel(estimator.init_.constant_)[0])
+            else:
+                raise ValueError("GradientBoosting avec un estimateur init personnalisé non supporté")
+            arrays, max_depth = _flatten_trees([e.tree_ for e in estimator.estimators_[:, 0]])
+            params.update(max_depth=max_depth, init=init,
+                          learning_rate=float(estimator.learning_rate))
+            return cls('boosting', arrays, params)
+        raise ValueError(f"Modèle non compilable : {type(estimator).__name__}")
+
+    def get_params(self, deep=True):
+        return {'compiled': True, 'source': self.params['source'], **self.params['estimator_params']}
+
+    def _tree_values(self, X):
+        """Valeurs des feuilles atteintes, matrice (n_samples, n_trees)"""
+        a = self.arrays
+        feature, threshold, left, right = a['feature'], a['threshold'], a['left'], a['right']
+        # Même précision que sklearn : les entrées des arbres sont en float32
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(a['roots'], (X.shape[0], len(a['roots']))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, feature[nodes]] <= threshold[nodes]
+            nodes = np.where(go_left, left[nodes], right[nodes])
+        return a['value'][nodes]
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X doit avoir la forme (n, {self.n_features_in_})")
+        if self.kind == 'linear':
+            return X @ self.arrays['coef'] + self.arrays['intercept'][0]
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], PREDICT_CHUNK_SIZE):
+            values = self._tree_values(X[start:start + PREDICT_CHUNK_SIZE])
+            if self.kind == 'forest':
+                out[start:start + len(values)] = values.mean(axis=1)
+            else:
+                out[start:start + len(values)] = (
+                    self.params['init'] + self.params['learning_rate'] * values.sum(axis=1)
+                )
+        return out
+
+    def save(self, path='models/production_model.bin'):
+        if str(path).endswith('.npz'):
+            header = json.dumps({'kind': self.kind, 'params': self.params})
+            np.savez_compressed(path, __header__=np.array(header), **self.arrays)
+        else:
+            write_artifact(path, self.arrays, {'kind': self.kind, 'params': self.params})
+
+    @staticmethod
+    def load(path='models/production_model.bin', mmap_mode=True):
+        """Charge un modèle compilé ; les artefacts .bin sont mappés en lecture seule"""
+        if str(path).endswith('.npz'):
+            with np.load(path, allow_pickle=False) as data:
+                header = json.loads(str(data['__header__']))
+                arrays = {k: data[k] for k in data.files if k != '__header__'}
+        else:
+            arrays, header = read_artifact(path, mmap_mode=mmap_mode)
+        return CompiledModel(header['kind'], arrays, header['params'])
+
+
+def export_model(estimator, path='models/production_model.bin'):
+    """Compile un estimateur sklearn et l'enregistre sur disque"""
+    compiled = CompiledModel.from_estimator(estimator)
+    compiled.save(path)
+    return compiled
+
+
+if __name__ == '__main__':
+    import joblib
+    src = sys.argv[1] if len(sys.argv) > 1 else 'models/production_model.pkl'
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + '.bin'
+    export_model(joblib.load(src), dst)
+    print(f"✅ Modèle compilé : {dst} ({os.path.getsize(dst)} octets, pickle : {os.path.getsize(src)} octets)")
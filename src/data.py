@@ -1,8 +1,13 @@
-import pandas as pd
+import os
+import sys
 from tabulate import tabulate
 
-# Chargement du fichier CSV
-df = pd.read_csv("data/raw/car_data.csv").head(10)
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.dataset_io import RAW_DATA_PATH, read_dataset, resolve_dataset
+
+# Chargement des données brutes (Parquet, sinon CSV)
+df = read_dataset(resolve_dataset(RAW_DATA_PATH)).head(10)
 
 
 # Affichage sous forme de table
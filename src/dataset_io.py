@@ -0,0 +1,194 @@
+"""
+Lecture / écriture des jeux de données (Parquet, Feather, CSV) avec schéma explicite
+Convertir un CSV : python src/dataset_io.py data/raw/car_data.csv data/raw/car_data.parquet
+
+Le format est déduit de l'extension. Parquet et Feather sont les formats de
+stockage (typés, colonnaires, lecture partielle des colonnes) ; le CSV reste
+disponible pour l'import et l'export. Les types sont toujours imposés par le
+schéma : DataPreprocessor choisit ses colonnes selon leur dtype, un dtype
+inféré différemment changerait silencieusement les colonnes normalisées.
+"""
+import os
+import sys
+import pandas as pd
+
+# Schéma des données brutes (les catégorielles restent en object pour DataPreprocessor)
+RAW_SCHEMA = {
+    'year': 'int64',
+    'km_driven': 'int64',
+    'fuel': 'object',
+    'transmission': 'object',
+    'owner': 'object',
+    'engine_cc': 'int64',
+    'seats': 'int64',
+    'price': 'int64',
+}
+
+# Schéma des données prétraitées (sortie de DataPreprocessor.fit_transform + prix)
+PROCESSED_SCHEMA = {
+    'year': 'float64',
+    'km_driven': 'float64',
+    'fuel': 'int64',
+    'transmission': 'int64',
+    'owner': 'int64',
+    'engine_cc': 'float64',
+    'seats': 'float64',
+    'price': 'int64',
+}
+
+RAW_DATA_PATH = 'data/raw/car_data.parquet'
+FORMATS = ('.parquet', '.feather', '.csv')
+
+
+def _format(path):
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Format non supporté : {path} (attendu : {', '.join(FORMATS)})")
+    return ext
+
+
+def resolve_dataset(path):
+    """
+    Retourne `path` s'il existe, sinon le même fichier dans un autre format
+    (.parquet, .feather puis .csv). Permet de garder des chemins par défaut en
+    Parquet tout en lisant un dépôt qui ne contient que le CSV.
+    """
+    if os.path.exists(path):
+        return path
+    stem = os.path.splitext(str(path))[0]
+    for ext in FORMATS:
+        if os.path.exists(stem + ext):
+            return stem + ext
+    raise FileNotFoundError(f"Aucun jeu de données pour {stem}.(parquet|feather|csv)")
+
+
+def apply_schema(df, schema=None):
+    """Impose les dtypes du schéma aux colonnes présentes"""
+    if not schema:
+        return df
+    for col, dtype in schema.items():
+        if col in df.columns and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def read_dataset(path, columns=None, schema=RAW_SCHEMA, skip_rows=0):
+    """
+    Lit un jeu de données (seulement `columns` si précisé) et applique le schéma.
+
+    `skip_rows` saute les premières lignes sans les décoder (groupes de lignes
+    Parquet ignorés, Feather mappé en mémoire) : utilisé pour ne relire que
+    les lignes ajoutées depuis le dernier entraînement.
+    """
+    ext = _format(path)
+    if ext == '.parquet' and skip_rows:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        # Groupes entièrement avant skip_rows : jamais lus
+        groups, first_row, end = [], None, 0
+        for i in range(parquet_file.num_row_groups):
+            start, end = end, end + parquet_file.metadata.row_group(i).num_rows
+            if end > skip_rows:
+                groups.append(i)
+                first_row = start if first_row is None else first_row
+        first_row = skip_rows if first_row is None else first_row
+        table = (parquet_file.read_row_groups(groups, columns=columns) if groups
+                 else parquet_file.schema_arrow.empty_table().select(columns or parquet_file.schema_arrow.names))
+        df = table.slice(skip_rows - first_row).to_pandas()
+    elif ext == '.parquet':
+        df = pd.read_parquet(path, columns=columns)
+    elif ext == '.feather' and skip_rows:
+        import pyarrow as pa
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        df = table.select(columns or table.schema.names).slice(skip_rows).to_pandas()
+    elif ext == '.feather':
+        df = pd.read_feather(path, columns=columns)
+    else:
+        dtypes = {c: t for c, t in (schema or {}).items() if columns is None or c in columns}
+        df = pd.read_csv(path, usecols=columns, dtype=dtypes,
+                         skiprows=range(1, skip_rows + 1) if skip_rows else None)
+    return apply_schema(df, schema)
+
+
+def write_dataset(df, path, schema=RAW_SCHEMA):
+    """Écrit un jeu de données au format déduit de l'extension (écriture atomique)"""
+    ext = _format(path)
+    df = apply_schema(df.copy(), schema) if schema else df
+    os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}{ext}"
+    if ext == '.parquet':
+        df.to_parquet(tmp_path, index=False)
+    elif ext == '.feather':
+        df.reset_index(drop=True).to_feather(tmp_path)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+class DatasetWriter:
+    """
+    Écriture d'un jeu de données paquet par paquet, sans le garder en mémoire.
+
+    Le fichier est écrit sous un nom temporaire et n'apparaît sous `path`
+    qu'à la fermeture (with DatasetWriter(...) as writer: writer.write(df)).
+    """
+    def __init__(self, path, schema=RAW_SCHEMA):
+        self.path = path
+        self.schema = schema
+        self.ext = _format(path)
+        self.rows = 0
+        self._tmp_path = f"{path}.tmp{os.getpid()}{self.ext}"
+        self._writer = None
+        self._arrow_schema = None
+        os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+
+    def write(self, df):
+        df = apply_schema(df.copy(), self.schema) if self.schema else df
+        if self.ext == '.csv':
+            df.to_csv(self._tmp_path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        else:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._arrow_schema = table.schema
+                if self.ext == '.parquet':
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(self._tmp_path, table.schema)
+                else:
+                    self._writer = pa.ipc.new_file(self._tmp_path, table.schema)
+            self._writer.write_table(table.cast(self._arrow_schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def convert(src, dst, schema=RAW_SCHEMA):
+    """Import / export : convertit un jeu de données d'un format à l'autre"""
+    write_dataset(read_dataset(src, schema=schema), dst, schema=schema)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage : python src/dataset_io.py <source> <destination>")
+        sys.exit(1)
+    convert(sys.argv[1], sys.argv[2])
+    print(f"✅ {sys.argv[1]} → {sys.argv[2]} ({os.path.getsize(sys.argv[2])} octets)")
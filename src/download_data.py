@@ -1,18 +1,39 @@
-import pandas as pd
-import numpy as np
+"""
+Génération du jeu de données synthétique
+Exécuter avec : python src/download_data.py --rows 10000000 --workers 8
+
+Les lignes sont générées par paquets, en parallèle, puis écrites au fil de
+l'eau : la mémoire utilisée ne dépend que de la taille des paquets. Chaque
+paquet a son propre flux aléatoire (SeedSequence(seed).spawn), si bien que
+le fichier produit pour une graine donnée est le même quel que soit le
+nombre de workers.
+"""
+import argparse
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.dataset_io import RAW_DATA_PATH, RAW_SCHEMA, DatasetWriter, read_dataset
+from src.utils import ordered_imap
 
-def download_car_data():
-    np.random.seed(42)
-    n_samples = 1000
+
+def generate_chunk(task):
+    """Génère un paquet de `n_rows` voitures à partir de sa propre graine"""
+    n_rows, seed_seq = task
+    rng = np.random.default_rng(seed_seq)
     data = {
-        'year': np.random.randint(2010, 2024, n_samples),
-        'km_driven': np.random.randint(5000, 200000, n_samples),
-        'fuel': np.random.choice(['Petrol','Diesel','Electric','Hybrid'], n_samples),
-        'transmission': np.random.choice(['Manual','Automatic'], n_samples),
-        'owner': np.random.choice(['First','Second','Third'], n_samples),
-        'engine_cc': np.random.choice([1000,1200,1500,2000,2500], n_samples),
-        'seats': np.random.choice([4,5,7], n_samples)
+        'year': rng.integers(2010, 2024, n_rows),
+        'km_driven': rng.integers(5000, 200000, n_rows),
+        'fuel': rng.choice(['Petrol','Diesel','Electric','Hybrid'], n_rows),
+        'transmission': rng.choice(['Manual','Automatic'], n_rows),
+        'owner': rng.choice(['First','Second','Third'], n_rows),
+        'engine_cc': rng.choice([1000,1200,1500,2000,2500], n_rows),
+        'seats': rng.choice([4,5,7], n_rows)
     }
     df = pd.DataFrame(data)
     base_price = 15000
@@ -23,12 +44,75 @@ def download_car_data():
                    + (df['owner']=='First').astype(int)*3000
                    + df['engine_cc']*2
                    + df['seats']*500
-                   + np.random.normal(0,2000,n_samples))
+                   + rng.normal(0,2000,n_rows))
     df['price'] = df['price'].clip(lower=5000).round(0).astype(int)
-    os.makedirs('data/raw', exist_ok=True)
-    df.to_csv('data/raw/car_data.csv', index=False)
-    print("✅ Données sauvegardées : data/raw/car_data.csv")
     return df
 
+
+def iter_chunk_tasks(n_samples, chunk_size, seed):
+    """(taille, graine) de chaque paquet ; le découpage ne dépend pas du nombre de workers"""
+    n_chunks = max(1, -(-n_samples // chunk_size))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    for index, seed_seq in enumerate(seeds):
+        yield min(chunk_size, n_samples - index * chunk_size), seed_seq
+
+
+def generate_dataset(n_samples=1000, chunk_size=1_000_000, n_workers=1, seed=42,
+                     output_path=RAW_DATA_PATH, csv_export=None):
+    """
+    Génère `n_samples` lignes (Parquet par défaut) et, si demandé, une copie CSV,
+    sans jamais tenir le jeu complet en mémoire.
+
+    Returns:
+        dict avec le nombre de lignes, de paquets et le débit (lignes/s)
+    """
+    start = time.perf_counter()
+    tasks = iter_chunk_tasks(n_samples, chunk_size, seed)
+    writers = [DatasetWriter(output_path)] + ([DatasetWriter(csv_export)] if csv_export else [])
+    executor = ProcessPoolExecutor(n_workers) if n_workers > 1 else None
+    chunks = 0
+    try:
+        results = (ordered_imap(executor, generate_chunk, tasks, max_pending=2 * n_workers)
+                   if executor else map(generate_chunk, tasks))
+        for df in results:
+            for writer in writers:
+                writer.write(df)
+            chunks += 1
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    for writer in writers:
+        writer.close()
+        print(f"✅ Données sauvegardées : {writer.path}")
+
+    elapsed = time.perf_counter() - start
+    return {'rows': n_samples, 'chunks': chunks, 'seconds': round(elapsed, 3),
+            'rows_per_second': round(n_samples / elapsed, 1) if elapsed else 0.0}
+
+
+def download_car_data(n_samples=1000, chunk_size=1_000_000, n_workers=1, seed=42,
+                      output_path=RAW_DATA_PATH, csv_export=None):
+    """
+    Comme generate_dataset, puis relit et retourne le DataFrame généré.
+    Pour les gros volumes, appeler generate_dataset (mémoire constante).
+    """
+    generate_dataset(n_samples, chunk_size, n_workers, seed, output_path, csv_export)
+    return read_dataset(output_path, schema=RAW_SCHEMA)
+
+
 if __name__ == '__main__':
-    download_car_data()
+    parser = argparse.ArgumentParser(description="Génère le jeu de données synthétique")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=RAW_DATA_PATH)
+    parser.add_argument('--csv-export', default=None)
+    args = parser.parse_args()
+    stats = generate_dataset(args.rows, args.chunk_size, args.workers, args.seed,
+                              args.output, args.csv_export)
+    print(f"📦 {stats['rows']} lignes en {stats['chunks']} paquets ({stats['rows_per_second']:,} lignes/s)")
@@ -0,0 +1,248 @@
+"""
+Évaluation champion / challengers sur un hold-out figé
+Exécuter avec : python src/evaluate.py models/candidates/*.pkl --preprocessor models/preprocessor.pkl
+
+Le hold-out est tiré une seule fois (données brutes, Parquet) puis relu à
+chaque évaluation : tous les modèles, d'un run à l'autre, sont comparés sur
+les mêmes lignes, jamais vues à l'entraînement (cf. exclude_holdout).
+
+Chaque preprocessor distinct n'encode le hold-out qu'une fois ; les
+prédictions de tous les candidats et du champion sont calculées en parallèle
+(threads : les predict sklearn / NumPy relâchent le GIL) et rangées dans une
+seule matrice (lignes x modèles). Les métriques globales et par segment
+(carburant, tranche d'années) sortent de quelques group-by sur cette
+matrice, quel que soit le nombre de candidats.
+
+La décision (promouvoir le meilleur challenger ou garder le champion) est
+écrite avec les métriques dans un rapport JSON, relu au déploiement.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.dataset_io import RAW_DATA_PATH, RAW_SCHEMA, read_dataset, resolve_dataset, write_dataset
+
+HOLDOUT_PATH = 'data/holdout.parquet'
+REPORT_DIR = 'models/evaluation'
+SEGMENTS = ('fuel', 'year_bucket')
+YEAR_BUCKET_SIZE = 5
+CHAMPION = 'champion'
+
+
+def load_holdout(path=HOLDOUT_PATH, source=None, fraction=0.2, seed=42):
+    """
+    Hold-out figé : relu s'il existe, sinon tiré une fois dans `source`
+    (DataFrame brut ou chemin) puis écrit en Parquet.
+    """
+    if os.path.exists(path):
+        return read_dataset(path, schema=RAW_SCHEMA)
+    if source is None:
+        source = resolve_dataset(RAW_DATA_PATH)
+    df = read_dataset(source, schema=RAW_SCHEMA) if isinstance(source, str) else source
+    holdout = df.sample(frac=fraction, random_state=seed).reset_index(drop=True)
+    write_dataset(holdout, path, schema=RAW_SCHEMA)
+    print(f"🔒 Hold-out créé : {len(holdout)} lignes → {path}")
+    # Relu depuis le disque : mêmes dtypes qu'aux runs suivants
+    return read_dataset(path, schema=RAW_SCHEMA)
+
+
+def exclude_holdout(df, holdout):
+    """Retire de `df` les lignes présentes dans le hold-out (anti-jointure sur toutes les colonnes)"""
+    columns = [c for c in holdout.columns if c in df.columns]
+    keys = holdout[columns].drop_duplicates()
+    merged = df.merge(keys, on=columns, how='left', indicator=True)
+    return df[(merged['_merge'] == 'left_only').to_numpy()].reset_index(drop=True)
+
+
+def holdout_fingerprint(holdout):
+    """Empreinte du contenu : deux rapports ne sont comparables qu'à empreinte égale"""
+    hashed = pd.util.hash_pandas_object(holdout, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+
+def add_segments(df):
+    """Colonnes de segmentation : carburant et tranche de YEAR_BUCKET_SIZE années"""
+    start = (df['year'] // YEAR_BUCKET_SIZE) * YEAR_BUCKET_SIZE
+    return pd.DataFrame({
+        'fuel': df['fuel'].astype(str).to_numpy(),
+        'year_bucket': (start.astype(str) + '-' + (start + YEAR_BUCKET_SIZE - 1).astype(str)).to_numpy()
+    })
+
+
+def score_candidates(candidates, holdout, n_workers=None):
+    """
+    Prédictions de chaque candidat sur le hold-out.
+
+    Args:
+        candidates: {nom: (modèle, preprocessor)}
+    Returns:
+        DataFrame (une colonne par candidat, dans l'ordre de `candidates`)
+    """
+    features = holdout.drop(columns='price', errors='ignore')
+    # Un seul encodage par preprocessor (les challengers d'un même run le partagent)
+    encoded = {}
+    for _, preprocessor in candidates.values():
+        if id(preprocessor) not in encoded:
+            encoded[id(preprocessor)] = preprocessor.compile().transform_frame(features)
+
+    def predict(item):
+        model, preprocessor = item
+        return np.asarray(model.predict(encoded[id(preprocessor)]), dtype=np.float64)
+
+    n_workers = n_workers or min(len(candidates), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max(1, n_workers)) as executor:
+        predictions = list(executor.map(predict, candidates.values()))
+    return pd.DataFrame(np.column_stack(predictions), columns=list(candidates))
+
+
+def overall_metrics(y, predictions):
+    """MAE / RMSE / R² de toutes les colonnes à la fois"""
+    errors = predictions.to_numpy() - y[:, None]
+    mae = np.abs(errors).mean(axis=0)
+    rmse = np.sqrt((errors ** 2).mean(axis=0))
+    r2 = 1 - (errors ** 2).sum(axis=0) / ((y - y.mean()) ** 2).sum()
+    return {name: {'mae': float(mae[i]), 'rmse': float(rmse[i]), 'r2': float(r2[i])}
+            for i, name in enumerate(predictions.columns)}
+
+
+def segment_metrics(y, predictions, segments):
+    """MAE / RMSE par valeur de chaque segment, pour tous les candidats (un group-by par segment)"""
+    errors = predictions.to_numpy() - y[:, None]
+    names = list(predictions.columns)
+    abs_errors = pd.DataFrame(np.abs(errors), columns=names)
+    sq_errors = pd.DataFrame(errors ** 2, columns=names)
+    result = {}
+    for segment in segments.columns:
+        keys = segments[segment].to_numpy()
+        mae = abs_errors.groupby(keys).mean()
+        rmse = np.sqrt(sq_errors.groupby(keys).mean())
+        counts = abs_errors.groupby(keys).size()
+        result[segment] = {
+            str(value): {
+                'rows': int(counts[value]),
+                'metrics': {name: {'mae': float(mae.at[value, name]), 'rmse': float(rmse.at[value, name])}
+                            for name in names}
+            }
+            for value in mae.index
+        }
+    return result
+
+
+def decide(overall, segments, champion=CHAMPION, min_improvement=0.0,
+           max_segment_regression=0.1, min_segment_rows=30):
+    """
+    Meilleur challenger (MAE global) promu s'il bat le champion d'au moins
+    `min_improvement` (relatif) sans dégrader de plus de `max_segment_regression`
+    un segment d'au moins `min_segment_rows` lignes.
+    """
+    challengers = {name: m for name, m in overall.items() if name != champion}
+    if not challengers:
+        return {'promote': None, 'reason': "aucun challenger"}
+    best = min(challengers, key=lambda name: challengers[name]['mae'])
+    if champion not in overall:
+        return {'promote': best, 'reason': "premier déploiement (pas de champion en production)"}
+    best_mae, champion_mae = overall[best]['mae'], overall[champion]['mae']
+    improvement = (champion_mae - best_mae) / champion_mae if champion_mae else 0.0
+    if improvement <= min_improvement:
+        return {'promote': None, 'best_challenger': best, 'improvement': round(improvement, 4),
+                'reason': f"{best} ne bat pas le champion (MAE {best_mae:.2f} vs {champion_mae:.2f})"}
+    regressions = []
+    for segment, values in segments.items():
+        for value, entry in values.items():
+            if entry['rows'] < min_segment_rows:
+                continue
+            old, new = entry['metrics'][champion]['mae'], entry['metrics'][best]['mae']
+            if old and (new - old) / old > max_segment_regression:
+                regressions.append(f"{segment}={value} (MAE {old:.2f} → {new:.2f})")
+    if regressions:
+        return {'promote': None, 'best_challenger': best, 'improvement': round(improvement, 4),
+                'reason': f"{best} dégrade des segments : {', '.join(regressions)}"}
+    return {'promote': best, 'improvement': round(improvement, 4),
+            'reason': f"{best} améliore la MAE de {improvement:.1%}"}
+
+
+def evaluate_candidates(candidates, champion=None, holdout=None, holdout_path=HOLDOUT_PATH,
+                        report_path=None, n_workers=None, segments=SEGMENTS, **decision_kwargs):
+    """
+    Évalue les challengers et le champion sur le hold-out et écrit le rapport.
+
+    Args:
+        candidates: {nom: (modèle, preprocessor)} des challengers
+        champion: ModelBundle en production (ou None au premier déploiement)
+        report_path: rapport JSON (REPORT_DIR/report-<date>.json par défaut)
+        segments: colonnes de add_segments utilisées pour les métriques par segment
+        **decision_kwargs: seuils de decide()
+
+    Returns:
+        Le rapport (dict), avec la décision sous 'decision'
+    """
+    if CHAMPION in candidates:
+        raise ValueError(f"'{CHAMPION}' est réservé au modèle en production")
+    holdout = load_holdout(holdout_path) if holdout is None else holdout
+    models = dict(candidates)
+    if champion is not None:
+        models[CHAMPION] = (champion.model, champion.preprocessor)
+    y = holdout['price'].to_numpy(dtype=np.float64)
+    predictions = score_candidates(models, holdout, n_workers)
+    overall = overall_metrics(y, predictions)
+    segments = segment_metrics(y, predictions, add_segments(holdout)[list(segments)])
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'holdout': {'path': holdout_path, 'rows': len(holdout), 'fingerprint': holdout_fingerprint(holdout)},
+        'champion_version': champion.version if champion is not None else None,
+        'overall': overall,
+        'segments': segments,
+        'decision': decide(overall, segments, **decision_kwargs)
+    }
+    report_path = report_path or os.path.join(REPORT_DIR, f"report-{datetime.now():%Y%m%d-%H%M%S}.json")
+    save_report(report, report_path)
+    report['path'] = report_path
+    return report
+
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_report(report):
+    print(f"📊 Hold-out : {report['holdout']['rows']} lignes ({report['holdout']['fingerprint']})")
+    for name, m in sorted(report['overall'].items(), key=lambda item: item[1]['mae']):
+        print(f"  {name:<24} MAE {m['mae']:>9.2f}  RMSE {m['rmse']:>9.2f}  R² {m['r2']:.4f}")
+    decision = report['decision']
+    print(("✅ " if decision['promote'] else "⚠️ ") + decision['reason'])
+
+
+if __name__ == '__main__':
+    from src.registry import ModelRegistry
+    from src.utils import load_model, load_preprocessor
+    parser = argparse.ArgumentParser(description="Évaluation champion / challengers")
+    parser.add_argument('models', nargs='+', help="modèles challengers (.pkl / .bin)")
+    parser.add_argument('--preprocessor', default='models/preprocessor.pkl')
+    parser.add_argument('--holdout', default=HOLDOUT_PATH)
+    parser.add_argument('--report', default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    champion = registry.load_bundle() if registry.current_version() else None
+    preprocessor = load_preprocessor(args.preprocessor)
+    challengers = {os.path.splitext(os.path.basename(p))[0]: (load_model(p), preprocessor) for p in args.models}
+    print_report(evaluate_candidates(challengers, champion, holdout_path=args.holdout,
+                                     report_path=args.report, n_workers=args.workers))
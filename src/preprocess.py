@@ -1,9 +1,20 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
+import hashlib
+import inspect
+import json
 import joblib
+import shutil
+import sys
 import os
 
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.artifacts import write_artifact, read_artifact
+from src.dataset_io import RAW_DATA_PATH, RAW_SCHEMA, PROCESSED_SCHEMA, read_dataset, resolve_dataset, write_dataset
+
 class DataPreprocessor:
     def __init__(self):
         self.label_encoders = {}
@@ -31,26 +42,210 @@ class DataPreprocessor:
         for col in categorical_cols:
             if col in self.label_encoders:
                 le = self.label_encoders[col]
-                df[col] = df[col].astype(str).apply(lambda x: x if x in le.classes_ else le.classes_[0])
+                values = df[col].astype(str)
+                df[col] = values.where(values.isin(le.classes_), le.classes_[0])
                 df[col] = le.transform(df[col])
         df[numerical_cols] = self.scaler.transform(df[numerical_cols])
         return df
 
+    def partial_fit(self, df):
+        """
+        Met à jour les statistiques du scaler avec de nouvelles lignes (entraînement incrémental).
+
+        Refuse toute catégorie inconnue : elle changerait les codes des label encoders
+        et donc le sens des colonnes vues par le modèle déjà entraîné.
+        """
+        X = df.drop('price', axis=1, errors='ignore')
+        for col, le in self.label_encoders.items():
+            unknown = sorted(set(X[col].astype(str).unique()) - set(le.classes_))
+            if unknown:
+                raise ValueError(f"Nouvelles catégories pour '{col}' : {unknown} (réentraînement complet nécessaire)")
+        self.scaler.partial_fit(X[list(self.scaler.feature_names_in_)])
+        return self
+
+    def compile(self):
+        """Retourne un CompiledPreprocessor (chemin rapide sans pandas)"""
+        return CompiledPreprocessor(self)
+
     def save(self, path='models/preprocessor.pkl'):
-        joblib.dump(self, path)
+        """Sauvegarde en pickle (.pkl) ou en artefact mappé en mémoire (.bin)"""
+        if not str(path).endswith('.bin'):
+            tmp_path = f"{path}.tmp{os.getpid()}"
+            joblib.dump(self, tmp_path)
+            os.replace(tmp_path, path)
+            return
+        scaler = self.scaler
+        arrays = {'mean': scaler.mean_, 'scale': scaler.scale_, 'var': scaler.var_}
+        meta = {
+            'feature_names': self.feature_names,
+            'categories': {col: [str(c) for c in le.classes_] for col, le in self.label_encoders.items()},
+            'scaled_columns': [str(c) for c in scaler.feature_names_in_],
+            'n_samples_seen': int(scaler.n_samples_seen_),
+        }
+        write_artifact(path, arrays, meta)
 
     @staticmethod
     def load(path='models/preprocessor.pkl'):
-        return joblib.load(path)
+        if not str(path).endswith('.bin'):
+            return joblib.load(path)
+        arrays, meta = read_artifact(path)
+        preprocessor = DataPreprocessor()
+        preprocessor.feature_names = meta['feature_names']
+        for col, classes in meta['categories'].items():
+            le = LabelEncoder()
+            le.classes_ = np.array(classes, dtype=object)
+            preprocessor.label_encoders[col] = le
+        scaler = preprocessor.scaler
+        scaler.mean_, scaler.scale_, scaler.var_ = arrays['mean'], arrays['scale'], arrays['var']
+        scaler.feature_names_in_ = np.array(meta['scaled_columns'], dtype=object)
+        scaler.n_features_in_ = len(meta['scaled_columns'])
+        scaler.n_samples_seen_ = meta['n_samples_seen']
+        return preprocessor
+
+class CompiledPreprocessor:
+    """
+    Version figée d'un DataPreprocessor entraîné, pour le service en ligne.
+
+    Les catégories sont résolues par dictionnaire, la moyenne et l'écart-type
+    du scaler sont gardés en tableaux NumPy et l'ordre des colonnes est fixé
+    une fois pour toutes. `transform` accepte un dict ou une liste de dicts et
+    remplit directement une matrice float64 préallouée, avec exactement les
+    mêmes valeurs que DataPreprocessor.transform.
+    """
+    def __init__(self, preprocessor):
+        self.feature_names = list(preprocessor.feature_names)
+        # Catégorie inconnue -> classes_[0], soit l'indice 0 (comme transform)
+        self.category_maps = {
+            col: {str(c): i for i, c in enumerate(le.classes_)}
+            for col, le in preprocessor.label_encoders.items()
+        }
+        scaler = preprocessor.scaler
+        scaled_cols = getattr(scaler, 'feature_names_in_', None)
+        if scaled_cols is None:
+            scaled_cols = [c for c in self.feature_names if c not in self.category_maps]
+        self.scaled_idx = np.array([self.feature_names.index(c) for c in scaled_cols], dtype=np.intp)
+        n_scaled = len(self.scaled_idx)
+        self.mean = np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(n_scaled), dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_ if scaler.with_std else np.ones(n_scaled), dtype=np.float64)
+
+    def transform(self, records):
+        """Transforme un dict (ou une liste de dicts) en matrice (n, n_features)"""
+        if isinstance(records, dict):
+            records = [records]
+        X = np.empty((len(records), len(self.feature_names)), dtype=np.float64)
+        for j, col in enumerate(self.feature_names):
+            mapping = self.category_maps.get(col)
+            if mapping is None:
+                X[:, j] = [r[col] for r in records]
+            else:
+                X[:, j] = [mapping.get(str(r[col]), 0) for r in records]
+        return self._scale(X)
+
+    def transform_frame(self, df):
+        """Même transformation, colonne par colonne, depuis un DataFrame (scoring en masse)"""
+        X = np.empty((len(df), len(self.feature_names)), dtype=np.float64)
+        for j, col in enumerate(self.feature_names):
+            mapping = self.category_maps.get(col)
+            if mapping is None:
+                X[:, j] = df[col].to_numpy(dtype=np.float64)
+            else:
+                X[:, j] = df[col].astype(str).map(mapping).fillna(0).to_numpy(dtype=np.float64)
+        return self._scale(X)
+
+    def _scale(self, X):
+        scaled = X[:, self.scaled_idx]
+        scaled -= self.mean
+        scaled /= self.scale
+        X[:, self.scaled_idx] = scaled
+        return X
+
+# Incrémenter si le prétraitement change hors de DataPreprocessor (split, nettoyage...)
+PREPROCESSOR_VERSION = 1
+CACHE_DIR = 'data/cache'
+
+def dataset_cache_key(data_path, test_size=0.2, random_state=42):
+    """Empreinte du fichier brut, des paramètres du split et du code du preprocessor"""
+    h = hashlib.sha256()
+    with open(data_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    h.update(json.dumps({
+        'test_size': test_size,
+        'random_state': random_state,
+        'preprocessor_version': PREPROCESSOR_VERSION,
+        'preprocessor_code': hashlib.sha256(inspect.getsource(DataPreprocessor).encode()).hexdigest(),
+    }, sort_keys=True).encode())
+    return h.hexdigest()[:20]
+
+def _save_cached_dataset(cache_path, X_train, X_test, y_train, y_test, preprocessor):
+    arrays = {}
+    for split, X, y in (('train', X_train, y_train), ('test', X_test, y_test)):
+        for col in X.columns:
+            arrays[f'{split}/{col}'] = X[col].to_numpy()
+        arrays[f'{split}/y'] = y.to_numpy()
+        arrays[f'{split}/index'] = X.index.to_numpy(dtype=np.int64)
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    write_artifact(os.path.join(tmp_path, 'data.bin'), arrays,
+                   {'columns': list(X_train.columns), 'target': y_train.name})
+    preprocessor.save(os.path.join(tmp_path, 'preprocessor.bin'))
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        # Entrée créée entre-temps par un autre processus : même contenu
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+def _load_cached_dataset(cache_path):
+    arrays, meta = read_artifact(os.path.join(cache_path, 'data.bin'))
+    splits = []
+    for split in ('train', 'test'):
+        index = pd.Index(arrays[f'{split}/index'])
+        # copy=False : les colonnes restent des vues sur le fichier mappé
+        X = pd.DataFrame({col: arrays[f'{split}/{col}'] for col in meta['columns']}, index=index, copy=False)
+        y = pd.Series(arrays[f'{split}/y'], index=index, name=meta['target'], copy=False)
+        splits.append((X, y))
+    (X_train, y_train), (X_test, y_test) = splits
+    preprocessor = DataPreprocessor.load(os.path.join(cache_path, 'preprocessor.bin'))
+    return X_train, X_test, y_train, y_test, preprocessor
+
+def prepare_data(data_path=RAW_DATA_PATH, test_size=0.2, random_state=42,
+                 use_cache=True, cache_dir=CACHE_DIR):
+    """
+    Prépare les jeux train/test et le preprocessor.
 
-def prepare_data(data_path='data/raw/car_data.csv', test_size=0.2):
-    df = pd.read_csv(data_path)
-    preprocessor = DataPreprocessor()
-    X, y = preprocessor.fit_transform(df)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
+    Les données brutes sont lues en Parquet (ou Feather / CSV, cf. resolve_dataset)
+    avec le schéma RAW_SCHEMA. Le résultat est mis en cache sous une clé de
+    contenu (dataset_cache_key) : tant que ni les données brutes ni le code du
+    preprocessor ne changent, les matrices sont relues par mmap sans relire le
+    fichier brut ni réentraîner le preprocessor.
+    """
+    data_path = resolve_dataset(data_path)
+    key = dataset_cache_key(data_path, test_size, random_state) if use_cache else None
+    cache_path = os.path.join(cache_dir, key) if key else None
+    if cache_path and os.path.isdir(cache_path):
+        X_train, X_test, y_train, y_test, preprocessor = _load_cached_dataset(cache_path)
+    else:
+        df = read_dataset(data_path, schema=RAW_SCHEMA)
+        preprocessor = DataPreprocessor()
+        X, y = preprocessor.fit_transform(df)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            _save_cached_dataset(cache_path, X_train, X_test, y_train, y_test, preprocessor)
+    # Les fichiers de data/processed ne sont réécrits que s'ils viennent d'un autre jeu
     os.makedirs('data/processed', exist_ok=True)
-    train_df = X_train.copy(); train_df['price']=y_train; train_df.to_csv('data/processed/train.csv', index=False)
-    test_df = X_test.copy(); test_df['price']=y_test; test_df.to_csv('data/processed/test.csv', index=False)
+    marker = 'data/processed/.cache_key'
+    cached_key = None
+    if key is not None and os.path.exists(marker):
+        with open(marker, encoding='utf-8') as f:
+            cached_key = f.read()
+    if key is None or cached_key != key:
+        for split, X, y in (('train', X_train, y_train), ('test', X_test, y_test)):
+            processed = X.copy(); processed['price'] = y
+            write_dataset(processed, f'data/processed/{split}.csv', schema=PROCESSED_SCHEMA)
+        if key:
+            with open(marker, 'w', encoding='utf-8') as f:
+                f.write(key)
     preprocessor.save()
     return X_train, X_test, y_train, y_test, preprocessor
 
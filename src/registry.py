@@ -0,0 +1,139 @@
+"""
+Registre de modèles versionné sur disque
+
+    models/registry/
+        CURRENT                  <- nom de la version en production (remplacé atomiquement)
+        20250115-103000-1a2b3c/
+            model.bin            <- modèle compilé mappé en mémoire (model.pkl si non compilable)
+            preprocessor.bin
+            meta.json
+
+Une version est écrite dans un dossier temporaire puis renommée : elle
+n'apparaît dans le registre qu'une fois complète. Le modèle et son
+preprocessor sont toujours chargés ensemble (ModelBundle).
+"""
+import json
+import os
+import shutil
+import sys
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+import joblib
+
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.compiled_model import export_model
+from src.preprocess import DataPreprocessor
+from src.utils import load_model
+
+REGISTRY_DIR = 'models/registry'
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Modèle + preprocessor (+ encoder compilé) d'une même version, immuable"""
+    version: str
+    model: object
+    preprocessor: DataPreprocessor
+    encoder: object
+    model_path: str
+    meta: dict = field(default_factory=dict)
+    loaded_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @classmethod
+    def load(cls, model_path, preprocessor_path, version='local', meta=None):
+        model = load_model(model_path)
+        preprocessor = DataPreprocessor.load(preprocessor_path)
+        return cls(version=version, model=model, preprocessor=preprocessor,
+                   encoder=preprocessor.compile(), model_path=model_path, meta=meta or {})
+
+    def predict_rows(self, rows):
+        """Prétraite (encoder compilé) et prédit une liste de dicts"""
+        return self.model.predict(self.encoder.transform(rows))
+
+
+def _atomic_write(path, content):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def versions(self):
+        """Versions publiées, de la plus ancienne à la plus récente"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if not d.startswith('.') and os.path.isdir(os.path.join(self.root, d)))
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, 'CURRENT'), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def paths(self, version):
+        """(chemin du modèle, chemin du preprocessor) d'une version"""
+        version_dir = os.path.join(self.root, version)
+        model_path = os.path.join(version_dir, 'model.bin')
+        if not os.path.exists(model_path):
+            model_path = os.path.join(version_dir, 'model.pkl')
+        return model_path, os.path.join(version_dir, 'preprocessor.bin')
+
+    def meta(self, version):
+        with open(os.path.join(self.root, version, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def publish(self, model, preprocessor, metrics=None, promote=True, **meta):
+        """
+        Publie un couple modèle/preprocessor comme nouvelle version.
+
+        Returns:
+            Le nom de la version créée
+        """
+        version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f'.tmp-{version}')
+        os.makedirs(tmp_dir)
+        try:
+            try:
+                export_model(model, os.path.join(tmp_dir, 'model.bin'))
+            except ValueError:
+                joblib.dump(model, os.path.join(tmp_dir, 'model.pkl'))
+            preprocessor.save(os.path.join(tmp_dir, 'preprocessor.bin'))
+            meta = {
+                'version': version,
+                'model_type': type(model).__name__,
+                'metrics': metrics or {},
+                'created_at': datetime.now().isoformat(),
+                **meta
+            }
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2, default=str)
+            os.rename(tmp_dir, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if promote:
+            self.promote(version)
+        return version
+
+    def promote(self, version):
+        """Fait pointer CURRENT sur `version` (remplacement atomique)"""
+        if version not in self.versions():
+            raise ValueError(f"Version inconnue : {version}")
+        _atomic_write(os.path.join(self.root, 'CURRENT'), version)
+
+    def load_bundle(self, version=None):
+        """Charge la version demandée (CURRENT par défaut) en un ModelBundle"""
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"Aucune version en production dans {self.root}")
+        model_path, preprocessor_path = self.paths(version)
+        return ModelBundle.load(model_path, preprocessor_path, version=version, meta=self.meta(version))
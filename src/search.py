@@ -0,0 +1,258 @@
+"""
+Recherche d'hyperparamètres par successive halving / Hyperband
+Exécuter avec : python src/search.py gradient_boosting --resource n_estimators --workers 4
+
+Chaque bracket tire des configurations au hasard dans l'espace de recherche,
+les entraîne avec un petit budget (fraction des données ou nombre
+d'estimateurs), ne garde que le meilleur tiers (eta = 3) et triple le budget
+des survivantes, jusqu'au budget complet. Les essais d'un même palier tournent
+en parallèle sur un pool de processus qui partage les données mappées en
+mémoire (cf. compare_models).
+
+Chaque essai est journalisé dans MLflow comme run imbriqué sous le run de la
+recherche, et l'étude est sauvegardée sur disque après chaque essai :
+relancer la même recherche reprend là où elle s'était arrêtée.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Ajouter le dossier parent au path pour importer src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.preprocess import prepare_data
+from src.tracking import default_tracker
+from src.train import _load_shared_data, _share_data, build_model, evaluate_model, train_model
+
+# Liste = choix discret ; (bas, haut) = uniforme ; (bas, haut, 'log') = log-uniforme
+SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 5, 10, 15, 20],
+    },
+    'gradient_boosting': {
+        'n_estimators': [50, 100, 200],
+        'learning_rate': (0.01, 0.3, 'log'),
+        'max_depth': [2, 3, 4, 5],
+    },
+    'ridge': {
+        'alpha': (1e-3, 100.0, 'log'),
+    },
+}
+
+STUDY_DIR = 'models/search'
+
+
+def sample_config(space, rng):
+    """Tire une configuration dans `space`"""
+    config = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            config[name] = spec[int(rng.integers(len(spec)))]
+        elif len(spec) == 3 and spec[2] == 'log':
+            config[name] = float(np.exp(rng.uniform(np.log(spec[0]), np.log(spec[1]))))
+        elif isinstance(spec[0], int) and isinstance(spec[1], int):
+            config[name] = int(rng.integers(spec[0], spec[1] + 1))
+        else:
+            config[name] = float(rng.uniform(spec[0], spec[1]))
+    return config
+
+
+def hyperband_brackets(min_resource, max_resource, eta=3):
+    """
+    Brackets Hyperband, du plus agressif au plus prudent.
+
+    Returns:
+        Liste de (s, n_configs, [budget de chaque palier])
+    """
+    s_max = int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9))
+    brackets = []
+    for s in range(s_max, -1, -1):
+        n_configs = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        brackets.append((s, n_configs, [max_resource * eta ** (i - s) for i in range(s + 1)]))
+    return brackets
+
+
+def _run_trial(task):
+    """Entraîne une configuration avec un budget donné, sur les données mappées"""
+    from threadpoolctl import threadpool_limits
+    key, model_type, params, resource, amount, data_path, threads = task
+    X_train, X_test, y_train, y_test = _load_shared_data(data_path)
+    if resource == 'data':
+        n_rows = max(2, int(round(amount * len(X_train))))
+        X_train, y_train = X_train.iloc[:n_rows], y_train.iloc[:n_rows]
+    else:
+        params = {**params, resource: int(round(amount))}
+    start = time.perf_counter()
+    with threadpool_limits(threads):
+        model = build_model(model_type, n_jobs=threads, **params)
+        model.fit(X_train, y_train)
+        metrics = evaluate_model(model, X_test, y_test)
+    result = {name: float(value) for name, value in metrics.items()}
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    return key, result
+
+
+class SearchStudy:
+    """État d'une recherche, sauvegardé en JSON après chaque essai"""
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.trials = {}
+        self.mlflow_run_id = None
+
+    @classmethod
+    def open(cls, path, settings, resume=True):
+        study = cls(path, settings)
+        if resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            # Comparaison après aller-retour JSON (les tuples deviennent des listes)
+            if saved['settings'] != json.loads(json.dumps(settings)):
+                raise ValueError(f"L'étude {path} a été lancée avec d'autres paramètres")
+            study.trials = saved['trials']
+            study.mlflow_run_id = saved.get('mlflow_run_id')
+            print(f"↩️ Reprise de l'étude : {len(study.trials)} essais déjà faits")
+        return study
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'settings': self.settings, 'mlflow_run_id': self.mlflow_run_id,
+                       'trials': self.trials}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _log_trial(tracker, key, trial):
+    # Un seul envoi groupé par essai (cf. src/tracking.py)
+    with tracker.start_run(run_name=f"trial-{key}", nested=True,
+                           tags={'bracket': trial['bracket'], 'rung': trial['rung']}) as run:
+        run.log_params({**trial['params'], 'resource_amount': trial['resource_amount']})
+        run.log_metrics({name: trial[name] for name in ('mae', 'rmse', 'r2', 'seconds')})
+
+
+def hyperband_search(model_type='gradient_boosting', space=None, resource='data',
+                     min_resource=None, max_resource=None, eta=3, max_brackets=None,
+                     n_workers=None, threads_per_worker=1, seed=42, study_path=None,
+                     resume=True, data=None, save=False, tracker=None):
+    """
+    Recherche Hyperband (successive halving si max_brackets=1).
+
+    Args:
+        resource: 'data' (fraction des lignes d'entraînement) ou 'n_estimators'
+        min_resource / max_resource: budgets du premier et du dernier palier
+        max_brackets: nombre de brackets joués (les plus agressifs d'abord)
+        study_path: fichier JSON de l'étude (reprise si resume=True)
+        save: réentraîner la meilleure configuration sur tout le jeu et la publier
+        tracker: Tracker MLflow (TRACKING_MODE=off pour ne rien journaliser)
+
+    Returns:
+        dict avec la meilleure configuration, son RMSE et le budget consommé
+    """
+    space = dict(space or SEARCH_SPACES[model_type])
+    if resource == 'data':
+        max_resource = max_resource or 1.0
+        min_resource = min_resource or max_resource / eta ** 2
+    elif resource == 'n_estimators':
+        if model_type == 'ridge':
+            raise ValueError("Le budget 'n_estimators' ne s'applique pas à ridge")
+        space.pop('n_estimators', None)
+        max_resource = max_resource or 243
+        min_resource = min_resource or max_resource / eta ** 3
+    else:
+        raise ValueError(f"Budget inconnu : {resource}")
+    brackets = hyperband_brackets(min_resource, max_resource, eta)[:max_brackets]
+
+    settings = {'model_type': model_type, 'space': space, 'resource': resource, 'eta': eta,
+                'min_resource': min_resource, 'max_resource': max_resource,
+                'max_brackets': max_brackets, 'seed': seed}
+    study_path = study_path or os.path.join(STUDY_DIR, f"{model_type}-{resource}-{seed}.json")
+    study = SearchStudy.open(study_path, settings, resume=resume)
+
+    if data is None:
+        print("📊 Préparation des données...")
+        data = prepare_data()
+    n_workers = n_workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    tracker = tracker or default_tracker()
+    if study.mlflow_run_id and not tracker.has_run(study.mlflow_run_id):
+        print("⚠️ Run MLflow de l'étude introuvable, création d'un nouveau run")
+        study.mlflow_run_id = None
+    shared_dir = tempfile.mkdtemp(prefix='search_')
+    executor = ProcessPoolExecutor(n_workers) if n_workers > 1 else None
+    try:
+        data_path = _share_data(data, shared_dir)
+        with tracker.start_run(run_name=f"search_{model_type}", run_id=study.mlflow_run_id,
+                               tags={'mode': 'search', 'resource': resource}) as parent:
+            study.mlflow_run_id = parent.run_id
+            study.save()
+            for s, n_configs, budgets in brackets:
+                rng = np.random.default_rng([seed, s])
+                survivors = [(i, sample_config(space, rng)) for i in range(n_configs)]
+                for rung, amount in enumerate(budgets):
+                    keys = [f"{s}-{rung}-{i}" for i, _ in survivors]
+                    tasks = [(key, model_type, params, resource, amount, data_path, threads_per_worker)
+                             for key, (_, params) in zip(keys, survivors) if key not in study.trials]
+                    if tasks:
+                        print(f"🔎 Bracket {s} / palier {rung} : {len(tasks)} essais, budget {amount:.4g}")
+                    results = executor.map(_run_trial, tasks) if executor else map(_run_trial, tasks)
+                    params_by_key = {task[0]: task[2] for task in tasks}
+                    for key, result in results:
+                        study.trials[key] = {'bracket': s, 'rung': rung, 'params': params_by_key[key],
+                                             'resource_amount': amount, **result}
+                        _log_trial(tracker, key, study.trials[key])
+                        study.save()
+                    # Les moins bons s'arrêtent ici (égalités départagées par l'ordre de tirage)
+                    ranked = sorted(range(len(survivors)), key=lambda j: (study.trials[keys[j]]['rmse'], j))
+                    survivors = [survivors[j] for j in ranked[:max(1, len(survivors) // eta)]]
+
+            final = [t for t in study.trials.values() if t['resource_amount'] == max_resource]
+            best = min(final, key=lambda t: t['rmse'])
+            best_params = dict(best['params'])
+            if resource != 'data':
+                best_params[resource] = int(round(max_resource))
+            # Budget consommé, en « entraînements complets » équivalents
+            used = sum(t['resource_amount'] for t in study.trials.values()) / max_resource
+            exhaustive = sum(n for _, n, _ in brackets)
+            parent.log_params({f"best_{k}": v for k, v in best_params.items()})
+            parent.log_metrics({'best_rmse': best['rmse'], 'budget_used': used,
+                                'budget_exhaustive': exhaustive})
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    summary = {'model_type': model_type, 'best_params': best_params, 'best_rmse': best['rmse'],
+               'trials': len(study.trials), 'configs': exhaustive,
+               'budget_used': round(used, 2), 'study_path': study_path}
+    print(f"\n🏆 Meilleure configuration : {best_params} - RMSE: {best['rmse']:.2f} €")
+    print(f"⚡ Budget : {used:.1f} entraînements complets pour {exhaustive} configurations")
+    if save:
+        train_model(model_type, data=data, save=True, tracker=tracker, **best_params)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres (Hyperband)")
+    parser.add_argument('model_type', choices=sorted(SEARCH_SPACES))
+    parser.add_argument('--resource', choices=['data', 'n_estimators'], default='data')
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--brackets', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--study', default=None)
+    parser.add_argument('--fresh', action='store_true', help="ignorer une étude existante")
+    parser.add_argument('--save', action='store_true', help="publier la meilleure configuration")
+    args = parser.parse_args()
+    hyperband_search(args.model_type, resource=args.resource, eta=args.eta,
+                     max_brackets=args.brackets, n_workers=args.workers,
+                     threads_per_worker=args.threads_per_worker, seed=args.seed,
+                     study_path=args.study, resume=not args.fresh, save=args.save)
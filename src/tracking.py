@@ -0,0 +1,239 @@
+"""
+Suivi des entraînements : MLflow par lots, artefacts en arrière-plan
+Mode choisi par la variable TRACKING_MODE :
+    mlflow   (défaut) : paramètres / métriques / tags envoyés en un log_batch
+                        à la fin du run (ou quand un lot est plein), modèles
+                        sérialisés et envoyés par un thread d'arrière-plan
+    offline           : même API, tout est écrit localement dans mlruns-offline/
+    off               : aucun suivi (recherches massives, tests)
+
+Utilisation :
+    tracker = Tracker("car_price_prediction")
+    with tracker.start_run(run_name="rf") as run:
+        run.log_params({...}); run.log_metrics({...}); run.log_model(model, "model")
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import joblib
+
+TRACKING_MODES = ('mlflow', 'offline', 'off')
+OFFLINE_DIR = 'mlruns-offline'
+
+# Limites d'un appel log_batch côté serveur MLflow
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+MAX_METRICS_PER_BATCH = 1000
+
+
+class TrackedRun:
+    """Run en cours : les appels log_* ne font qu'alimenter des tampons"""
+    def __init__(self, tracker, run_id, run_name=None, parent_run_id=None):
+        self.tracker = tracker
+        self.run_id = run_id
+        self.run_name = run_name
+        self.parent_run_id = parent_run_id
+        self.params = {}
+        self.metrics = []
+        self.tags = {}
+        self.artifacts = []
+        self.errors = []
+        self._pending = []
+
+    def log_param(self, key, value):
+        self.log_params({key: value})
+
+    def log_params(self, params):
+        self.params.update({key: str(value) for key, value in params.items()})
+        self._maybe_flush()
+
+    def log_metric(self, key, value, step=0):
+        self.log_metrics({key: value}, step=step)
+
+    def log_metrics(self, metrics, step=0):
+        timestamp = int(time.time() * 1000)
+        self.metrics.extend((key, float(value), timestamp, step) for key, value in metrics.items())
+        self._maybe_flush()
+
+    def set_tag(self, key, value):
+        self.set_tags({key: value})
+
+    def set_tags(self, tags):
+        self.tags.update({key: str(value) for key, value in tags.items()})
+        self._maybe_flush()
+
+    def log_model(self, model, name='model'):
+        """Sérialise et envoie le modèle dans un thread : l'entraînement continue"""
+        if self.tracker.mode == 'off':
+            return
+        executor = self.tracker._get_executor()
+        self._pending.append((name, executor.submit(self.tracker._upload_model, self, model, name)))
+
+    def _maybe_flush(self):
+        if (len(self.params) >= MAX_PARAMS_PER_BATCH or len(self.tags) >= MAX_TAGS_PER_BATCH
+                or len(self.metrics) >= MAX_METRICS_PER_BATCH):
+            self.flush()
+
+    def flush(self, wait_artifacts=False):
+        """Envoie les tampons (et attend les artefacts si demandé)"""
+        if self.params or self.metrics or self.tags:
+            self.tracker._send(self)
+            self.params, self.metrics, self.tags = {}, [], {}
+        if wait_artifacts:
+            for name, future in self._pending:
+                try:
+                    self.artifacts.append(future.result())
+                except Exception as e:
+                    # Le suivi ne doit pas faire échouer un entraînement terminé
+                    self.errors.append(f"{name}: {e}")
+                    print(f"⚠️ Artefact '{name}' non envoyé : {e}")
+            self._pending = []
+            self.tracker._finish(self)
+
+
+class Tracker:
+    def __init__(self, experiment="car_price_prediction", mode=None, offline_dir=OFFLINE_DIR):
+        self.experiment = experiment
+        self.mode = (mode or os.getenv("TRACKING_MODE", "mlflow")).lower()
+        if self.mode not in TRACKING_MODES:
+            raise ValueError(f"TRACKING_MODE inconnu : {self.mode} (attendu : {', '.join(TRACKING_MODES)})")
+        self.offline_dir = offline_dir
+        self._executor = None
+        self._executor_pid = None
+        self._runs = []
+
+    def _get_executor(self):
+        # Un processus forké (pool de compare_models / search) hérite de l'objet
+        # mais pas du thread : on recrée l'exécuteur dans chaque processus
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracking")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    @contextmanager
+    def start_run(self, run_name=None, nested=False, run_id=None, tags=None):
+        """
+        Ouvre un run ; à la sortie, les tampons sont envoyés en lot et les
+        artefacts en cours attendus. `run_id` rouvre un run existant (mode mlflow).
+        """
+        parent = self._runs[-1].run_id if nested and self._runs else None
+        if self.mode == 'mlflow':
+            import mlflow
+            mlflow.set_experiment(self.experiment)
+            with mlflow.start_run(run_id=run_id, run_name=None if run_id else run_name,
+                                  nested=nested) as active:
+                run = TrackedRun(self, active.info.run_id, run_name, parent)
+                yield from self._enter(run, tags)
+        else:
+            run_id = run_id or (uuid.uuid4().hex if self.mode == 'offline' else None)
+            run = TrackedRun(self, run_id, run_name, parent)
+            yield from self._enter(run, tags)
+
+    def _enter(self, run, tags):
+        if tags:
+            run.set_tags(tags)
+        self._runs.append(run)
+        try:
+            yield run
+        finally:
+            self._runs.pop()
+            run.flush(wait_artifacts=True)
+
+    @property
+    def client(self):
+        # Pas de cache : suit MLFLOW_TRACKING_URI s'il change
+        from mlflow.tracking import MlflowClient
+        return MlflowClient()
+
+    def has_run(self, run_id):
+        """Le run existe-t-il encore (reprise d'une recherche) ?"""
+        if self.mode == 'off' or not run_id:
+            return False
+        if self.mode == 'offline':
+            return os.path.exists(os.path.join(self.offline_dir, f"{run_id}.json"))
+        from mlflow.exceptions import MlflowException
+        try:
+            self.client.get_run(run_id)
+            return True
+        except MlflowException:
+            return False
+
+    def _send(self, run):
+        if self.mode == 'off':
+            return
+        if self.mode == 'offline':
+            record = self._offline_record(run)
+            record['params'].update(run.params)
+            record['tags'].update(run.tags)
+            record['metrics'].extend(run.metrics)
+            self._write_offline(run, record)
+            return
+        from mlflow.entities import Metric, Param, RunTag
+        params = [Param(k, v) for k, v in run.params.items()]
+        tags = [RunTag(k, v) for k, v in run.tags.items()]
+        metrics = [Metric(k, v, ts, step) for k, v, ts, step in run.metrics]
+        client = self.client
+        while params or tags or metrics:
+            client.log_batch(run.run_id, metrics=metrics[:MAX_METRICS_PER_BATCH],
+                             params=params[:MAX_PARAMS_PER_BATCH], tags=tags[:MAX_TAGS_PER_BATCH])
+            params, tags = params[MAX_PARAMS_PER_BATCH:], tags[MAX_TAGS_PER_BATCH:]
+            metrics = metrics[MAX_METRICS_PER_BATCH:]
+
+    def _upload_model(self, run, model, name):
+        """Exécuté dans le thread d'arrière-plan"""
+        if self.mode == 'offline':
+            path = os.path.join(self.offline_dir, run.run_id, f"{name}.pkl")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            joblib.dump(model, path)
+            return path
+        import mlflow.sklearn
+        tmp_dir = tempfile.mkdtemp(prefix="tracking_")
+        try:
+            local_path = os.path.join(tmp_dir, name)
+            mlflow.sklearn.save_model(model, local_path)
+            self.client.log_artifacts(run.run_id, local_path, artifact_path=name)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return name
+
+    def _finish(self, run):
+        if self.mode == 'offline':
+            record = self._offline_record(run)
+            record['artifacts'] = run.artifacts
+            record['errors'] = run.errors
+            self._write_offline(run, record)
+
+    def _offline_path(self, run):
+        return os.path.join(self.offline_dir, f"{run.run_id}.json")
+
+    def _offline_record(self, run):
+        try:
+            with open(self._offline_path(run), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'run_id': run.run_id, 'run_name': run.run_name, 'experiment': self.experiment,
+                    'parent_run_id': run.parent_run_id, 'params': {}, 'metrics': [], 'tags': {}}
+
+    def _write_offline(self, run, record):
+        os.makedirs(self.offline_dir, exist_ok=True)
+        path = self._offline_path(run)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+_default_trackers = {}
+
+
+def default_tracker():
+    """Tracker partagé par le processus pour le mode courant (TRACKING_MODE)"""
+    mode = os.getenv("TRACKING_MODE", "mlflow").lower()
+    if mode not in _default_trackers:
+        _default_trackers[mode] = Tracker(mode=mode)
+    return _default_trackers[mode]
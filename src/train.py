@@ -2,18 +2,33 @@
 Script d'entraînement avec tracking MLflow
 Permet de comparer différents modèles et hyperparamètres
 """
-import mlflow
-import mlflow.sklearn
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import Ridge
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import joblib
+import json
 import numpy as np
+import pandas as pd
+import shutil
 import sys
 import os
+import tempfile
 
 # Ajouter le dossier src au path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from src.preprocess import prepare_data
+from src.dataset_io import RAW_DATA_PATH, read_dataset, resolve_dataset
+from src.preprocess import DataPreprocessor, prepare_data
+from src.artifacts import write_artifact, read_artifact
+from src.compiled_model import export_model
+from src.registry import ModelRegistry
+from src.tracking import default_tracker
+from src.utils import atomic_dump
+
+# Lignes du jeu brut déjà vues par le modèle en production (entraînement incrémental)
+SNAPSHOT_PATH = 'models/train_snapshot.json'
 
 def evaluate_model(model, X_test, y_test):
     """Évalue un modèle et retourne les métriques"""
@@ -28,49 +43,76 @@ def evaluate_model(model, X_test, y_test):
         'r2': r2
     }
 
-def train_model(model_type='random_forest', **kwargs):
+def build_model(model_type='random_forest', n_jobs=None, **kwargs):
+    """Instancie le modèle sklearn correspondant à `model_type`"""
+    if model_type == 'random_forest':
+        return RandomForestRegressor(
+            n_estimators=kwargs.get('n_estimators', 100),
+            max_depth=kwargs.get('max_depth', None),
+            random_state=42,
+            n_jobs=n_jobs
+        )
+    elif model_type == 'gradient_boosting':
+        return GradientBoostingRegressor(
+            n_estimators=kwargs.get('n_estimators', 100),
+            learning_rate=kwargs.get('learning_rate', 0.1),
+            max_depth=kwargs.get('max_depth', 3),
+            random_state=42
+        )
+    elif model_type == 'ridge':
+        return Ridge(
+            alpha=kwargs.get('alpha', 1.0),
+            random_state=42
+        )
+    raise ValueError(f"Type de modèle inconnu : {model_type}")
+
+def save_production_model(model, preprocessor, metrics, params=None, mlflow_run_id=None):
+    """
+    Sauvegarde le modèle en production (pickles + artefacts mappés) et le
+    publie dans le registre. Retourne la version créée.
+    """
+    os.makedirs('models', exist_ok=True)
+    atomic_dump(model, 'models/production_model.pkl')
+    preprocessor.save('models/preprocessor.pkl')
+    # Artefacts mappés en mémoire servis par l'API
+    export_model(model, 'models/production_model.bin')
+    preprocessor.save('models/preprocessor.bin')
+    # Publier la version dans le registre (l'API bascule sans redémarrage)
+    return ModelRegistry().publish(
+        model, preprocessor, metrics=metrics,
+        params=params or {}, mlflow_run_id=mlflow_run_id
+    )
+
+def train_model(model_type='random_forest', data=None, save=True, n_jobs=None, tracker=None, **kwargs):
     """
     Entraîne un modèle avec MLflow tracking
     
     Args:
         model_type: 'random_forest', 'gradient_boosting', ou 'ridge'
+        data: (X_train, X_test, y_train, y_test, preprocessor) déjà préparés,
+              sinon prepare_data() est appelé
+        save: sauvegarder le modèle en production et le publier dans le registre
+        n_jobs: threads utilisés par l'entraînement (random_forest)
+        tracker: Tracker MLflow (cf. src/tracking.py), celui par défaut sinon
         **kwargs: Hyperparamètres du modèle
     """
     # 1️⃣ Préparer les données
-    print("📊 Préparation des données...")
-    X_train, X_test, y_train, y_test, preprocessor = prepare_data()
+    from_raw = data is None
+    if from_raw:
+        print("📊 Préparation des données...")
+        data = prepare_data()
+    X_train, X_test, y_train, y_test, preprocessor = data
     
-    # 2️⃣ Configurer MLflow
-    mlflow.set_experiment("car_price_prediction")
+    # 2️⃣ Configurer MLflow (envois groupés en fin de run)
+    tracker = tracker or default_tracker()
     
-    with mlflow.start_run(run_name=f"{model_type}_experiment"):
+    with tracker.start_run(run_name=f"{model_type}_experiment") as run:
         
         # 3️⃣ Créer le modèle selon le type
-        if model_type == 'random_forest':
-            model = RandomForestRegressor(
-                n_estimators=kwargs.get('n_estimators', 100),
-                max_depth=kwargs.get('max_depth', None),
-                random_state=42
-            )
-        elif model_type == 'gradient_boosting':
-            model = GradientBoostingRegressor(
-                n_estimators=kwargs.get('n_estimators', 100),
-                learning_rate=kwargs.get('learning_rate', 0.1),
-                max_depth=kwargs.get('max_depth', 3),
-                random_state=42
-            )
-        elif model_type == 'ridge':
-            model = Ridge(
-                alpha=kwargs.get('alpha', 1.0),
-                random_state=42
-            )
-        else:
-            raise ValueError(f"Type de modèle inconnu : {model_type}")
+        model = build_model(model_type, n_jobs=n_jobs, **kwargs)
         
         # 4️⃣ Logger les paramètres
-        mlflow.log_param("model_type", model_type)
-        for key, value in kwargs.items():
-            mlflow.log_param(key, value)
+        run.log_params({"model_type": model_type, **kwargs})
         
         # 5️⃣ Entraîner le modèle
         print(f"🏋️ Entraînement du modèle {model_type}...")
@@ -84,42 +126,236 @@ def train_model(model_type='random_forest', **kwargs):
         print(f"  R²:   {metrics['r2']:.4f}")
         
         # 7️⃣ Logger les métriques
-        mlflow.log_metric("mae", metrics['mae'])
-        mlflow.log_metric("rmse", metrics['rmse'])
-        mlflow.log_metric("r2", metrics['r2'])
-        
-        # 8️⃣ Sauvegarder le modèle dans MLflow
-        mlflow.sklearn.log_model(model, "model")
+        run.log_metrics(metrics)
         
-        # 9️⃣ Sauvegarder aussi localement si c'est le meilleur
-        import joblib
-        os.makedirs('models', exist_ok=True)
-        joblib.dump(model, 'models/production_model.pkl')
-        preprocessor.save('models/preprocessor.pkl')
+        # 8️⃣ Sauvegarder le modèle dans MLflow (en arrière-plan)
+        run.log_model(model, "model")
         
-        print(f"\n✅ Modèle sauvegardé !")
+        # 9️⃣ Sauvegarder en production et publier dans le registre
+        if save:
+            version = save_production_model(
+                model, preprocessor, metrics,
+                params={'model_type': model_type, **kwargs},
+                mlflow_run_id=run.run_id
+            )
+            run.set_tag("registry_version", version)
+            if from_raw:
+                _write_snapshot(len(X_train) + len(X_test), model_type, version, run.run_id)
+            print(f"\n✅ Modèle sauvegardé ! (version {version})")
         print(f"📂 MLflow UI : mlflow ui --port 5000")
         
         return model, metrics
 
-def compare_models():
-    """Compare plusieurs modèles et affiche les résultats"""
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Dernier snapshot entraîné (lignes vues, version, run MLflow) ou None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_snapshot(rows, model_type, version, mlflow_run_id, parent=None,
+                    data_path=RAW_DATA_PATH, path=SNAPSHOT_PATH):
+    snapshot = {
+        'data_path': resolve_dataset(data_path),
+        'rows': rows,
+        'model_type': model_type,
+        'registry_version': version,
+        'mlflow_run_id': mlflow_run_id,
+        'parent_run_id': parent['mlflow_run_id'] if parent else None,
+        'mode': 'incremental' if parent else 'full',
+        'created_at': datetime.now().isoformat(),
+    }
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(tmp_path, path)
+    return snapshot
+
+def _rescale_trees(model, preprocessor, old_mean, old_scale):
+    """
+    Réexprime les seuils des arbres existants dans l'espace du scaler mis à jour.
+
+    Un seuil t appris sur (x - m_old) / s_old correspond à la valeur brute
+    t * s_old + m_old, soit (t * s_old + m_old - m_new) / s_new après mise à jour :
+    les anciens arbres prennent exactement les mêmes décisions sur les données brutes.
+    """
+    scaler = preprocessor.scaler
+    factor = np.ones(len(preprocessor.feature_names))
+    shift = np.zeros(len(preprocessor.feature_names))
+    for k, col in enumerate(scaler.feature_names_in_):
+        j = preprocessor.feature_names.index(col)
+        factor[j] = old_scale[k] / scaler.scale_[k]
+        shift[j] = (old_mean[k] - scaler.mean_[k]) / scaler.scale_[k]
+    for estimator in np.ravel(model.estimators_):
+        state = estimator.tree_.__getstate__()
+        nodes = state['nodes']
+        split = nodes['feature'] >= 0
+        features = nodes['feature'][split]
+        nodes['threshold'][split] = nodes['threshold'][split] * factor[features] + shift[features]
+        estimator.tree_.__setstate__(state)
+
+def train_incremental(data_path=RAW_DATA_PATH, n_new_estimators=50, test_size=0.2,
+                      random_state=42, save=True, tracker=None):
+    """
+    Prolonge le modèle en production avec les seules lignes ajoutées depuis le dernier snapshot.
+
+    RandomForest : `n_new_estimators` arbres supplémentaires (warm_start) ;
+    GradientBoosting : autant d'étapes de boosting supplémentaires. Les
+    statistiques du scaler sont mises à jour en ligne (partial_fit) et les
+    seuils des arbres existants réexprimés en conséquence. Une nouvelle
+    catégorie fait échouer l'entraînement (réentraînement complet nécessaire).
+
+    Returns:
+        (model, metrics) ; (None, None) s'il n'y a aucune nouvelle ligne
+    """
+    snapshot = load_snapshot()
+    if snapshot is None:
+        raise FileNotFoundError(f"Aucun snapshot dans {SNAPSHOT_PATH} : lancer d'abord un entraînement complet")
+    data_path = resolve_dataset(data_path)
+    if os.path.abspath(data_path) != os.path.abspath(snapshot['data_path']):
+        raise ValueError(f"Le snapshot porte sur {snapshot['data_path']}, pas sur {data_path}")
+    new = read_dataset(data_path, skip_rows=snapshot['rows'])
+    if new.empty:
+        print(f"✅ Aucune nouvelle ligne depuis le snapshot ({snapshot['rows']} lignes)")
+        return None, None
+    print(f"📊 {len(new)} nouvelles lignes (après {snapshot['rows']})")
+
+    model = joblib.load('models/production_model.pkl')
+    if not isinstance(model, (RandomForestRegressor, GradientBoostingRegressor)):
+        raise ValueError(f"Entraînement incrémental non supporté pour {type(model).__name__}")
+    preprocessor = DataPreprocessor.load('models/preprocessor.pkl')
+    old_mean = preprocessor.scaler.mean_.copy()
+    old_scale = preprocessor.scaler.scale_.copy()
+    preprocessor.partial_fit(new)
+    _rescale_trees(model, preprocessor, old_mean, old_scale)
+
+    X = preprocessor.transform(new.drop('price', axis=1))[preprocessor.feature_names]
+    y = new['price']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+    model_type = snapshot['model_type']
+    tracker = tracker or default_tracker()
+    with tracker.start_run(run_name=f"{model_type}_incremental") as run:
+        # Lignage : run parent, version parente et plage de lignes de ce snapshot
+        run.set_tags({
+            'mode': 'incremental',
+            'parent_run_id': snapshot['mlflow_run_id'] or '',
+            'parent_version': snapshot['registry_version'] or '',
+            'data_path': data_path,
+            'rows_from': snapshot['rows'],
+            'rows_to': snapshot['rows'] + len(new),
+        })
+        run.log_params({"model_type": model_type, "n_new_estimators": n_new_estimators})
+
+        print(f"🏋️ Ajout de {n_new_estimators} estimateurs au modèle {model_type}...")
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + n_new_estimators)
+        model.fit(X_train, y_train)
+        run.log_param("n_estimators", model.n_estimators)
+
+        metrics = evaluate_model(model, X_test, y_test)
+        print(f"  MAE:  {metrics['mae']:.2f} € (nouvelles lignes)")
+        run.log_metrics(metrics)
+        run.log_model(model, "model")
+
+        if save:
+            run_id = run.run_id
+            version = save_production_model(
+                model, preprocessor, metrics,
+                params={'model_type': model_type, 'n_estimators': model.n_estimators, 'mode': 'incremental'},
+                mlflow_run_id=run_id
+            )
+            run.set_tag("registry_version", version)
+            _write_snapshot(snapshot['rows'] + len(new), model_type, version, run_id,
+                            parent=snapshot, data_path=data_path)
+            print(f"\n✅ Modèle prolongé ! (version {version})")
+        return model, metrics
+
+def _share_data(data, directory):
+    """Écrit les matrices train/test dans un artefact mappable par les workers"""
+    X_train, X_test, y_train, y_test, _ = data
+    path = os.path.join(directory, 'data.bin')
+    write_artifact(path, {
+        'X_train': X_train.to_numpy(dtype=np.float64),
+        'X_test': X_test.to_numpy(dtype=np.float64),
+        'y_train': y_train.to_numpy(dtype=np.float64),
+        'y_test': y_test.to_numpy(dtype=np.float64),
+    }, {'columns': list(X_train.columns)})
+    return path
+
+def _load_shared_data(data_path):
+    """(X_train, X_test, y_train, y_test) depuis l'artefact écrit par _share_data"""
+    arrays, meta = read_artifact(data_path)
+    # copy=False : les DataFrames restent des vues sur le fichier mappé
+    X_train = pd.DataFrame(arrays['X_train'], columns=meta['columns'], copy=False)
+    X_test = pd.DataFrame(arrays['X_test'], columns=meta['columns'], copy=False)
+    y_train, y_test = pd.Series(arrays['y_train'], copy=False), pd.Series(arrays['y_test'], copy=False)
+    return X_train, X_test, y_train, y_test
+
+def _train_worker(task):
+    """Entraîne une expérience dans un processus du pool, sur les données mappées"""
+    from threadpoolctl import threadpool_limits
+    index, exp, data_path, threads = task
+    X_train, X_test, y_train, y_test = _load_shared_data(data_path)
+    with threadpool_limits(threads):
+        model, metrics = train_model(**exp, data=(X_train, X_test, y_train, y_test, None),
+                                     save=False, n_jobs=threads)
+    return index, model, metrics
+
+DEFAULT_EXPERIMENTS = [
+    {'model_type': 'random_forest', 'n_estimators': 50, 'max_depth': 10},
+    {'model_type': 'random_forest', 'n_estimators': 100, 'max_depth': 15},
+    {'model_type': 'gradient_boosting', 'n_estimators': 100, 'learning_rate': 0.1},
+    {'model_type': 'ridge', 'alpha': 1.0}
+]
+
+def compare_models(experiments=None, parallel=False, n_workers=None, threads_per_worker=1,
+                   data=None, save=True):
+    """
+    Compare plusieurs modèles et affiche les résultats
+    
+    Les données sont préparées une seule fois. En mode parallèle, elles sont
+    écrites dans un artefact mappé en mémoire partagé par les processus du
+    pool (aucune copie par worker) et chaque worker dispose de
+    `threads_per_worker` threads. Le meilleur modèle (plus petit RMSE, puis
+    ordre de la grille en cas d'égalité) est choisi à la fin, quel que soit
+    l'ordre d'exécution.
+    
+    Returns:
+        Liste des résultats (paramètres + métriques), dans l'ordre de la grille
+    """
     print("🔬 Comparaison de plusieurs modèles...\n")
+    experiments = experiments or DEFAULT_EXPERIMENTS
     
-    experiments = [
-        {'model_type': 'random_forest', 'n_estimators': 50, 'max_depth': 10},
-        {'model_type': 'random_forest', 'n_estimators': 100, 'max_depth': 15},
-        {'model_type': 'gradient_boosting', 'n_estimators': 100, 'learning_rate': 0.1},
-        {'model_type': 'ridge', 'alpha': 1.0}
-    ]
+    from_raw = data is None
+    if from_raw:
+        print("📊 Préparation des données...")
+        data = prepare_data()
+    preprocessor = data[4]
+    
+    models = [None] * len(experiments)
+    metrics_list = [None] * len(experiments)
+    if parallel:
+        n_workers = n_workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        shared_dir = tempfile.mkdtemp(prefix='compare_models_')
+        try:
+            data_path = _share_data(data, shared_dir)
+            tasks = [(i, exp, data_path, threads_per_worker) for i, exp in enumerate(experiments)]
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                for index, model, metrics in executor.map(_train_worker, tasks):
+                    models[index], metrics_list[index] = model, metrics
+        finally:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+    else:
+        for i, exp in enumerate(experiments):
+            print(f"\n{'='*60}")
+            print(f"Test : {exp}")
+            print('='*60)
+            models[i], metrics_list[i] = train_model(**exp, data=data, save=False,
+                                                     n_jobs=threads_per_worker)
     
-    results = []
-    for exp in experiments:
-        print(f"\n{'='*60}")
-        print(f"Test : {exp}")
-        print('='*60)
-        model, metrics = train_model(**exp)
-        results.append({**exp, **metrics})
+    results = [{**exp, **metrics} for exp, metrics in zip(experiments, metrics_list)]
+    best = min(range(len(results)), key=lambda i: (results[i]['rmse'], i))
     
     # Afficher le résumé
     print("\n" + "="*80)
@@ -130,14 +366,23 @@ def compare_models():
         print(f"\n{i}. {r['model_type']} - RMSE: {r['rmse']:.2f} € - R²: {r['r2']:.4f}")
         print(f"   Paramètres: {', '.join([f'{k}={v}' for k,v in r.items() if k not in ['mae','rmse','r2','model_type']])}")
     
-    print("\n🏆 Meilleur modèle sauvegardé dans models/production_model.pkl")
+    if save:
+        best_params = experiments[best]
+        version = save_production_model(models[best], preprocessor, metrics_list[best], params=best_params)
+        if from_raw:
+            _write_snapshot(len(data[0]) + len(data[1]), best_params['model_type'], version, None)
+        print(f"\n🏆 Meilleur modèle ({best_params}) sauvegardé dans models/production_model.pkl (version {version})")
+    return results
 
 if __name__ == '__main__':
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == 'compare':
-        # Mode comparaison : python src/train.py compare
-        compare_models()
+        # Mode comparaison : python src/train.py compare [parallel]
+        compare_models(parallel=len(sys.argv) > 2 and sys.argv[2] == 'parallel')
+    elif len(sys.argv) > 1 and sys.argv[1] == 'incremental':
+        # Mode incrémental : python src/train.py incremental
+        train_incremental()
     else:
         # Mode simple : python src/train.py
         train_model(model_type='random_forest', n_estimators=100, max_depth=15)
\ No newline at end of file
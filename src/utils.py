@@ -1,14 +1,40 @@
+import os
+from collections import deque
 import joblib
 import pandas as pd
+from src.compiled_model import CompiledModel
+from src.preprocess import DataPreprocessor
+
+def atomic_dump(obj, path):
+    """joblib.dump via un fichier temporaire : un lecteur ne voit jamais un pickle partiel"""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
 
 def load_model(path='models/production_model.pkl'):
+    """Charge un modèle pickle (.pkl) ou compilé (.bin mappé en mémoire, .npz)"""
+    if str(path).endswith(('.bin', '.npz')):
+        return CompiledModel.load(path)
     return joblib.load(path)
 
 def load_preprocessor(path='models/preprocessor.pkl'):
-    return joblib.load(path)
+    return DataPreprocessor.load(path)
 
 def predict(model, preprocessor, input_data):
     if isinstance(input_data, dict):
         input_data = pd.DataFrame([input_data])
     X = preprocessor.transform(input_data)
     return model.predict(X)[0]
+
+def ordered_imap(executor, fn, iterable, max_pending):
+    """
+    Comme executor.map, mais avec au plus `max_pending` tâches en vol :
+    l'itérable est consommé au fil de l'eau et les résultats sortent dans l'ordre.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
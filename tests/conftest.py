@@ -0,0 +1,20 @@
+"""
+Options communes des tests
+Benchmarks (lents, désactivés par défaut) : pytest tests/ --run-benchmarks
+"""
+import pytest
+
+def pytest_addoption(parser):
+    parser.addoption("--run-benchmarks", action="store_true", default=False,
+                     help="exécuter aussi les tests marqués benchmark")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: micro-benchmark lent, lancé avec --run-benchmarks")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmark : lancer avec --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
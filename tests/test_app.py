@@ -0,0 +1,503 @@
+"""
+Tests in-process de l'API (sans serveur lancé)
+Exécuter avec : pytest tests/test_app.py
+"""
+from fastapi.testclient import TestClient
+from api.app import app
+
+client = TestClient(app)
+
+CAR = {
+    "year": 2020,
+    "km_driven": 35000,
+    "fuel": "Diesel",
+    "transmission": "Automatic",
+    "owner": "First",
+    "engine_cc": 1500,
+    "seats": 5
+}
+
+def test_batch_matches_single_predictions():
+    cars = [CAR, {**CAR, "year": 2015, "fuel": "Petrol"}, {**CAR, "km_driven": 150000}]
+    batch = client.post("/predict/batch", json=cars).json()
+    assert batch["total_cars"] == 3
+    assert batch["errors"] == []
+    for car, pred in zip(cars, batch["predictions"]):
+        single = client.post("/predict", json=car).json()
+        assert pred["predicted_price"] == single["predicted_price"]
+        assert pred["confidence"] == single["confidence"]
+        assert pred["input_data"] == car
+
+def test_batch_reports_invalid_rows_individually():
+    cars = [CAR, {**CAR, "seats": 10}, {**CAR, "fuel": None}, {**CAR, "year": 2018}]
+    response = client.post("/predict/batch", json=cars)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["total_cars"], result["valid_cars"], result["failed_cars"]) == (4, 2, 2)
+    assert [e["index"] for e in result["errors"]] == [1, 2]
+
+def test_batch_body_is_documented_as_car_inputs():
+    schema = client.get("/openapi.json").json()
+    body = schema["paths"]["/predict/batch"]["post"]["requestBody"]["content"]["application/json"]["schema"]
+    assert body["type"] == "array" and body["items"] == {"$ref": "#/components/schemas/CarInput"}
+    assert "CarInput" in schema["components"]["schemas"]
+
+def test_microbatcher_coalesces_concurrent_requests():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from api.batching import MicroBatcher
+
+    calls = []
+    release = threading.Event()
+
+    def predict_fn(rows):
+        calls.append(len(rows))
+        release.wait(1)
+        return [row["x"] * 2 for row in rows]
+
+    batcher = MicroBatcher(predict_fn, max_wait_ms=20, max_batch_size=8)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futures = [pool.submit(batcher.predict, {"x": i}) for i in range(16)]
+        release.set()
+        results = [f.result() for f in futures]
+    batcher.close()
+
+    assert results == [i * 2 for i in range(16)]
+    assert sum(calls) == 16 and len(calls) < 16
+    stats = batcher.stats()
+    assert stats["items"] == 16 and stats["max_batch_size"] <= 8
+
+def test_microbatcher_fails_every_caller_on_short_predictions():
+    import pytest
+    from api.batching import MicroBatcher
+    batcher = MicroBatcher(lambda rows: [0.0] * (len(rows) - 1), max_wait_ms=1)
+    future = batcher.submit({"x": 1})
+    with pytest.raises(ValueError):
+        future.result(timeout=5)
+    batcher.close()
+
+def test_batching_stats_endpoint(monkeypatch):
+    import api.app as app_module
+    from api.batching import MicroBatcher
+    # Micro-batching actif et cache coupé, quelle que soit la configuration
+    batcher = MicroBatcher(app_module._predict_rows)
+    monkeypatch.setattr(app_module, "batcher", batcher)
+    monkeypatch.setattr(app_module, "cache", None)
+    client.post("/predict", json=CAR)
+    stats = client.get("/batching/stats").json()
+    assert stats["enabled"] and stats["items"] == 1
+    batcher.close()
+
+def test_reload_swaps_bundle_without_downtime():
+    import api.app as app_module
+    before = app_module.bundle
+    response = client.post("/model/reload")
+    assert response.status_code == 200
+    assert app_module.bundle is not before
+    assert client.post("/predict", json=CAR).status_code == 200
+    assert client.get("/model/info").json()["version"] == app_module.bundle.version
+
+def test_prediction_cache_lru_and_ttl():
+    import time
+    from api.cache import PredictionCache
+    cache = PredictionCache(max_size=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0      # "a" devient le plus récent
+    cache.put("c", 3.0)               # évince "b"
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    expiring = PredictionCache(max_size=10, ttl=0.01)
+    expiring.put("a", 1.0)
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+def test_cache_serves_repeated_inputs_and_is_invalidated_on_reload(monkeypatch):
+    import api.app as app_module
+    from api.cache import PredictionCache
+    monkeypatch.setattr(app_module, "cache", PredictionCache(100))
+    car = {**CAR, "km_driven": 12345}
+    first = client.post("/predict", json=car).json()
+    hits = client.get("/cache/stats").json()["hits"]
+    batch = client.post("/predict/batch", json=[car, {**car, "seats": 7}]).json()
+    assert client.get("/cache/stats").json()["hits"] == hits + 1
+    assert batch["predictions"][0]["predicted_price"] == first["predicted_price"]
+
+    client.post("/model/reload")
+    assert client.get("/cache/stats").json()["size"] == 0
+
+def test_predictions_use_the_bundle_captured_by_the_request(monkeypatch):
+    import dataclasses
+    import api.app as app_module
+    from api.batching import MicroBatcher
+    from api.cache import PredictionCache
+
+    class Doubled:
+        def __init__(self, model):
+            self.model = model
+        def predict(self, X):
+            return self.model.predict(X) * 2
+
+    # Bascule entre la capture du bundle par la requête et la prédiction
+    old = app_module.bundle
+    new = dataclasses.replace(old, version="swapped", model=Doubled(old.model))
+    monkeypatch.setattr(app_module, "bundle", new)
+    monkeypatch.setattr(app_module, "cache", PredictionCache(100))
+    batcher = MicroBatcher(app_module._predict_rows)
+    monkeypatch.setattr(app_module, "batcher", batcher)
+    car = {**CAR, "km_driven": 54321}
+    expected = float(old.predict_rows([car])[0])
+
+    price, version = app_module._cached_predict([car], old)[0]
+    assert abs(price - expected) < 1e-6 and version == old.version
+    price, version = app_module.cache.get(app_module.cache.make_key(old.version, car))
+    assert abs(price - expected) < 1e-6 and version == old.version
+    # Un lot mêlant deux versions : chaque ligne est prédite par la sienne
+    price, version = batcher.predict(car, old)
+    assert abs(price - expected) < 1e-6 and version == old.version
+    price, version = batcher.predict(car, new)
+    assert abs(price - 2 * expected) < 1e-6 and version == "swapped"
+    batcher.close()
+
+def test_stream_predict_ndjson_and_csv():
+    import json
+    cars = [CAR, {**CAR, "seats": 10}, {**CAR, "year": 2016}]
+    ndjson = "\n".join(json.dumps(c) for c in cars) + "\n{pas du json\n"
+    response = client.post(
+        "/predict/stream",
+        params={"chunk_size": 2, "include_input": False},
+        files={"file": ("cars.ndjson", ndjson, "application/x-ndjson")}
+    )
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert [l["index"] for l in lines] == [0, 1, 2, 3]
+    assert "error" in lines[1] and "error" in lines[3]
+    assert "input_data" not in lines[0]
+    single = client.post("/predict", json=CAR).json()
+    assert lines[0]["predicted_price"] == single["predicted_price"]
+
+    header = ",".join(CAR)
+    csv_body = header + "\n" + "\n".join(",".join(str(c[k]) for k in CAR) for c in cars)
+    response = client.post("/predict/stream", files={"file": ("cars.csv", csv_body, "text/csv")})
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert lines[0]["predicted_price"] == single["predicted_price"]
+    assert lines[2]["input_data"]["year"] == 2016
+
+    # Ligne CSV illisible (champ au-delà de csv.field_size_limit) : erreur sur sa ligne, le flux continue
+    rows = csv_body.splitlines()
+    bad = csv_body.replace(rows[2], '"' + "x" * 200000 + '",1')
+    response = client.post("/predict/stream", files={"file": ("cars.csv", bad, "text/csv")})
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert [l["index"] for l in lines] == [0, 1, 2]
+    assert "CSV invalide" in lines[1]["error"] and lines[2]["input_data"]["year"] == 2016
+
+    # Octets hors UTF-8 : erreur sur leur ligne, réponse complète (NDJSON et CSV)
+    ndjson_bytes = (json.dumps(CAR) + "\n").encode() + b"\xff\xfe\n" + (json.dumps(cars[2]) + "\n").encode()
+    response = client.post("/predict/stream",
+                           files={"file": ("cars.ndjson", ndjson_bytes, "application/x-ndjson")})
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert [l["index"] for l in lines] == [0, 1, 2]
+    assert "UTF-8" in lines[1]["error"] and lines[2]["input_data"]["year"] == 2016
+    csv_bytes = csv_body.replace(rows[2], "\udcff").encode("utf-8", "surrogateescape")
+    response = client.post("/predict/stream", files={"file": ("cars.csv", csv_bytes, "text/csv")})
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert [l["index"] for l in lines] == [0, 1, 2]
+    assert "UTF-8" in lines[1]["error"] and lines[2]["input_data"]["year"] == 2016
+
+def test_prediction_log_records_and_rotates(tmp_path, monkeypatch):
+    import gzip
+    import json
+    import api.app as app_module
+    from monitoring.prediction_log import PredictionLogger
+    logger = PredictionLogger(str(tmp_path / "predictions.jsonl"), flush_interval=60)
+    monkeypatch.setattr(app_module, "prediction_log", logger)
+
+    single = client.post("/predict", json=CAR).json()
+    client.post("/predict/batch", json=[CAR, {**CAR, "year": 2015}])
+    logger.flush()
+    records = [json.loads(line) for line in open(logger.path, encoding="utf-8")]
+    assert [r["source"] for r in records] == ["predict", "batch", "batch"]
+    assert records[0]["input"] == CAR and records[0]["prediction"] == single["predicted_price"]
+    assert records[0]["model_version"] == app_module.bundle.version and records[0]["latency_ms"] >= 0
+    assert client.get("/predictions/log/stats").json()["written"] == 3
+    logger.close()
+
+    # Tampon plein : abandon sans blocage ; au-delà de max_bytes : rotation compressée
+    # (batch_size > capacity et flush_interval long : le writer ne se réveille pas)
+    small = PredictionLogger(str(tmp_path / "small.jsonl"), capacity=5, batch_size=100,
+                             flush_interval=60, max_bytes=200)
+    accepted = [small.log(CAR, 1.0, "v", 0.1) for _ in range(8)]
+    assert accepted.count(True) == 5 and small.stats()["dropped"] == 3
+    small.flush()
+    assert small.stats()["rotations"] == 1
+    with gzip.open(tmp_path / "small.jsonl.1.gz", "rt", encoding="utf-8") as f:
+        assert json.loads(f.readline())["input"] == CAR
+
+def test_prediction_log_pairs_each_price_with_its_model_version(tmp_path, monkeypatch):
+    import dataclasses
+    import json
+    import api.app as app_module
+    from api.cache import PredictionCache
+    from monitoring.prediction_log import PredictionLogger
+
+    class Doubled:
+        def __init__(self, model):
+            self.model = model
+        def predict(self, X):
+            return self.model.predict(X) * 2
+
+    old = app_module.bundle
+    new = dataclasses.replace(old, version="swapped", model=Doubled(old.model))
+    cache = PredictionCache(100)
+    get = cache.get
+    def get_then_swap(key):
+        # Rechargement pendant la requête, après la capture du bundle
+        app_module.bundle = new
+        return get(key)
+    cache.get = get_then_swap
+    monkeypatch.setattr(app_module, "bundle", old)
+    monkeypatch.setattr(app_module, "cache", cache)
+    logger = PredictionLogger(str(tmp_path / "predictions.jsonl"), flush_interval=60)
+    monkeypatch.setattr(app_module, "prediction_log", logger)
+
+    cars = [{**CAR, "km_driven": 65432}, {**CAR, "km_driven": 65433}]
+    client.post("/predict", json=cars[0])
+    monkeypatch.setattr(app_module, "bundle", old)
+    client.post("/predict/batch", json=cars)
+    logger.flush()
+    records = [json.loads(line) for line in open(logger.path, encoding="utf-8")]
+    expected = old.predict_rows([cars[0], cars[0], cars[1]])
+    assert [r["model_version"] for r in records] == [old.version] * 3
+    # Prix du bundle capturé (arrondis au centime), pas du doublé chargé entre-temps
+    assert all(abs(r["prediction"] - e) < 0.01 for r, e in zip(records, expected))
+    logger.close()
+
+def test_drift_monitor_detects_shifted_traffic(tmp_path, monkeypatch):
+    import api.app as app_module
+    from monitoring.drift import DriftMonitor, DriftProfile
+    from monitoring.prediction_log import PredictionLogger
+    logger = PredictionLogger(str(tmp_path / "predictions.jsonl"), flush_interval=60)
+    monkeypatch.setattr(app_module, "prediction_log", logger)
+    monkeypatch.setattr(app_module, "DRIFT_REFERENCE_PATH", str(tmp_path / "absent.json"))
+    monkeypatch.setattr(app_module, "_drift", {"version": None, "monitor": None})
+
+    # Trafic concentré sur des voitures neuves, électriques, à faible kilométrage
+    shifted = [{**CAR, "year": 2024, "km_driven": 1000 + i, "fuel": "Electric"} for i in range(50)]
+    client.post("/predict/batch", json=shifted)
+    report = client.get("/monitoring/drift").json()
+    assert report["new_rows"] == 50 and report["current_rows"] == 50
+    assert report["drift_detected"] and {"year", "km_driven", "fuel"} <= set(report["drifted_features"])
+    assert set(report["features"]) == {"year", "km_driven", "fuel", "transmission", "owner",
+                                       "engine_cc", "seats", "prediction"}
+    assert 0 < report["features"]["year"]["ks"] <= 1
+
+    # Lecture incrémentale, puis remise à zéro de la fenêtre
+    client.post("/predict", json=CAR)
+    assert client.get("/monitoring/drift").json()["new_rows"] == 1
+    client.post("/monitoring/drift/reset")
+    assert client.get("/monitoring/drift").json()["current_rows"] == 0
+    logger.close()
+
+    # Profil sérialisable ; fichier tourné (plus court) : relecture depuis le début
+    monitor = app_module._drift["monitor"]
+    profile = DriftProfile.from_dict(monitor.reference.to_dict())
+    assert profile.to_dict() == monitor.reference.to_dict()
+    rotated = DriftMonitor(profile, logger.path, offset=10 ** 9)
+    assert rotated.ingest() == 51
+
+def test_metrics_endpoint_exposes_requests_and_stages():
+    import threading
+    import api.app as app_module
+    app_module.metrics.reset()
+    fresh = {**CAR, "km_driven": 123457}  # absent du cache : passe par transform + predict
+    client.post("/predict", json=fresh)
+    client.post("/predict/batch", json=[fresh, {**fresh, "year": 2011}, {"year": "x"}])
+    client.post("/predict", json={"year": 2020})
+    text = client.get("/metrics").text
+
+    assert 'http_requests_total{method="POST",path="/predict",status="200"} 1' in text
+    assert 'http_request_errors_total{method="POST",path="/predict",status="422"} 1' in text
+    assert 'http_request_duration_seconds_count{method="POST",path="/predict/batch"} 1' in text
+    for stage in ("validation", "transform", "predict", "serialization"):
+        assert f'prediction_stage_duration_seconds_count{{stage="{stage}"}}' in text
+    assert 'batch_predict_size_bucket{le="5.0"} 1' in text and "batch_predict_size_sum 3" in text
+    assert "# TYPE model_load_duration_seconds histogram" in text
+
+    # Incréments concurrents sans verrou : aucun n'est perdu, y compris ceux des threads terminés
+    counter = app_module.metrics.counter("test_concurrent_total", "test")
+    threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(1000)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    del threads, t
+    assert app_module.metrics.snapshot()[("test_concurrent_total", ())] == 8000
+
+def test_profiling_session_collects_stacks_for_next_requests(monkeypatch):
+    import api.app as app_module
+    assert client.post("/admin/profile/start").status_code == 404
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/profile/start", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    admin = {"X-Admin-Token": "secret"}
+
+    started = client.post("/admin/profile/start?requests=3&interval_ms=1&allocations=true", headers=admin)
+    assert started.json()["active"]
+    for km in range(3):
+        client.post("/predict/batch", json=[{**CAR, "km_driven": 200000 + km * 100 + i} for i in range(200)])
+    app_module.profiler.stop()
+    body = client.get("/admin/profile", headers=admin).json()
+    assert not body["active"] and body["result"]["requests"] == 3
+    assert body["result"]["samples"] > 0 and body["result"]["allocations"]
+    collapsed = client.get("/admin/profile?format=collapsed", headers=admin).text
+    assert "batch_predict (app.py:" in collapsed
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+def test_shadow_model_scores_served_rows_in_background(tmp_path, monkeypatch):
+    import dataclasses
+    import json
+    import api.app as app_module
+    from api.shadow import ShadowScorer
+
+    class Scaled:
+        # Challenger fictif : 20 % au-dessus de la production
+        def __init__(self, model):
+            self.model = model
+        def predict(self, X):
+            return self.model.predict(X) * 1.2
+
+    shadow_bundle = dataclasses.replace(app_module.bundle, version="shadow",
+                                        model=Scaled(app_module.bundle.model))
+    scorer = ShadowScorer(shadow_bundle, flush_interval=60, pairs_path=str(tmp_path / "pairs.jsonl"))
+    monkeypatch.setattr(app_module, "shadow", scorer)
+
+    single = client.post("/predict", json=CAR).json()
+    client.post("/predict/batch", json=[CAR, {**CAR, "year": 2015}])
+    # Rien n'est scoré sur le chemin des requêtes
+    assert scorer.stats()["scored"] == 0 and scorer.stats()["queued"] == 3
+    stats = client.get("/shadow/stats?flush=true&recent=2").json()
+    assert stats["enabled"] and stats["scored"] == 3 and stats["queued"] == 0
+    assert stats["primary_versions"] == {app_module.bundle.version: 3}
+    assert abs(stats["mean_abs_pct_diff"] - 20) < 0.01 and stats["divergent_share"] == 1.0
+    assert len(stats["recent"]) == 2
+    pairs = [json.loads(line) for line in open(tmp_path / "pairs.jsonl", encoding="utf-8")]
+    assert pairs[0]["input"] == CAR and pairs[0]["primary"] == single["predicted_price"]
+    assert pairs[0]["shadow_version"] == "shadow"
+    assert abs(pairs[0]["shadow"] - pairs[0]["primary"] * 1.2) < 0.05
+    scorer.close()
+
+    # File pleine : lignes abandonnées, la requête n'attend pas
+    small = ShadowScorer(shadow_bundle, capacity=2, batch_size=100, flush_interval=60)
+    assert small.submit([CAR, CAR], [1.0, 1.0], "v") and not small.submit([CAR], [1.0], "v")
+    assert small.stats()["dropped"] == 1
+    small.close()
+    assert small.stats()["scored"] == 2
+
+def test_shadow_pairs_compare_against_the_captured_champion(monkeypatch):
+    import dataclasses
+    import api.app as app_module
+    from api.cache import PredictionCache
+    from api.shadow import ShadowScorer
+
+    class Doubled:
+        def __init__(self, model):
+            self.model = model
+        def predict(self, X):
+            return self.model.predict(X) * 2
+
+    old = app_module.bundle
+    new = dataclasses.replace(old, version="swapped", model=Doubled(old.model))
+    cache = PredictionCache(100)
+    get = cache.get
+    def get_then_swap(key):
+        # Rechargement pendant la requête, après la capture du bundle
+        app_module.bundle = new
+        return get(key)
+    cache.get = get_then_swap
+    monkeypatch.setattr(app_module, "bundle", old)
+    monkeypatch.setattr(app_module, "cache", cache)
+    # Fantôme identique au champion capturé : aucun écart attendu
+    scorer = ShadowScorer(dataclasses.replace(old, version="shadow"), flush_interval=60)
+    monkeypatch.setattr(app_module, "shadow", scorer)
+
+    client.post("/predict", json={**CAR, "km_driven": 76543})
+    monkeypatch.setattr(app_module, "bundle", old)
+    client.post("/predict/batch", json=[{**CAR, "km_driven": 76544}, {**CAR, "km_driven": 76545}])
+    scorer.flush()
+    stats = scorer.stats()
+    assert stats["scored"] == 3 and stats["primary_versions"] == {old.version: 3}
+    assert stats["max_abs_diff"] < 1e-6
+    scorer.close()
+
+def test_router_groups_batch_by_model_and_restores_order(tmp_path, monkeypatch):
+    import dataclasses
+    import json
+    import numpy as np
+    import api.app as app_module
+    from api.routing import ModelRouter
+    from api.shadow import ShadowScorer
+    from monitoring.prediction_log import PredictionLogger
+
+    class Scaled:
+        def __init__(self, model, factor):
+            self.model, self.factor = model, factor
+        def predict(self, X):
+            self.calls = getattr(self, "calls", 0) + 1
+            return self.model.predict(X) * self.factor
+
+    production = app_module.bundle
+    loaded = []
+    def load_bundle(version):
+        loaded.append(version)
+        factor = {"v-electric": 2.0, "v-old": 0.5, production.version: 1.0}[version]
+        return dataclasses.replace(production, version=version, model=Scaled(production.model, factor))
+    active_router = ModelRouter.from_config({"rules": [
+        {"name": "electric", "when": {"fuel": "Electric"}, "version": "v-electric"},
+        {"name": "old", "when": {"year": {"lt": 2010}}, "version": "v-old"},
+        {"name": "hybrid", "when": {"fuel": ["Hybrid"]}, "version": "v-electric"},
+        {"name": "diesel", "when": {"fuel": "Diesel"}, "version": production.version},
+    ]}, load_bundle)
+    # Une version partagée par deux règles n'est chargée qu'une fois
+    assert sorted(loaded) == sorted(["v-electric", "v-old", production.version])
+    monkeypatch.setattr(app_module, "router", active_router)
+    monkeypatch.setattr(app_module, "cache", None)
+    logger = PredictionLogger(str(tmp_path / "predictions.jsonl"), flush_interval=60)
+    monkeypatch.setattr(app_module, "prediction_log", logger)
+    scorer = ShadowScorer(production, flush_interval=60)
+    monkeypatch.setattr(app_module, "shadow", scorer)
+
+    cars = [{**CAR, "km_driven": 300000 + i, "fuel": fuel, "year": year}
+            for i, (fuel, year) in enumerate([("Diesel", 2020), ("Electric", 2020), ("Petrol", 2005),
+                                              ("Hybrid", 2012), ("Diesel", 2006), ("Petrol", 2019)])]
+    body = client.post("/predict/batch", json=cars).json()
+    prices = [p["predicted_price"] for p in body["predictions"]]
+    assert [p["input_data"] for p in body["predictions"]] == cars
+    base = production.predict_rows(cars)
+    expected = base * np.array([1, 2.0, 0.5, 2.0, 0.5, 1])
+    assert np.allclose(prices, np.round(expected, 2), atol=0.01)
+    # Un seul predict par modèle pour tout le lot : electric + hybrid, diesel + défaut
+    assert active_router.bundles["v-electric"].model.calls == 1
+    assert active_router.bundles["v-old"].model.calls == 1
+    assert active_router.bundles[production.version].model.calls == 1
+
+    single = client.post("/predict", json=cars[1]).json()
+    assert abs(single["predicted_price"] - round(expected[1], 2)) < 0.01
+
+    # Chaque prix est journalisé avec la version de sa route ; seules les
+    # lignes du modèle en production sont comparées au modèle fantôme
+    logger.flush()
+    records = [json.loads(line) for line in open(logger.path, encoding="utf-8")]
+    assert [r["model_version"] for r in records] == [
+        production.version, "v-electric", "v-old", "v-electric", "v-old", production.version, "v-electric"]
+    assert records[-1]["input"]["fuel"] == "Electric"
+    scorer.flush()
+    assert scorer.stats()["primary_versions"] == {production.version: 2}
+    logger.close()
+    scorer.close()
+
+    routes = client.get("/model/routes").json()
+    assert routes["enabled"] and routes["rows_per_route"] == {
+        "electric": 2, "old": 2, "hybrid": 1, "diesel": 1, "default": 1}
+    assert set(routes["models"]) == {"v-electric", "v-old", production.version}
+    assert routes["models"]["v-electric"]["routes"] == ["electric", "hybrid"]
+    assert routes["default"]["heap_bytes"] + routes["default"]["mapped_bytes"] > 0
@@ -0,0 +1,39 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.batch_score import score_file
+from src.utils import load_model, load_preprocessor
+
+MODEL = 'models/production_model.pkl'
+PREPROCESSOR = 'models/preprocessor.pkl'
+
+def test_score_file_in_order_with_process_pool(tmp_path):
+    output = tmp_path / 'scored.csv'
+    stats = score_file('data/raw/car_data.csv', str(output), MODEL, PREPROCESSOR,
+                       chunk_size=128, n_workers=2)
+    raw = pd.read_csv('data/raw/car_data.csv')
+    scored = pd.read_csv(output)
+    assert stats['rows'] == len(raw) == len(scored)
+    pd.testing.assert_frame_equal(scored.drop(columns='predicted_price'), raw)
+    expected = load_model(MODEL).predict(load_preprocessor(PREPROCESSOR).transform(raw.drop(columns='price')))
+    np.testing.assert_allclose(scored['predicted_price'], np.round(expected, 2))
+    assert not os.path.exists(f"{output}.checkpoint.json")
+
+def test_score_file_resumes_from_checkpoint(tmp_path):
+    reference = tmp_path / 'reference.csv'
+    score_file('data/raw/car_data.csv', str(reference), MODEL, PREPROCESSOR, chunk_size=100, n_workers=1)
+    content = reference.read_bytes()
+
+    # Simule un arrêt après 3 paquets : en-tête + 300 lignes écrites, puis une ligne partielle
+    done = b''.join(content.splitlines(keepends=True)[:301])
+    output = tmp_path / 'scored.csv'
+    output.write_bytes(done + b'2016,4808')
+    checkpoint = {'input': os.path.abspath('data/raw/car_data.csv'), 'chunk_size': 100,
+                  'chunks_done': 3, 'rows_done': 300, 'output_bytes': len(done)}
+    (tmp_path / 'scored.csv.checkpoint.json').write_text(json.dumps(checkpoint))
+
+    stats = score_file('data/raw/car_data.csv', str(output), MODEL, PREPROCESSOR,
+                       chunk_size=100, n_workers=1, resume=True)
+    assert stats['rows'] == 1000
+    assert output.read_bytes() == content
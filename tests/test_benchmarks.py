@@ -0,0 +1,54 @@
+"""
+Tests du banc de charge (exécution très courte, dans le processus) et des micro-benchmarks
+Exécuter avec : pytest tests/test_benchmarks.py --run-benchmarks
+"""
+import copy
+import pytest
+from benchmarks.components import run_benchmarks, scaling_exponents
+from benchmarks.load_test import build_scenarios, compare_to_baseline, run_load_test
+
+def test_scenarios_are_reproducible_and_batches_unique():
+    first = build_scenarios(batch_sizes=(10,), unique_rows=100, seed=3)
+    assert first == build_scenarios(batch_sizes=(10,), unique_rows=100, seed=3)
+    names = [name for name, _, _, _ in first]
+    assert names == ['predict_repeated', 'predict_unique', 'batch_10']
+    _, endpoint, rows_per_request, bodies = first[2]
+    assert endpoint == '/predict/batch' and rows_per_request == 10 and len(set(bodies)) == 10
+
+def test_load_test_reports_latency_and_detects_regressions():
+    report = run_load_test('inprocess', duration=0.2, concurrency=2, batch_sizes=(5,),
+                           scenarios=['predict_repeated', 'batch_5'], unique_rows=50, warmup=0)
+    assert [r['scenario'] for r in report['results']] == ['predict_repeated', 'batch_5']
+    for result in report['results']:
+        assert result['requests'] > 0 and result['errors'] == 0
+        assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms'] <= result['max_ms']
+    assert compare_to_baseline(report, report) == []
+
+    slower = copy.deepcopy(report)
+    for result in slower['results']:
+        result['rps'] *= 0.5
+        result['p95_ms'] *= 2
+    regressions = compare_to_baseline(slower, report, threshold=0.2)
+    assert len(regressions) == 4 and "predict_repeated" in regressions[0]
+
+def test_scaling_exponents_flag_superlinear_growth():
+    results = [{'component': 'linear', 'rows': n, 'seconds': n / 1e6, 'rows_per_s': 1e6}
+               for n in (1000, 10000, 100000)]
+    results += [{'component': 'quadratic', 'rows': n, 'seconds': (n / 1e4) ** 2, 'rows_per_s': 0}
+                for n in (1000, 10000, 100000)]
+    curves = scaling_exponents(results)
+    assert [e['exponent'] for e in curves['linear']['exponents']] == [1.0, 1.0]
+    assert curves['linear']['nonlinear_from_rows'] is None
+    assert curves['quadratic']['nonlinear_from_rows'] == 1000
+
+@pytest.mark.benchmark
+def test_component_benchmarks_record_time_memory_and_curves(tmp_path):
+    report = run_benchmarks(sizes=(2000, 1000), components=['transform', 'train_ridge', 'predict'],
+                            repeat=1, workdir=str(tmp_path))
+    assert [(r['component'], r['rows']) for r in report['results']] == [
+        ('transform', 1000), ('train_ridge', 1000), ('predict', 1000),
+        ('transform', 2000), ('train_ridge', 2000), ('predict', 2000)]
+    for result in report['results']:
+        assert result['seconds'] > 0 and result['rows_per_s'] > 0 and result['peak_mb'] > 0
+    assert report['curves']['transform']['rows'] == [1000, 2000]
+    assert len(report['curves']['predict']['exponents']) == 1
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import Ridge
+from src.preprocess import DataPreprocessor
+from src.compiled_model import CompiledModel, export_model
+
+@pytest.fixture(scope='module')
+def training_data():
+    df = pd.read_csv('data/raw/car_data.csv')
+    X, y = DataPreprocessor().fit_transform(df)
+    return X, y
+
+@pytest.mark.parametrize('estimator', [
+    RandomForestRegressor(n_estimators=20, max_depth=8, random_state=42),
+    GradientBoostingRegressor(n_estimators=30, random_state=42),
+    Ridge(alpha=1.0),
+])
+def test_compiled_model_matches_sklearn(training_data, estimator, tmp_path):
+    X, y = training_data
+    estimator.fit(X, y)
+    path = tmp_path / 'model.npz'
+    export_model(estimator, path)
+    compiled = CompiledModel.load(path)
+    np.testing.assert_allclose(compiled.predict(X.to_numpy()), estimator.predict(X), rtol=1e-9)
+    assert compiled.predict(X.to_numpy()[:1]).shape == (1,)
+
+def test_mapped_artifacts_roundtrip(training_data, tmp_path):
+    X, y = training_data
+    estimator = RandomForestRegressor(n_estimators=10, max_depth=6, random_state=42).fit(X, y)
+    export_model(estimator, tmp_path / 'model.bin')
+    compiled = CompiledModel.load(tmp_path / 'model.bin')
+    assert not compiled.arrays['threshold'].flags.writeable
+    np.testing.assert_allclose(compiled.predict(X.to_numpy()), estimator.predict(X), rtol=1e-9)
+
+    df = pd.read_csv('data/raw/car_data.csv')
+    preprocessor = DataPreprocessor()
+    preprocessor.fit_transform(df)
+    preprocessor.save(str(tmp_path / 'preprocessor.bin'))
+    loaded = DataPreprocessor.load(str(tmp_path / 'preprocessor.bin'))
+    raw = df.drop('price', axis=1)
+    expected = preprocessor.transform(raw)
+    pd.testing.assert_frame_equal(loaded.transform(raw), expected)
+    assert np.array_equal(loaded.compile().transform(raw.to_dict('records')), expected.to_numpy(dtype=np.float64))
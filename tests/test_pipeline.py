@@ -2,10 +2,225 @@ import os
 from src.preprocess import prepare_data
 from src.train import train_model
 
-def test_prepare_data():
+def test_prepare_data(tmp_path, monkeypatch):
+    import shutil
+    # Preprocessor et jeux prétraités écrits hors du dépôt
+    shutil.copytree('data/raw', tmp_path / 'data' / 'raw')
+    (tmp_path / 'models').mkdir()
+    monkeypatch.chdir(tmp_path)
     X_train, X_test, y_train, y_test, preprocessor = prepare_data()
     assert not X_train.empty
 
-def test_train_model():
+def test_train_model(tmp_path, monkeypatch):
+    import shutil
+    import mlflow
+    from src.registry import ModelRegistry
+    uri = f"sqlite:///{tmp_path / 'mlflow.db'}"
+    monkeypatch.setenv('MLFLOW_TRACKING_URI', uri)
+    mlflow.set_tracking_uri(uri)
+    # Données copiées, modèles et registre écrits hors du dépôt
+    shutil.copytree('data/raw', tmp_path / 'data' / 'raw')
+    (tmp_path / 'models').mkdir()
+    monkeypatch.chdir(tmp_path)
+
     train_model()
     assert os.path.exists('models/production_model.pkl')
+    assert ModelRegistry().current_version() is not None
+
+def test_compiled_preprocessor_matches_transform():
+    import numpy as np
+    import pandas as pd
+    from src.preprocess import DataPreprocessor
+    df = pd.read_csv('data/raw/car_data.csv')
+    preprocessor = DataPreprocessor()
+    preprocessor.fit_transform(df)
+    raw = df.drop('price', axis=1).head(50)
+    raw.loc[0, 'fuel'] = 'Hydrogen'  # catégorie inconnue
+    expected = preprocessor.transform(raw).to_numpy(dtype=np.float64)
+    compiled = preprocessor.compile()
+    assert np.array_equal(compiled.transform(raw.to_dict('records')), expected)
+    assert np.array_equal(compiled.transform(raw.iloc[3].to_dict()), expected[3:4])
+    assert np.array_equal(compiled.transform_frame(raw), expected)
+
+def test_compare_models_parallel_matches_sequential(tmp_path, monkeypatch):
+    import mlflow
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from src.preprocess import DataPreprocessor
+    from src.train import compare_models
+    uri = f"sqlite:///{tmp_path / 'mlflow.db'}"
+    monkeypatch.setenv('MLFLOW_TRACKING_URI', uri)
+    mlflow.set_tracking_uri(uri)
+
+    preprocessor = DataPreprocessor()
+    X, y = preprocessor.fit_transform(pd.read_csv('data/raw/car_data.csv'))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    data = (X_train, X_test, y_train, y_test, preprocessor)
+    monkeypatch.chdir(tmp_path)  # artefacts MLflow hors du dépôt
+    experiments = [{'model_type': 'ridge', 'alpha': a} for a in (10.0, 1.0, 0.1)]
+
+    sequential = compare_models(experiments, data=data, save=False)
+    parallel = compare_models(experiments, parallel=True, n_workers=2, data=data, save=False)
+    for s, p in zip(sequential, parallel):
+        assert s['alpha'] == p['alpha']
+        assert abs(s['rmse'] - p['rmse']) < 1e-9
+
+def test_prepare_data_reuses_content_addressed_cache(tmp_path, monkeypatch):
+    import shutil
+    import src.preprocess as preprocess
+    raw = tmp_path / 'data' / 'raw' / 'car_data.csv'
+    raw.parent.mkdir(parents=True)
+    shutil.copy('data/raw/car_data.csv', raw)
+    (tmp_path / 'models').mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    first = preprocess.prepare_data(data_path=str(raw))
+    key = preprocess.dataset_cache_key(str(raw))
+    assert (tmp_path / 'data' / 'cache' / key).is_dir()
+
+    def no_read(*args, **kwargs):
+        raise AssertionError("le CSV brut ne doit pas être relu")
+    monkeypatch.setattr(preprocess.pd, 'read_csv', no_read)
+    second = preprocess.prepare_data(data_path=str(raw))
+    for a, b in zip(first[:4], second[:4]):
+        assert a.equals(b) and a.index.equals(b.index)
+    assert second[0].dtypes.equals(first[0].dtypes)
+    assert second[4].feature_names == first[4].feature_names
+
+    # Une modification des données brutes change la clé
+    raw.write_text(raw.read_text().replace('Petrol', 'Diesel', 1))
+    assert preprocess.dataset_cache_key(str(raw)) != key
+
+def test_dataset_io_roundtrip_keeps_schema(tmp_path):
+    from src.dataset_io import RAW_SCHEMA, read_dataset, resolve_dataset, write_dataset
+    df = read_dataset('data/raw/car_data.csv')
+    assert {c: str(t) for c, t in df.dtypes.items()} == RAW_SCHEMA
+    for ext in ('.parquet', '.feather', '.csv'):
+        path = str(tmp_path / f'cars{ext}')
+        write_dataset(df, path)
+        back = read_dataset(path)
+        assert back.equals(df) and back.dtypes.equals(df.dtypes)
+        assert list(read_dataset(path, columns=['year', 'fuel']).columns) == ['year', 'fuel']
+    # Un chemin .parquet absent se rabat sur le même fichier dans un autre format
+    (tmp_path / 'cars.parquet').unlink()
+    assert resolve_dataset(str(tmp_path / 'cars.parquet')).endswith('cars.feather')
+
+def test_raw_import_with_missing_values_is_cleaned_then_typed(tmp_path):
+    import pytest
+    from src.dataset_io import RAW_SCHEMA, read_dataset, write_dataset
+    source = tmp_path / 'vehicules.csv'
+    lines = open('data/raw/car_data.csv', encoding='utf-8').read().splitlines()[:4]
+    header = lines[0].split(',')
+    incomplete = lines[2].split(',')
+    incomplete[header.index('km_driven')] = ''
+    lines[2] = ','.join(incomplete)
+    source.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    # Schéma strict : un entier manquant est refusé dès la lecture
+    with pytest.raises(ValueError):
+        read_dataset(str(source))
+    # Import du DAG : lecture sans schéma, nettoyage, puis typage à l'écriture
+    df = read_dataset(str(source), schema=None).dropna()
+    write_dataset(df, str(tmp_path / 'new_data.parquet'))
+    back = read_dataset(str(tmp_path / 'new_data.parquet'))
+    assert len(back) == 2 and {c: str(t) for c, t in back.dtypes.items()} == RAW_SCHEMA
+
+def test_generator_is_deterministic_whatever_the_worker_count(tmp_path):
+    from src.dataset_io import read_dataset
+    from src.download_data import download_car_data, generate_dataset
+    sequential = tmp_path / 'seq.parquet'
+    parallel = tmp_path / 'par.parquet'
+    stats = generate_dataset(2500, chunk_size=1000, n_workers=1, output_path=str(sequential),
+                             csv_export=str(tmp_path / 'seq.csv'))
+    returned = download_car_data(2500, chunk_size=1000, n_workers=2, output_path=str(parallel))
+    assert stats['rows'] == 2500 and stats['chunks'] == 3
+    df = read_dataset(str(sequential))
+    assert len(df) == 2500 and df.equals(read_dataset(str(parallel)))
+    # download_car_data garde son contrat : le DataFrame généré
+    assert returned.equals(df)
+    assert df.equals(read_dataset(str(tmp_path / 'seq.csv')))
+
+def test_incremental_training_extends_forest_on_new_rows(tmp_path, monkeypatch):
+    import numpy as np
+    import src.train as train
+    from src.download_data import download_car_data
+    from src.preprocess import DataPreprocessor
+    from src.dataset_io import read_dataset
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('MLFLOW_TRACKING_URI', f"sqlite:///{tmp_path / 'mlflow.db'}")
+    (tmp_path / 'models').mkdir()
+    download_car_data(2000, chunk_size=500)
+    train.train_model('random_forest', n_estimators=10, max_depth=6)
+    assert train.load_snapshot()['rows'] == 2000
+
+    # Mêmes 4 premiers paquets (même graine) + 500 nouvelles lignes
+    download_car_data(2500, chunk_size=500)
+    raw = read_dataset('data/raw/car_data.parquet').drop('price', axis=1)
+    old_model = train.joblib.load('models/production_model.pkl')
+    old_pred = old_model.predict(DataPreprocessor.load('models/preprocessor.pkl').transform(raw))
+
+    model, metrics = train.train_incremental(n_new_estimators=5)
+    snapshot = train.load_snapshot()
+    assert len(model.estimators_) == 15 and snapshot['rows'] == 2500
+    assert snapshot['mode'] == 'incremental' and snapshot['parent_run_id']
+    # Les anciens arbres, aux seuils réexprimés, décident comme avant sur les données brutes
+    X = DataPreprocessor.load('models/preprocessor.pkl').transform(raw)
+    old_trees = np.mean([t.predict(X.to_numpy()) for t in model.estimators_[:10]], axis=0)
+    assert np.allclose(old_trees, old_pred)
+    assert train.train_incremental() == (None, None)
+
+def test_partial_fit_refuses_new_categories():
+    import numpy as np
+    import pandas as pd
+    import pytest
+    from src.preprocess import DataPreprocessor
+    preprocessor = DataPreprocessor()
+    df = pd.read_csv('data/raw/car_data.csv')
+    preprocessor.fit_transform(df)
+    mean = preprocessor.scaler.mean_.copy()
+    preprocessor.partial_fit(df.head(10))
+    assert not np.allclose(mean, preprocessor.scaler.mean_)
+    with pytest.raises(ValueError):
+        preprocessor.partial_fit(df.head(10).assign(fuel='Hydrogen'))
+
+def test_champion_challenger_evaluation_on_fixed_holdout(tmp_path):
+    import json
+    import numpy as np
+    from src.download_data import generate_chunk
+    from src.evaluate import CHAMPION, evaluate_candidates, exclude_holdout, load_holdout
+    from src.preprocess import DataPreprocessor
+    from src.registry import ModelBundle
+    from src.train import build_model
+    df = generate_chunk((3000, np.random.SeedSequence(7)))
+    holdout_path = str(tmp_path / "holdout.parquet")
+    holdout = load_holdout(holdout_path, source=df, fraction=0.2)
+    # Relu tel quel au run suivant, même avec d'autres données sources
+    assert load_holdout(holdout_path, source=df.iloc[:10]).equals(holdout)
+    train = exclude_holdout(df, holdout)
+    assert len(train) == len(df) - len(holdout)
+
+    preprocessor = DataPreprocessor()
+    X, y = preprocessor.fit_transform(train)
+    models = {name: build_model(model_type, **params).fit(X, y) for name, model_type, params in [
+        ('ridge', 'ridge', {}), ('gb', 'gradient_boosting', {'n_estimators': 30})]}
+    weak = build_model('ridge', alpha=1e6).fit(X, y)
+    champion = ModelBundle(version='v1', model=weak, preprocessor=preprocessor,
+                           encoder=preprocessor.compile(), model_path='v1')
+
+    report = evaluate_candidates({name: (m, preprocessor) for name, m in models.items()}, champion,
+                                 holdout_path=holdout_path, report_path=str(tmp_path / "report.json"))
+    # Mêmes métriques qu'un predict séquentiel sur le hold-out
+    expected = np.abs(models['gb'].predict(preprocessor.transform(holdout.drop(columns='price')))
+                      - holdout['price']).mean()
+    assert abs(report['overall']['gb']['mae'] - expected) < 1e-6
+    assert set(report['segments']) == {'fuel', 'year_bucket'}
+    assert sum(v['rows'] for v in report['segments']['fuel'].values()) == len(holdout)
+    assert report['decision']['promote'] in ('ridge', 'gb') and report['champion_version'] == 'v1'
+    with open(tmp_path / "report.json", encoding='utf-8') as f:
+        assert json.load(f)['decision'] == report['decision']
+
+    # Un challenger moins bon que le champion n'est pas promu
+    kept = evaluate_candidates({'weak': (weak, preprocessor)},
+                               ModelBundle(version='v2', model=models['gb'], preprocessor=preprocessor,
+                                           encoder=preprocessor.compile(), model_path='v2'),
+                               holdout=holdout, report_path=str(tmp_path / "report2.json"))
+    assert kept['decision']['promote'] is None and CHAMPION in kept['overall']
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from src.preprocess import DataPreprocessor
+from src.registry import ModelRegistry
+
+@pytest.fixture(scope='module')
+def trained():
+    df = pd.read_csv('data/raw/car_data.csv')
+    preprocessor = DataPreprocessor()
+    X, y = preprocessor.fit_transform(df)
+    model = RandomForestRegressor(n_estimators=5, max_depth=5, random_state=42).fit(X, y)
+    return model, preprocessor, df.drop('price', axis=1)
+
+def test_publish_promote_and_load_bundle(trained, tmp_path):
+    model, preprocessor, raw = trained
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    assert registry.current_version() is None
+
+    v1 = registry.publish(model, preprocessor, metrics={'rmse': 1.0})
+    v2 = registry.publish(model, preprocessor, promote=False)
+    assert registry.versions() == sorted([v1, v2])
+    assert registry.current_version() == v1
+
+    registry.promote(v2)
+    bundle = registry.load_bundle()
+    assert bundle.version == v2
+    rows = raw.head(20).to_dict('records')
+    np.testing.assert_allclose(bundle.predict_rows(rows), model.predict(preprocessor.transform(raw.head(20))))
+
+    with pytest.raises(ValueError):
+        registry.promote('inconnue')
@@ -0,0 +1,43 @@
+import json
+import pandas as pd
+import pytest
+from sklearn.model_selection import train_test_split
+import src.search as search
+from src.preprocess import DataPreprocessor
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    df = pd.read_csv('data/raw/car_data.csv')
+    preprocessor = DataPreprocessor()
+    X, y = preprocessor.fit_transform(df)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('MLFLOW_TRACKING_URI', f"sqlite:///{tmp_path / 'mlflow.db'}")
+    return (*train_test_split(X, y, test_size=0.2, random_state=42), preprocessor)
+
+def test_hyperband_brackets_shrink_configs_and_grow_budget():
+    brackets = search.hyperband_brackets(1 / 9, 1.0, eta=3)
+    assert [(s, n) for s, n, _ in brackets] == [(2, 9), (1, 5), (0, 3)]
+    assert brackets[0][2] == pytest.approx([1 / 9, 1 / 3, 1.0])
+
+def test_search_parallel_matches_sequential_and_resumes(data, tmp_path, monkeypatch):
+    kwargs = dict(model_type='ridge', resource='data', data=data)
+    sequential = search.hyperband_search(**kwargs, n_workers=1, study_path=str(tmp_path / 'seq.json'))
+    parallel = search.hyperband_search(**kwargs, n_workers=2, study_path=str(tmp_path / 'par.json'))
+    assert sequential['best_params'] == parallel['best_params']
+    assert sequential['best_rmse'] == pytest.approx(parallel['best_rmse'])
+    # Successive halving : bien moins de budget qu'un entraînement complet par configuration
+    assert sequential['budget_used'] < sequential['configs'] * 0.6
+
+    # Étude interrompue : on retire les derniers essais, seuls ceux-là sont rejoués
+    study_file = tmp_path / 'seq.json'
+    study = json.loads(study_file.read_text())
+    dropped = sorted(study['trials'])[-3:]
+    for key in dropped:
+        del study['trials'][key]
+    study_file.write_text(json.dumps(study))
+    replayed = []
+    run_trial = search._run_trial
+    monkeypatch.setattr(search, '_run_trial', lambda task: replayed.append(task[0]) or run_trial(task))
+    resumed = search.hyperband_search(**kwargs, n_workers=1, study_path=str(study_file))
+    assert sorted(replayed) == dropped
+    assert resumed['best_params'] == sequential['best_params']
@@ -0,0 +1,48 @@
+import json
+import os
+from sklearn.linear_model import Ridge
+from src.tracking import Tracker
+
+def test_mlflow_mode_sends_one_batch_per_run(tmp_path, monkeypatch):
+    from mlflow.tracking import MlflowClient
+    monkeypatch.setenv('MLFLOW_TRACKING_URI', f"sqlite:///{tmp_path / 'mlflow.db'}")
+    calls = []
+    log_batch = MlflowClient.log_batch
+    monkeypatch.setattr(MlflowClient, 'log_batch', lambda self, *a, **k: calls.append(1) or log_batch(self, *a, **k))
+
+    tracker = Tracker("test_tracking", mode="mlflow")
+    with tracker.start_run(run_name="batched", tags={'mode': 'test'}) as run:
+        run.log_params({'alpha': 1.0, 'model_type': 'ridge'})
+        run.log_param('max_depth', None)
+        for name in ('mae', 'rmse', 'r2'):
+            run.log_metric(name, 0.5)
+    assert len(calls) == 1
+    data = MlflowClient().get_run(run.run_id).data
+    assert data.params == {'alpha': '1.0', 'model_type': 'ridge', 'max_depth': 'None'}
+    assert data.metrics == {'mae': 0.5, 'rmse': 0.5, 'r2': 0.5}
+    assert data.tags['mode'] == 'test'
+
+def test_offline_mode_writes_runs_and_models_locally(tmp_path):
+    tracker = Tracker(mode="offline", offline_dir=str(tmp_path))
+    model = Ridge().fit([[0.0], [1.0]], [0.0, 1.0])
+    with tracker.start_run(run_name="search") as parent:
+        with tracker.start_run(run_name="trial", nested=True) as trial:
+            trial.log_metrics({'rmse': 2.0})
+            trial.log_model(model)
+    record = json.loads((tmp_path / f"{trial.run_id}.json").read_text())
+    assert record['parent_run_id'] == parent.run_id
+    assert record['metrics'][0][:2] == ['rmse', 2.0]
+    assert os.path.exists(record['artifacts'][0])
+
+def test_off_mode_and_failed_uploads_never_break_training(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with Tracker(mode="off").start_run() as run:
+        run.log_metrics({'rmse': 1.0})
+        run.log_model(object())
+    assert run.run_id is None and not os.listdir(tmp_path)
+
+    tracker = Tracker(mode="offline", offline_dir=str(tmp_path))
+    monkeypatch.setattr(tracker, '_upload_model', lambda *args: 1 / 0)
+    with tracker.start_run() as run:
+        run.log_model(object())
+    assert run.errors and 'division by zero' in run.errors[0]